@@ -0,0 +1,201 @@
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .notes import NoteArray, PITCH_DTYPE, numpy_rng
+
+# --- Bass Line Engine ---
+# Every bass style is a small table of steps relative to the chord it plays
+# under. A style has one or more weighted patterns (e.g. "sustain" vs
+# "sustain + fill"), picked per chord. Patterns are compiled to NumPy columns at
+# import time and rendered for the whole progression at once: steps are tiled
+# across every chord, random variations are drawn in bulk and events are clipped
+# to their chord in a single pass.
+
+BASS_LOW = 28 # E1 (extended range for deep bass)
+BASS_HIGH = 45 # A2
+
+@dataclass(frozen=True)
+class BassStep:
+    time: float = 0.0 # beats from the chord start...
+    time_frac: float = 0.0 # ...plus this fraction of the chord duration (1.0 = anchored to the chord end)
+    duration: float = 0.0 # beats...
+    duration_frac: float = 0.0 # ...plus this fraction of the chord duration
+    velocity: int = 100
+    velocity_jitter: int = 0 # +/- random velocity
+    interval: int = 0 # semitones above the bass note
+    alt_interval: int = 0 # played instead with probability alt_chance
+    alt_chance: float = 0.0
+    delay: Tuple[float, float] = (0.0, 0.0) # uniform random late start (laid back feel)
+    min_chord: float = 0.0 # only played on chords at least this long
+
+@dataclass(frozen=True)
+class BassPattern:
+    steps: Tuple[BassStep, ...]
+    weight: float = 1.0 # relative chance of this pattern being picked for a chord
+    period: Optional[float] = None # repeat the steps every `period` beats; None = once per chord
+
+STEP_COLUMNS = ("time", "time_frac", "duration", "duration_frac", "velocity", "velocity_jitter", "interval", "alt_interval", "alt_chance", "min_chord")
+
+def compile_pattern(pattern: BassPattern) -> Dict[str, np.ndarray]:
+    """Turns a pattern's steps into one array per BassStep field."""
+    columns = {name: np.array([getattr(s, name) for s in pattern.steps], dtype=float) for name in STEP_COLUMNS}
+    delays = np.array([s.delay for s in pattern.steps], dtype=float).reshape(-1, 2)
+    columns["delay_low"], columns["delay_high"] = delays.T
+    return columns
+
+def sustain(fraction: float, velocity: int) -> BassStep:
+    return BassStep(duration_frac=fraction, velocity=velocity)
+
+BASS_STYLES: Dict[str, Tuple[BassPattern, ...]] = {
+    # Driving offbeat 8ths, octave jump on the last offbeat of every two beats (and 30% of the others)
+    "offbeat": (
+        BassPattern(period=2.0, steps=(
+            BassStep(time=0.5, duration=0.4, velocity=100, velocity_jitter=5, alt_interval=12, alt_chance=0.3),
+            BassStep(time=1.5, duration=0.4, velocity=100, velocity_jitter=5, interval=12),
+        )),
+    ),
+    # Long sustained 808 with an occasional two-note fill leading into the next chord
+    "808": (
+        BassPattern(weight=0.6, steps=(sustain(0.85, 110),)),
+        BassPattern(weight=0.4, steps=(
+            sustain(0.85, 110),
+            BassStep(time=-0.5, time_frac=1.0, duration=0.25, velocity=90, min_chord=2.0),
+            BassStep(time=-0.25, time_frac=1.0, duration=0.2, velocity=80, min_chord=2.0),
+        )),
+    ),
+    # Future bass / dubstep: mono 3+3+2 (dotted quarter, dotted quarter, quarter) or a plain sustain
+    "dotted": (
+        BassPattern(weight=0.6, steps=(
+            BassStep(time=0.0, duration=0.7, velocity=110),
+            BassStep(time=1.5, duration=0.7, velocity=105),
+            BassStep(time=3.0, duration=0.9, velocity=100),
+        )),
+        BassPattern(weight=0.4, steps=(sustain(0.9, 110),)),
+    ),
+    # Pop/rock straight 8ths, slightly staccato, accented downbeats, fifth/octave on the weak 8ths
+    "root_fifth": (
+        BassPattern(period=2.0, steps=(
+            BassStep(time=0.0, duration=0.35, velocity=100, velocity_jitter=5),
+            BassStep(time=0.5, duration=0.35, velocity=85, velocity_jitter=5),
+            BassStep(time=1.0, duration=0.35, velocity=100, velocity_jitter=5, alt_interval=7, alt_chance=0.3),
+            BassStep(time=1.5, duration=0.35, velocity=85, velocity_jitter=5, alt_interval=12, alt_chance=0.3),
+        )),
+    ),
+    # Syncopated root / octave pops
+    "funk": (
+        BassPattern(steps=(
+            BassStep(time=0.0, duration=0.4, velocity=105),
+            BassStep(time=1.0, duration=0.2, velocity=95, interval=12, min_chord=2.0),
+            BassStep(time=1.5, duration=0.4, velocity=100, min_chord=2.0),
+            BassStep(time=2.5, duration=0.2, velocity=95, interval=12, min_chord=2.0),
+            BassStep(time=2.75, duration=0.2, velocity=90, interval=12, min_chord=2.0),
+        )),
+    ),
+    # Deep, long, low (see BASS_CEILINGS)
+    "deep": (
+        BassPattern(steps=(sustain(1.0, 95),)),
+    ),
+    # Lo-fi / R&B: a late, short root and sometimes a fifth or octave pickup
+    "laid_back": (
+        BassPattern(weight=0.5, steps=(BassStep(duration_frac=0.4, velocity=85, delay=(0.05, 0.12)),)),
+        BassPattern(weight=0.5, steps=(
+            BassStep(duration_frac=0.4, velocity=85, delay=(0.05, 0.12)),
+            BassStep(time=-0.5, time_frac=1.0, duration=0.4, velocity=75, interval=7, alt_interval=12, alt_chance=0.5, min_chord=2.0),
+        )),
+    ),
+    # Fallback: root on the downbeat, repeated halfway through
+    "basic": (
+        BassPattern(steps=(
+            sustain(0.45, 90),
+            BassStep(time_frac=0.5, duration_frac=0.45, velocity=85, min_chord=2.0),
+        )),
+    ),
+}
+
+# Styles that drop the bass note an octave when it sits above this pitch
+BASS_CEILINGS = {"deep": 36}
+
+COMPILED_BASS_STYLES = {
+    name: [(pattern, compile_pattern(pattern)) for pattern in patterns]
+    for name, patterns in BASS_STYLES.items()
+}
+
+def bass_roots(roots: np.ndarray, style: str = "basic") -> np.ndarray:
+    """Drops chord roots into the bass range (BASS_LOW..BASS_HIGH), octave by octave."""
+    roots = np.asarray(roots, dtype=int)
+    notes = np.where(roots > BASS_HIGH, roots - 12 * ((roots - BASS_HIGH + 11) // 12), roots)
+    notes = np.where(notes < BASS_LOW, notes + 12 * ((BASS_LOW - notes + 11) // 12), notes)
+    ceiling = BASS_CEILINGS.get(style)
+    if ceiling is not None:
+        notes = np.where(notes > ceiling, notes - 12, notes)
+    return notes
+
+def render_pattern(columns: Dict[str, np.ndarray], period: Optional[float], roots: np.ndarray, lengths: np.ndarray, gen: np.random.Generator):
+    """
+    Tiles one compiled pattern across chords. Returns chord index, pitch, time
+    (relative to the chord), duration and velocity for every event.
+    """
+    steps = len(columns["time"])
+    repeats = np.ones(len(lengths), dtype=int)
+    if period:
+        repeats = np.maximum(np.ceil(lengths / period).astype(int), 1)
+    per_chord = repeats * steps
+    chord = np.repeat(np.arange(len(lengths)), per_chord)
+    index = np.arange(len(chord)) - np.repeat(np.cumsum(per_chord) - per_chord, per_chord)
+    cycle, step = np.divmod(index, steps)
+
+    length = lengths[chord]
+    col = {name: values[step] for name, values in columns.items()}
+    keep = length >= col["min_chord"]
+    chord, cycle, length = chord[keep], cycle[keep], length[keep]
+    col = {name: values[keep] for name, values in col.items()}
+    n = len(chord)
+
+    time = col["time"] + col["time_frac"] * length + cycle * (period or 0.0)
+    time = time + gen.uniform(col["delay_low"], col["delay_high"], n)
+    duration = col["duration"] + col["duration_frac"] * length
+
+    interval = np.where(gen.random(n) < col["alt_chance"], col["alt_interval"], col["interval"])
+    jitter = col["velocity_jitter"].astype(int)
+    velocity = col["velocity"] + gen.integers(-jitter, jitter + 1)
+
+    return chord, roots[chord] + interval.astype(int), time, duration, velocity
+
+def render_bass(chords: List[Dict[str, Any]], style: str = "basic", rng=None) -> NoteArray:
+    """
+    Renders a bass line under a progression (list of {"notes", "duration"} dicts)
+    in the given BASS_STYLES style. Chords without notes are rests. Events are
+    cut off at the end of their chord and returned in playback order.
+    """
+    if style not in COMPILED_BASS_STYLES:
+        style = "basic"
+    gen = numpy_rng(rng)
+
+    lengths = np.array([c["duration"] for c in chords], dtype=float)
+    starts = np.cumsum(lengths) - lengths
+    played = np.array([bool(c["notes"]) for c in chords], dtype=bool)
+    if not played.any():
+        return NoteArray.empty()
+    lengths, starts = lengths[played], starts[played]
+    roots = bass_roots([c["notes"][0] for c in chords if c["notes"]], style)
+
+    patterns = COMPILED_BASS_STYLES[style]
+    if len(patterns) == 1:
+        choice = np.zeros(len(lengths), dtype=int)
+    else:
+        weights = np.array([p.weight for p, _ in patterns])
+        choice = gen.choice(len(patterns), size=len(lengths), p=weights / weights.sum())
+
+    parts = []
+    for i, (pattern, columns) in enumerate(patterns):
+        chord_ids = np.flatnonzero(choice == i)
+        if not len(chord_ids):
+            continue
+        chord, pitch, time, duration, velocity = render_pattern(columns, pattern.period, roots[chord_ids], lengths[chord_ids], gen)
+        chord = chord_ids[chord]
+        events = NoteArray(pitch.astype(PITCH_DTYPE), time, duration, velocity)
+        parts.append(events.clip(lengths[chord]).shift(starts[chord[time < lengths[chord]]]))
+
+    return NoteArray.concat(parts).sort()
@@ -1,9 +1,20 @@
 
+import logging
+import os
 import random
-from typing import List, Dict, Any
-from .scales import get_triad_notes, get_note_index, get_scale_intervals
-from .patterns import apply_arpeggio, apply_rhythm
+import numpy as np
+from functools import lru_cache
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+from .scales import SCALES, get_triad_notes, get_note_index, get_scale_intervals, normalize_scale
+from .patterns import apply_arpeggio, apply_rhythms, apply_rhythms_batch
+from .bass import render_bass
+from .voice_leading import optimize_voice_leading
 from .melody import generate_melody
+from .moods import MoodProfile, resolve_mood
+from .notes import NoteArray, numpy_rng
+from .hooks import stage, label_request, checkpoint
+
+logger = logging.getLogger(__name__)
 
 def smooth_voice_leading(current_notes: List[int], prev_notes: List[int]) -> List[int]:
     """
@@ -68,49 +79,129 @@ def smooth_voice_leading(current_notes: List[int], prev_notes: List[int]) -> Lis
         
     return [bass] + candidate_upper
 
-def get_smart_extension(degree: int, mood_key: str) -> str:
-    """
-    Decides the best extension based on chord function and genre.
-    """
-    # 1. Jazz/Neo-Soul/Lo-Fi: Complex extensions
-    if any(g in mood_key for g in ["jazz", "neo_soul", "lo_fi", "rnb"]):
-        if degree == 5: return random.choice(["9", "13", "7b9", "7#9", "alt"]) # Dominant variations
-        if degree == 2: return random.choice(["9", "11", "m9"]) # Supertonic
-        if degree == 1: return random.choice(["maj9", "6/9", "maj7"]) # Tonic
-        return random.choice(["7", "9", "11"])
-        
-    # 2. Future Bass / Kawaii: Lush 7ths/9ths
-    if "future_bass" in mood_key:
-        return random.choice(["maj9", "add9", "7"])
-        
-    # 3. Pop / House: Selective 7ths
-    if "pop" in mood_key or "house" in mood_key:
-        if degree == 5: return "7" # V7
-        if degree == 2: return "m7" # ii7
-        if degree == 6: return "m7" # vi7
-        if degree == 1: return random.choice(["triad", "add9", "sus2"])
-        return "triad"
-        
-    # 4. Drill / Trap / Dark: Tension
-    if "drill" in mood_key or "trap" in mood_key:
-        if degree == 5: return "m7" # Minor v for Phrygian feel
-        return "triad"
-
-    # 5. Walker / Epic: Emotional
-    if "walker" in mood_key or "epic" in mood_key:
-        if degree == 1: return random.choice(["add9", "sus2", "triad"])
-        if degree == 6: return random.choice(["m7", "add9"]) # vi is minor
-        if degree == 4: return "add9"
-        return "triad"
+# "greedy" (smooth_voice_leading, chord by chord) or "optimal" (optimize_voice_leading over the whole progression)
+VOICE_LEADING = os.getenv("VOICE_LEADING", "greedy")
+
+# --- Genre Voicings (The "Sauce") ---
+# Each transform takes the chord notes (root position) and returns the voiced chord.
+
+def voice_drill(notes: List[int], rng) -> List[int]:
+    # Drill Voicing: "Advanced Drill Trick" & Thinner Chords
+    original_root = notes[0]
+    
+    # "Remove 5th note sometimes" (make chords thinner)
+    # 30% chance to remove the 5th (index 2 in a triad/7th)
+    # Be careful with indices if we have extensions
+    if len(notes) >= 3 and rng.random() < 0.3:
+        # The 5th is usually at index 2
+        notes.pop(2)
+    
+    # Add Sub-Bass Root (Left Hand)
+    notes.insert(0, original_root - 12)
+    
+    # Remove the original root (now index 1) to clear up the mud
+    # So we get [Sub-Bass, 3rd, 5th, (7th)]
+    if len(notes) > 2: 
+         notes.pop(1)
+    return notes
+
+def voice_trap(notes: List[int], rng) -> List[int]:
+    # Trap Voicing: Spread chords (Open Voicing)
+    # Move the middle note (3rd) up an octave
+    if len(notes) >= 3: # Need at least 3 notes
+        # Index 1 is usually the 3rd
+        mid_note = notes.pop(1)
+        notes.append(mid_note + 12)
+    
+    # Add deep root
+    notes.insert(0, notes[0] - 12)
+    return notes
+
+def voice_drop2(notes: List[int], rng) -> List[int]:
+    # Neo Soul / Jazz Voicings
+    # Spread: Drop 2 (Move 2nd highest note down an octave)
+    if len(notes) >= 4:
+         # Drop 2 voicing
+         second_highest = notes.pop(-2)
+         notes.insert(0, second_highest - 12)
+    elif len(notes) == 3:
+         # Open triad
+         mid = notes.pop(1)
+         notes.append(mid + 12)
+    return notes
+
+def voice_sub_root(notes: List[int], rng) -> List[int]:
+    # House: parallel chords, close voicing but low
+    # Pop: Standard piano voicing: Left hand root, Right hand triad
+    notes.insert(0, notes[0] - 12)
+    return notes
+
+def voice_cinematic(notes: List[int], rng) -> List[int]:
+    # Wide spread
+    # Root, 5th, Root(+1), 3rd(+1)
+    # Current: Root, 3rd, 5th
+    if len(notes) >= 3:
+        root = notes[0]
+        third = notes[1]
+        fifth = notes[2]
         
-    return "triad"
+        notes = [root - 12, root, fifth, third + 12] # Open voicing
+    return notes
+
+def voice_supersaw(notes: List[int], rng) -> List[int]:
+    # Thick Super Saw Voicing
+    # Add deep root
+    notes.insert(0, notes[0] - 12)
+    
+    # Double the 3rd an octave up for brightness (Index 2 is 3rd after insert)
+    if len(notes) >= 3:
+        notes.append(notes[2] + 12)
+    # Sometimes double the 5th too
+    if len(notes) >= 4 and rng.random() > 0.5:
+        notes.append(notes[3] + 12)
+    return notes
+
+def voice_walker(notes: List[int], rng) -> List[int]:
+    # Wide, open voicing for emotion
+    # Root (Sub), Root, 5th, 3rd (+1 octave)
+    
+    # Add deep root
+    notes.insert(0, notes[0] - 12)
+    
+    # If we have a 3rd (usually index 2 after insert), move it up an octave
+    # [SubRoot, Root, 3rd, 5th] -> [SubRoot, Root, 5th, 3rd+12]
+    if len(notes) >= 4:
+        third = notes.pop(2) 
+        notes.append(third + 12)
+    return notes
+
+VOICINGS = {
+    "drill": voice_drill,
+    "trap": voice_trap,
+    "drop2": voice_drop2,
+    "sub_root": voice_sub_root,
+    "cinematic": voice_cinematic,
+    "supersaw": voice_supersaw,
+    "walker": voice_walker,
+}
 
 # --- Helper Functions ---
-def get_extended_chord_notes(key: str, scale: str, degree: int, octave: int = 4, extension: str = "triad") -> List[int]:
+# Chord shapes only depend on (scale, degree, extension); the key just transposes them.
+# Offsets are relative to the key root in the requested octave and are filled in
+# lazily (or all at once via build_chord_table), so a chord lookup is one dict hit.
+CHORD_TABLE: Dict[Tuple[str, int, str], Tuple[int, ...]] = {}
+
+# Every extension a MoodProfile / generate_progression can ask for
+CHORD_EXTENSIONS = [
+    "triad", "sus2", "sus4", "6", "6/9", "add9", "alt",
+    "7", "m7", "maj7", "9", "m9", "maj9", "7b9", "7#9", "11", "13"
+]
+
+def _build_chord_offsets(scale: str, degree: int, extension: str) -> Tuple[int, ...]:
     """
-    Generates notes for a chord including extensions (7th, 9th, 11th, alterations).
+    Works out the semitone offsets (from the key root) of a chord including
+    extensions (7th, 9th, 11th, alterations).
     """
-    root_val = get_note_index(key)
     intervals = get_scale_intervals(scale)
     
     # Create a long list of relative intervals spanning 3 octaves
@@ -160,9 +251,7 @@ def get_extended_chord_notes(key: str, scale: str, degree: int, octave: int = 4,
         if "13" in ext_clean:
              indices.append(deg_idx + 12) # 13th
         
-    # Calculate absolute MIDI notes
-    base_midi = (octave + 1) * 12 + root_val
-    notes = [base_midi + extended_intervals[i] for i in indices]
+    offsets = [extended_intervals[i] for i in indices]
     
     # Alterations (Post-processing)
     # Handle b9 / #9 / alt / b13 if present
@@ -177,20 +266,44 @@ def get_extended_chord_notes(key: str, scale: str, degree: int, octave: int = 4,
     if "alt" in ext_clean:
         # #9
         idx9 = find_index(8)
-        if idx9 is not None: notes[idx9] += 1
+        if idx9 is not None: offsets[idx9] += 1
         # b13
         idx13 = find_index(12)
-        if idx13 is not None: notes[idx13] -= 1
+        if idx13 is not None: offsets[idx13] -= 1
         # b5 or #5? Let's just do #9 b13 for now, very common jazz sound.
         
     if "b9" in ext_clean:
         idx = find_index(8)
-        if idx is not None: notes[idx] -= 1
+        if idx is not None: offsets[idx] -= 1
     elif "#9" in ext_clean:
         idx = find_index(8)
-        if idx is not None: notes[idx] += 1
+        if idx is not None: offsets[idx] += 1
         
-    return notes
+    return tuple(offsets)
+
+def build_chord_table() -> Dict[Tuple[str, int, str], Tuple[int, ...]]:
+    """Eagerly fills CHORD_TABLE for every scale x degree x extension (~1.2k entries)."""
+    for scale in SCALES:
+        if len(SCALES[scale]) != 7:
+            continue # Pentatonic scales are mapped to minor before chord building
+        for degree in range(1, 8):
+            for extension in CHORD_EXTENSIONS:
+                CHORD_TABLE[(scale, degree, extension)] = _build_chord_offsets(scale, degree, extension)
+    return CHORD_TABLE
+
+def get_extended_chord_notes(key: str, scale: str, degree: int, octave: int = 4, extension: str = "triad") -> List[int]:
+    """
+    Generates notes for a chord including extensions (7th, 9th, 11th, alterations).
+    """
+    # Keyed by the normalised scale so arbitrary client scale names can't grow the table
+    table_key = (normalize_scale(scale), degree, extension)
+    offsets = CHORD_TABLE.get(table_key)
+    if offsets is None:
+        offsets = CHORD_TABLE[table_key] = _build_chord_offsets(table_key[0], degree, extension)
+
+    # Calculate absolute MIDI notes
+    base_midi = (octave + 1) * 12 + get_note_index(key)
+    return [base_midi + o for o in offsets]
 
 def get_secondary_dominant(target_degree: int, key: str, scale: str, octave: int = 4) -> List[int]:
     """
@@ -494,11 +607,43 @@ PROGRESSIONS = {
     ]
 }
 
-def generate_procedural_progression(scale_type: str = "minor", mood: str = "dark_trap", length: int = 4) -> List[int]:
+# --- Genre Rhythm Strategies ---
+# Define available rhythm patterns for each genre
+GENRE_RHYTHMS = {
+    "walker": ["walker_piano", "walker_arp"], # Steady chords or emotional arps
+    "drill": ["drill_stabs", "drill_sustained", "drill_counter"],
+    "future_bass": ["future_bass_wub", "future_bass_saw", "future_bass_16th"],
+    "trap": ["trap_bounce", "drill_sustained", "basic"],
+    "rnb": ["neo_soul", "rnb_strum", "basic"],
+    "lo_fi": ["lofi_chop", "jazz_swing", "basic"],
+    "house": ["house_stab", "house_piano", "basic"],
+    "techno": ["techno_drive", "techno_rumble"],
+    "pop": ["pop_strum", "basic", "pop_arpeggio"],
+    "cinematic": ["cinematic_swell", "basic"],
+    "reggaeton": ["reggaeton", "reggaeton_bounce"],
+    "jazz": ["jazz_swing", "neo_soul"],
+    "dnb": ["dnb_pad", "dnb_stab"],
+    "dubstep": ["dubstep_wub", "drill_sustained"],
+    "trance": ["euro_trance", "trance_gate"],
+    "synthwave": ["synthwave_pulse", "synthwave_arps"]
+}
+
+# Define patterns that sound bad/gappy on short chords (< 3.0 beats)
+UNSAFE_PATTERNS = {
+    "drill_counter", # Starts late
+    "dnb_stab",      # Big gaps
+    "techno_rumble", # Gappy
+    "euro_trance",   # Gappy
+    "house_stab",    # Staccato, might feel empty
+    "future_bass_16th" # Ends early
+}
+
+def generate_procedural_progression(scale_type: str = "minor", mood: str = "dark_trap", length: int = 4, rng: Optional[random.Random] = None) -> List[int]:
     """
     Generates a unique, valid chord progression based on transition probabilities.
     This allows for infinite variations beyond static templates.
     """
+    rng = rng or random
     # Transition Rules (Simplified Markov Chain)
     # Key: Current Degree -> Value: List of likely Next Degrees
     transitions = {}
@@ -540,7 +685,7 @@ def generate_procedural_progression(scale_type: str = "minor", mood: str = "dark
         valid_options = [o for o in options if o != current]
         if not valid_options: valid_options = options
         
-        next_chord = random.choice(valid_options)
+        next_chord = rng.choice(valid_options)
         progression.append(next_chord)
         current = next_chord
         
@@ -550,63 +695,47 @@ def generate_procedural_progression(scale_type: str = "minor", mood: str = "dark
     
     return progression
 
-def generate_progression(key: str, scale: str, mood: str, length: int = 4, complexity: float = 0.5, pattern_override: List[int] = None) -> Dict[str, Any]:
+def resolve_settings(key: Optional[str], scale: Optional[str], mood: Optional[str], rng: Optional[random.Random] = None) -> Tuple[str, str, str]:
     """
-    Generates a chord progression based on key, scale, and mood.
+    Fills in Random/None key, scale and mood and applies scale fallbacks.
+    Returns the concrete (key, scale, mood) the rest of the pipeline works with.
     """
-    
+    rng = rng or random
+
     # Defaults for Random/None
     if not scale or scale == "Random":
-        scale = random.choice(["major", "minor", "dorian", "phrygian"])
+        scale = rng.choice(["major", "minor", "dorian", "phrygian"])
         
     if not mood or mood == "Random":
-        mood = random.choice(list(PROGRESSIONS.keys()))
+        mood = rng.choice(list(PROGRESSIONS.keys()))
 
     # Fallback for pentatonic scales (which don't support 7-degree chord logic)
     if "pentatonic" in scale:
         scale = "minor"
 
-    # 1. Select a progression pattern
-    mood_key = mood.lower().replace(" ", "_").replace("-", "_")
-
     # Handle Random Key
     if not key or key == "Random":
-        if "drill" in mood_key:
+        if "drill" in mood.lower():
             # Weighted probability for Drill: Fm, D#m, Cm favored
             drill_keys = ["F", "D#", "C", "A"]
             weights = [0.4, 0.3, 0.2, 0.1]
-            key = random.choices(drill_keys, weights=weights, k=1)[0]
+            key = rng.choices(drill_keys, weights=weights, k=1)[0]
         else:
-            key = random.choice(["C", "C#", "D", "D#", "E", "F", "F#", "G", "G#", "A", "A#", "B"])
-    
-    # Fallback map for similar genres
-    if mood_key not in PROGRESSIONS:
-        if "drill" in mood_key: mood_key = "uk_drill"
-        elif "faded" in mood_key or "walker" in mood_key: mood_key = "walker"
-        elif "lofi" in mood_key or "chill" in mood_key: mood_key = "lo_fi"
-        elif "r&b" in mood_key or "soul" in mood_key: mood_key = "rnb"
-        elif "jazz" in mood_key: mood_key = "jazz"
-        elif "cinematic" in mood_key: mood_key = "cinematic"
-        elif "house" in mood_key: mood_key = "house"
-        elif "pop" in mood_key: mood_key = "pop"
-        elif "future" in mood_key or "bass" in mood_key or "kawaii" in mood_key: mood_key = "future_bass"
-        elif "neo" in mood_key or "soul" in mood_key: mood_key = "neo_soul"
-        elif "reggaeton" in mood_key: mood_key = "reggaeton"
-        elif "techno" in mood_key or "rave" in mood_key: mood_key = "techno"
-        elif "gospel" in mood_key or "church" in mood_key: mood_key = "gospel"
-        elif "synth" in mood_key or "wave" in mood_key or "retro" in mood_key: mood_key = "synthwave"
-        elif "dubstep" in mood_key: mood_key = "dubstep"
-        elif "trance" in mood_key: mood_key = "trance"
-        elif "drum" in mood_key or "dnb" in mood_key: mood_key = "dnb"
-        elif "progressive" in mood_key: mood_key = "progressive_house"
-        elif "big" in mood_key and "room" in mood_key: mood_key = "big_room"
-        elif "electro" in mood_key: mood_key = "electro_house"
-        elif "tropical" in mood_key: mood_key = "tropical_house"
-        elif "hardstyle" in mood_key: mood_key = "hardstyle"
-        elif "melodic" in mood_key and "dubstep" in mood_key: mood_key = "melodic_dubstep"
-        elif scale == "phrygian": mood_key = "dark_trap"
-        elif scale == "dorian": mood_key = "boom_bap"
-        else: mood_key = "dark_trap" # Default
+            key = rng.choice(["C", "C#", "D", "D#", "E", "F", "F#", "G", "G#", "A", "A#", "B"])
+
+    return key, scale, mood
+
+def generate_progression(key: str, scale: str, mood: str, length: int = 4, complexity: float = 0.5, pattern_override: List[int] = None, rng: Optional[random.Random] = None, voice_leading: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Generates a chord progression based on key, scale, and mood.
+    voice_leading overrides the VOICE_LEADING setting ("greedy" or "optimal").
+    """
+    rng = rng or random
+    voice_leading = voice_leading or VOICE_LEADING
+    key, scale, mood = resolve_settings(key, scale, mood, rng)
+
+    # 1. Select a progression pattern
+    profile = resolve_mood(mood, scale)
             
     if not pattern_override:
         # Default mood inference
@@ -620,8 +749,8 @@ def generate_progression(key: str, scale: str, mood: str, length: int = 4, compl
         if len(full_pattern) < length:
             full_pattern = (full_pattern * (length // len(full_pattern) + 1))[:length]
     else:
-        templates = PROGRESSIONS.get(mood_key, PROGRESSIONS["dark_trap"])
-        pattern = random.choice(templates)
+        templates = PROGRESSIONS.get(profile.templates, PROGRESSIONS["dark_trap"])
+        pattern = rng.choice(templates)
         
         # Loop pattern if length > 4
         full_pattern = (pattern * (length // 4 + 1))[:length]
@@ -642,11 +771,11 @@ def generate_progression(key: str, scale: str, mood: str, length: int = 4, compl
             # 1. Secondary Dominant (V/X) OR Tritone Substitution (bII/X)
             # Insert V7 (or bII7) of current chord before current chord
             # Steals 2 beats from previous chord
-            if prev_chord["duration"] >= 3.0 and random.random() < (complexity * 0.4):
+            if prev_chord["duration"] >= 3.0 and rng.random() < (complexity * 0.4):
                 
                 is_tritone_sub = False
                 # Jazz/Neo Soul/Lo-Fi often use Tritone Subs
-                if any(m in mood_key for m in ["jazz", "neo_soul", "lo_fi"]) and random.random() < 0.3:
+                if profile.tritone_subs and rng.random() < 0.3:
                     is_tritone_sub = True
 
                 if is_tritone_sub:
@@ -681,7 +810,7 @@ def generate_progression(key: str, scale: str, mood: str, length: int = 4, compl
             # 2. Passing Diminished Chord
             # If moving by whole step (e.g. 1 -> 2), insert #1dim7
             # Ensure degrees are integers (skip if previous was a secondary dominant)
-            elif isinstance(prev_chord["degree"], int) and prev_chord["duration"] >= 3.0 and random.random() < (complexity * 0.4):
+            elif isinstance(prev_chord["degree"], int) and prev_chord["duration"] >= 3.0 and rng.random() < (complexity * 0.4):
                 pass_notes = get_passing_chord(prev_chord["degree"], degree, key, scale, octave=4)
                 if pass_notes:
                     prev_chord["duration"] -= 1.0 # Passing chords are quick
@@ -701,155 +830,25 @@ def generate_progression(key: str, scale: str, mood: str, length: int = 4, compl
         
         # Generate Notes
         # Use octave 3 or 4 depending on mood. Trap/Drill/Walker usually lower.
-        octave = 3 if any(x in mood_key for x in ["trap", "dark", "drill", "walker"]) else 4
+        octave = profile.octave
         
         # Determine Extension Strategy
         if isinstance(degree, int):
-            extension = get_smart_extension(degree, mood_key)
+            extension = profile.pick_extension(degree, complexity, rng)
         else:
             extension = "7" # Secondary dominants usually need the tritone (7th)
         
-        # Override for specific feels not covered by smart extension
-        if "cinematic" in mood_key:
-             extension = "triad" # Clean triads usually, maybe sus2/sus4 handled elsewhere
-        elif "pop" in mood_key:
-             extension = random.choice(["triad", "add9"]) # Add9 is common in pop
-        elif "walker" in mood_key or "epic" in mood_key:
-             # Wide, open voicing for emotion
-             extension = "triad" # We will manually adjust voicing later
-                 
-        elif "future_bass" in mood_key:
-             # Future Bass loves thick 7ths and 9ths
-             extension = random.choice(["7", "9", "add9"])
-        elif "trap" in mood_key and complexity > 0.7:
-             # Complex Trap uses 9ths for spookiness
-             extension = "9"
-        elif "neo_soul" in mood_key:
-             extension = random.choice(["9", "11", "7", "11"])
-        elif "reggaeton" in mood_key:
-             extension = random.choice(["triad", "7"])
-        elif "techno" in mood_key:
-             extension = "triad" # Clean, driving
-        elif "gospel" in mood_key:
-             extension = random.choice(["7", "9", "13", "11"])
-        elif "synthwave" in mood_key:
-             extension = random.choice(["triad", "7", "add9"])
-        elif "dubstep" in mood_key:
-             extension = random.choice(["triad", "7"])
-        elif "trance" in mood_key:
-             extension = random.choice(["triad", "sus4", "sus2"]) # Trance loves sus chords
-        elif "dnb" in mood_key:
-             extension = random.choice(["7", "9", "triad"]) # Liquid DnB loves 7ths
-        elif "progressive" in mood_key:
-             extension = random.choice(["triad", "7", "add9"])
-        elif "big_room" in mood_key:
-             extension = "triad" # Simple power
-        elif "electro" in mood_key:
-             extension = random.choice(["triad", "7"])
-        elif "tropical" in mood_key:
-             extension = random.choice(["triad", "6", "add9"]) # 6th chords are nice here
-        elif "hardstyle" in mood_key:
-             extension = "triad" # Detuned saws don't like complex intervals
-        elif "melodic_dubstep" in mood_key:
-             extension = random.choice(["7", "9", "add9"]) # Big emotional supersaws
-        
         notes = get_extended_chord_notes(key, scale, degree, octave=octave, extension=extension)
 
-
         # Apply Voicings (The "Sauce")
         
         # 1. Genre-Specific Voicings
-        if "drill" in mood_key:
-            # Drill Voicing: "Advanced Drill Trick" & Thinner Chords
-            
-            original_root = notes[0]
-            
-            # "Remove 5th note sometimes" (make chords thinner)
-            # 30% chance to remove the 5th (index 2 in a triad/7th)
-            # Be careful with indices if we have extensions
-            if len(notes) >= 3 and random.random() < 0.3:
-                # The 5th is usually at index 2
-                notes.pop(2)
-            
-            # Add Sub-Bass Root (Left Hand)
-            notes.insert(0, original_root - 12)
-            
-            # Remove the original root (now index 1) to clear up the mud
-            # So we get [Sub-Bass, 3rd, 5th, (7th)]
-            if len(notes) > 2: 
-                 notes.pop(1)
-            
-        elif "trap" in mood_key:
-            # Trap Voicing: Spread chords (Open Voicing)
-            # Move the middle note (3rd) up an octave
-            if len(notes) >= 3: # Need at least 3 notes
-                # Index 1 is usually the 3rd
-                mid_note = notes.pop(1)
-                notes.append(mid_note + 12)
-            
-            # Add deep root
-            notes.insert(0, notes[0] - 12)
-            
-        elif "rnb" in mood_key or "lo_fi" in mood_key or "jazz" in mood_key:
-            # Neo Soul / Jazz Voicings
-            # Spread: Drop 2 (Move 2nd highest note down an octave)
-            if len(notes) >= 4:
-                 # Drop 2 voicing
-                 second_highest = notes.pop(-2)
-                 notes.insert(0, second_highest - 12)
-            elif len(notes) == 3:
-                 # Open triad
-                 mid = notes.pop(1)
-                 notes.append(mid + 12)
-                 
-        elif "house" in mood_key:
-             # Deep House: Parallel minor 7ths usually, close voicing but low
-             # Add sub root
-             notes.insert(0, notes[0] - 12)
-             
-        elif "cinematic" in mood_key:
-             # Wide spread
-             # Root, 5th, Root(+1), 3rd(+1)
-             # Current: Root, 3rd, 5th
-             if len(notes) >= 3:
-                 root = notes[0]
-                 third = notes[1]
-                 fifth = notes[2]
-                 
-                 notes = [root - 12, root, fifth, third + 12] # Open voicing
-                 
-        elif "pop" in mood_key:
-             # Standard piano voicing: Left hand root, Right hand triad
-             notes.insert(0, notes[0] - 12)
-
-        elif "future_bass" in mood_key:
-             # Thick Super Saw Voicing
-             # Add deep root
-             notes.insert(0, notes[0] - 12)
-             
-             # Double the 3rd an octave up for brightness (Index 2 is 3rd after insert)
-             if len(notes) >= 3:
-                 notes.append(notes[2] + 12)
-             # Sometimes double the 5th too
-             if len(notes) >= 4 and random.random() > 0.5:
-                 notes.append(notes[3] + 12)
-
-        elif "walker" in mood_key or "epic" in mood_key:
-             # Wide, open voicing for emotion
-             # Root (Sub), Root, 5th, 3rd (+1 octave)
-             
-             # Add deep root
-             notes.insert(0, notes[0] - 12)
-             
-             # If we have a 3rd (usually index 2 after insert), move it up an octave
-             # [SubRoot, Root, 3rd, 5th] -> [SubRoot, Root, 5th, 3rd+12]
-             if len(notes) >= 4:
-                 third = notes.pop(2) 
-                 notes.append(third + 12)
+        if profile.voicing:
+            notes = VOICINGS[profile.voicing](notes, rng)
         
         # 2. Inversions for smooth voice leading (only if not Drill/Trap/Techno which like parallel motion)
-        # Also exclude Walker/Epic which have manual wide voicing
-        if i > 0 and not any(g in mood_key for g in ["drill", "trap", "techno", "house", "dubstep", "walker", "epic"]):
+        # Also exclude Walker which has manual wide voicing
+        if i > 0 and profile.voice_leading and voice_leading != "optimal":
             # Check against the *last* chord added
             prev_notes = chords_output[-1]["notes"]
             notes = smooth_voice_leading(notes, prev_notes)
@@ -860,8 +859,13 @@ def generate_progression(key: str, scale: str, mood: str, length: int = 4, compl
             "degree": degree,
             "notes": notes,
             "duration": duration,
-            "velocity": 80 + random.randint(-5, 5) # Humanize slightly
+            "velocity": 80 + rng.randint(-5, 5) # Humanize slightly
         })
+
+    if profile.voice_leading and voice_leading == "optimal":
+        voiced = optimize_voice_leading([chord["notes"] for chord in chords_output])
+        for chord, notes in zip(chords_output, voiced):
+            chord["notes"] = notes
         
     return {
         "key": key,
@@ -870,381 +874,275 @@ def generate_progression(key: str, scale: str, mood: str, length: int = 4, compl
         "progression": chords_output
     }
 
-def generate_track_data(key: str, scale: str, mood: str, length: int = 4, complexity: float = 0.5, melody: bool = True, tempo: int = 140, pattern_override: List[int] = None) -> Dict[str, Any]:
+def render_chord_rhythms(chords_output: List[Dict[str, Any]], profile: MoodProfile, complexity: float, rng: random.Random, np_rng: Optional[np.random.Generator] = None) -> NoteArray:
     """
-    Generates a full track including chords (potentially rhythmic) and melody.
+    Rhythm stage: turns block chords into a stream of note events in the mood's
+    rhythm patterns (or arpeggios). Patterns are queued as jobs and rendered for
+    the whole track in one vectorised pass.
     """
-    # 1. Generate basic chord progression
-    prog_data = generate_progression(key, scale, mood, length, complexity, pattern_override=pattern_override)
-    chords_output = prog_data["progression"]
-    
-    # Update key, scale, mood if they were randomized/defaulted
-    key = prog_data["key"]
-    scale = prog_data["scale"]
-    mood = prog_data["mood"]
-    
-    # 2. Apply Rhythmic Patterns / Complex Playing to Chords
-    # We convert block chords into a stream of note events
-    chord_events = []
-    
-    mood_key = mood.lower()
-    
-    # Normalize mood_key to ensure it matches genre_rhythms keys
-    if "drill" in mood_key: mood_key = "drill"
-    elif "lofi" in mood_key or "chill" in mood_key: mood_key = "lo_fi"
-    elif "r&b" in mood_key or "soul" in mood_key: mood_key = "rnb"
-    elif "future" in mood_key or "bass" in mood_key or "kawaii" in mood_key: mood_key = "future_bass"
-    elif "techno" in mood_key or "rave" in mood_key: mood_key = "techno"
-    elif "synth" in mood_key or "wave" in mood_key: mood_key = "synthwave"
-    elif "drum" in mood_key or "dnb" in mood_key: mood_key = "dnb"
-    elif "reggaeton" in mood_key: mood_key = "reggaeton"
-    elif "dubstep" in mood_key: mood_key = "dubstep"
-    elif "trance" in mood_key: mood_key = "trance"
-    elif "house" in mood_key: mood_key = "house"
-    elif "pop" in mood_key: mood_key = "pop"
-    elif "cinematic" in mood_key: mood_key = "cinematic"
-    elif "walker" in mood_key or "faded" in mood_key: mood_key = "walker"
-    elif "jazz" in mood_key: mood_key = "jazz"
-    elif "trap" in mood_key: mood_key = "trap"
+    np_rng = numpy_rng(rng) if np_rng is None else np_rng
+    rhythm_jobs, arp_parts = plan_chord_rhythms(chords_output, profile, complexity, rng, np_rng)
+    return join_chord_rhythms(apply_rhythms(rhythm_jobs, rng=np_rng), arp_parts)
+
+def join_chord_rhythms(patterns: NoteArray, arp_parts: List[NoteArray]) -> NoteArray:
+    # Events come out at absolute time; keep the track in playback order
+    chord_events = NoteArray.concat([patterns] + arp_parts).sort()
+    logger.debug("Total chord_events: %d", len(chord_events))
+    return chord_events
+
+def plan_chord_rhythms(chords_output: List[Dict[str, Any]], profile: MoodProfile, complexity: float, rng: random.Random, np_rng: np.random.Generator) -> Tuple[List[tuple], List[NoteArray]]:
+    """Picks each chord's pattern: apply_rhythms jobs, plus the arpeggios (already rendered)."""
+    rhythm_jobs = [] # (notes, pattern, duration, strum, start)
+    arp_parts = []
 
     current_time = 0.0 # Track time dynamically as chords vary in duration
     
-    # --- Genre Rhythm Strategies ---
-    # Define available rhythm patterns for each genre
-    genre_rhythms = {
-        "walker": ["walker_piano", "walker_arp"], # Steady chords or emotional arps
-        "drill": ["drill_stabs", "drill_sustained", "drill_counter"],
-        "future_bass": ["future_bass_wub", "future_bass_saw", "future_bass_16th"],
-        "trap": ["trap_bounce", "drill_sustained", "basic"],
-        "rnb": ["neo_soul", "rnb_strum", "basic"],
-        "lo_fi": ["lofi_chop", "jazz_swing", "basic"],
-        "house": ["house_stab", "house_piano", "basic"],
-        "techno": ["techno_drive", "techno_rumble"],
-        "pop": ["pop_strum", "basic", "pop_arpeggio"],
-        "cinematic": ["cinematic_swell", "basic"],
-        "reggaeton": ["reggaeton", "reggaeton_bounce"],
-        "jazz": ["jazz_swing", "neo_soul"],
-        "dnb": ["dnb_pad", "dnb_stab"],
-        "dubstep": ["dubstep_wub", "drill_sustained"],
-        "trance": ["euro_trance", "trance_gate"],
-        "synthwave": ["synthwave_pulse", "synthwave_arps"]
-    }
-
     # Determine rhythm key
-    rhythm_key = "basic"
-    for key_name in genre_rhythms:
-        if key_name in mood_key:
-            rhythm_key = key_name
-            break
+    rhythm_key = profile.rhythm_set
     
-    print(f"DEBUG: mood_key={mood_key}, rhythm_key={rhythm_key}")
+    logger.debug("mood_profile=%s, rhythm_key=%s", profile.name, rhythm_key)
 
     # Select a strategy for the whole track or per chord?
     # Let's mix it up. 70% chance to stick to one pattern, 30% to vary per chord.
-    main_pattern = random.choice(genre_rhythms.get(rhythm_key, ["basic"]))
-    vary_per_chord = random.random() > 0.7
+    main_pattern = rng.choice(GENRE_RHYTHMS.get(rhythm_key, ["basic"]))
+    vary_per_chord = rng.random() > 0.7
     
-    # Define patterns that sound bad/gappy on short chords (< 3.0 beats)
-    unsafe_patterns = [
-        "drill_counter", # Starts late
-        "dnb_stab",      # Big gaps
-        "techno_rumble", # Gappy
-        "euro_trance",   # Gappy
-        "house_stab",    # Staccato, might feel empty
-        "future_bass_16th" # Ends early
-    ]
-
     for i, chord in enumerate(chords_output):
         duration = chord["duration"]
         
         # Decide pattern for this chord
         if vary_per_chord:
-            available_patterns = genre_rhythms.get(rhythm_key, ["basic"])
+            available_patterns = GENRE_RHYTHMS.get(rhythm_key, ["basic"])
             # Filter unsafe patterns for short chords (avoid initial silence)
             if duration < 3.0:
-                 available_patterns = [p for p in available_patterns if p not in unsafe_patterns]
+                 available_patterns = [p for p in available_patterns if p not in UNSAFE_PATTERNS]
                  if not available_patterns: available_patterns = ["basic"]
             
-            pattern_name = random.choice(available_patterns)
+            pattern_name = rng.choice(available_patterns)
         else:
             pattern_name = main_pattern
             # Fallback for short chords if main pattern is unsafe
-            if duration < 3.0 and pattern_name in unsafe_patterns:
+            if duration < 3.0 and pattern_name in UNSAFE_PATTERNS:
                 pattern_name = "basic"
 
         # Special Case: Arpeggios for certain genres/sections
         use_arpeggio = False
-        if "pop" in mood_key and random.random() < 0.2: use_arpeggio = True
-        if "synthwave" in mood_key and random.random() < 0.4: use_arpeggio = True
-        if "trance" in mood_key and random.random() < 0.5: use_arpeggio = True
-        if "trap" in mood_key and complexity > 0.7 and random.random() < 0.3: use_arpeggio = True
+        if profile.arp_probability and complexity > profile.arp_min_complexity and rng.random() < profile.arp_probability:
+            use_arpeggio = True
 
         if use_arpeggio:
             # Apply Arpeggio
-            arp_type = random.choice(["up", "down", "up_down", "converge", "diverge"])
-            rate = 0.25
-            if "trap" in mood_key: rate = 0.125 # Fast trap arps
-            events = apply_arpeggio(chord["notes"], pattern_type=arp_type, length=duration, rate=rate) 
-        elif "walker" in mood_key and len(chord["notes"]) >= 3:
+            arp_type = rng.choice(["up", "down", "up_down", "converge", "diverge"])
+            rate = profile.arp_rate
+            arp_parts.append(apply_arpeggio(chord["notes"], pattern_type=arp_type, length=duration, rate=rate, rng=np_rng).shift(current_time))
+        elif profile.split_bass and len(chord["notes"]) >= 3:
             # Walker Special: Split Bass and Chords for clarity
             # Notes structure from walker voicing: [SubRoot, Root, 5th, 3rd(high)]
             
-            print(f"DEBUG: Processing Walker Special for chord {i}")
+            logger.debug("Processing Walker Special for chord %d", i)
 
             # 1. Bass (Bottom 1 note) - Deep Pulse
             bass_notes = [chord["notes"][0]]
             # Pattern: Sustained bass
             bass_pattern_name = "basic" 
-            bass_events = apply_rhythm(bass_notes, bass_pattern_name, duration, strum_speed=0.0)
+            rhythm_jobs.append((bass_notes, bass_pattern_name, duration, 0.0, current_time))
             
             # 2. Chords (Top notes) - Rhythmic Piano
             # Include the Root, 5th, and High 3rd for a fuller sound
             chord_notes = chord["notes"][1:]
             # Pattern: walker_piano (8th notes)
             chord_pattern_name = "walker_piano"
-            upper_events = apply_rhythm(chord_notes, chord_pattern_name, duration, strum_speed=0.0)
-            
-            events = bass_events + upper_events
-            print(f"DEBUG: Walker events generated: {len(events)}")
+            rhythm_jobs.append((chord_notes, chord_pattern_name, duration, 0.0, current_time))
             
         else:
             # Apply Rhythm Pattern
             # Special strum speeds
-            strum = 0.0
-            if "rnb" in mood_key: strum = 0.03
-            if "lofi" in mood_key: strum = 0.05
+            strum = profile.strum
             
-            events = apply_rhythm(chord["notes"], pattern_name, duration, strum_speed=strum)
-                
-        # Shift events to absolute time
-        if not events:
-            print(f"DEBUG: No events generated for chord {i}")
-        
-        for event in events:
-            event["time"] += current_time
-            # Ensure time is never negative (Tone.js doesn't like negative time)
-            if event["time"] < 0:
-                event["time"] = 0.0
-            chord_events.append(event)
+            rhythm_jobs.append((chord["notes"], pattern_name, duration, strum, current_time))
             
         current_time += duration
-    
-    print(f"DEBUG: Total chord_events: {len(chord_events)}")
+    return rhythm_jobs, arp_parts
+
+def generate_track_data(key: str, scale: str, mood: str, length: int = 4, complexity: float = 0.5, melody: bool = True, tempo: int = 140, pattern_override: List[int] = None, seed: Optional[int] = None, rng: Optional[random.Random] = None) -> Dict[str, Any]:
+    """
+    Generates a full track including chords (potentially rhythmic) and melody.
+
+    All randomness is drawn from a single per-call `random.Random`, so passing the
+    same `seed` (with the same settings) reproduces the same track. When neither
+    `seed` nor `rng` is given a fresh seed is drawn and returned in the result.
+    """
+    if rng is None:
+        if seed is None:
+            seed = random.getrandbits(32)
+        rng = random.Random(seed)
+    return render_tracks(key, scale, mood, length, complexity, melody, tempo, pattern_override, [(rng, seed)])[0]
+
+def render_tracks(key: str, scale: str, mood: str, length: int, complexity: float, melody: bool, tempo: int, pattern_override: Optional[List[int]], rngs: List[Tuple[random.Random, Optional[int]]]) -> List[Dict[str, Any]]:
+    """
+    The generation pipeline for one track per (rng, seed), run stage by stage
+    across all of them. Each track draws from its own rng exactly as it would
+    alone; mood profiles are resolved once per distinct mood and the rhythm
+    patterns of every track are rendered in one vectorised pass.
+    """
+    # 1. Generate basic chord progressions
+    # (checkpoint: stop between stages once the request is out of time or cancelled)
+    checkpoint("progression")
+    with stage("progression"):
+        progressions = [
+            generate_progression(key, scale, mood, length, complexity, pattern_override=pattern_override, rng=rng)
+            for rng, _ in rngs
+        ]
+    # Key, scale and mood as resolved if they were randomized/defaulted
+    label_request(mood=progressions[0]["mood"], length=length)
+
+    profiles = {}
+    for prog in progressions:
+        settings = (prog["mood"], prog["scale"])
+        if settings not in profiles:
+            profiles[settings] = resolve_mood(*settings)
+    np_rngs = [numpy_rng(rng) for rng, _ in rngs] # Shared by each track's vectorised pattern stages
+
+    # 2. Apply Rhythmic Patterns / Complex Playing to Chords
+    checkpoint("rhythm")
+    with stage("rhythm"):
+        plans = [
+            plan_chord_rhythms(prog["progression"], profiles[prog["mood"], prog["scale"]], complexity, rng, np_rng)
+            for prog, (rng, _), np_rng in zip(progressions, rngs, np_rngs)
+        ]
+        patterns = apply_rhythms_batch([jobs for jobs, _ in plans], np_rngs)
+        chord_events = [join_chord_rhythms(part, arp_parts) for part, (_, arp_parts) in zip(patterns, plans)]
 
     # 3. Generate Melody (if requested)
-    melody_events = []
+    melody_events = [NoteArray.empty()] * len(rngs)
     if melody:
-        melody_events = generate_melody(key, scale, chords_output, complexity, mood)
+        checkpoint("melody")
+        with stage("melody"):
+            melody_events = [
+                generate_melody(prog["key"], prog["scale"], prog["progression"], complexity, prog["mood"], rng=rng)
+                for prog, (rng, _) in zip(progressions, rngs)
+            ]
 
-    # 4. Generate Bass Line
-    bass_events = []
-    current_bass_time = 0.0
-    
-    for i, chord in enumerate(chords_output):
-        duration = chord["duration"]
-        if not chord["notes"]:
-            current_bass_time += duration
-            continue
-            
-        # Extract root (lowest note usually)
-        root = chord["notes"][0]
-        
-        # Drop to Bass Range (approx E1-G2: 28-43)
-        bass_note = root
-        while bass_note > 45: # A2
-            bass_note -= 12
-        while bass_note < 28: # E1 (extended range for deep bass)
-            bass_note += 12
-            
-        # Intervals
-        fifth_note = bass_note + 7
-        octave_note = bass_note + 12
-        
-        # Determine Bass Rhythm based on Mood
-        b_events = []
-        
-        mood_lower = mood.lower()
-        
-        if "house" in mood_lower or "techno" in mood_lower or "trance" in mood_lower or "dance" in mood_lower:
-            # Driving Offbeat Bass with Octaves
-            # Pattern: Rest, Root, Rest, Octave...
-            step = 0.5
-            for t in range(int(duration / step)):
-                if t % 2 != 0: # Offbeat
-                    note_to_play = bass_note
-                    # Add octave jump variation every 4th beat or randomly
-                    if t % 4 == 3 or random.random() < 0.3:
-                        note_to_play = octave_note
-                        
-                    b_events.append({
-                        "note": note_to_play,
-                        "time": t * step,
-                        "duration": step * 0.8,
-                        "velocity": 100 + random.randint(-5, 5)
-                    })
-
-        elif "drill" in mood_lower or "trap" in mood_lower or "hip hop" in mood_lower:
-            # 808 Style: Long sustained notes with rhythmic glides/fills
-            # Pattern: Boom....... (fill)
-            
-            # Main sustain
-            b_events.append({
-                "note": bass_note,
-                "time": 0.0,
-                "duration": duration * 0.85, # Leave a small gap
-                "velocity": 110
-            })
-            
-            # Occasional fill at the end of the bar (last 16th or 8th)
-            if duration >= 2.0 and random.random() < 0.4:
-                # Add a quick note at the end to lead to next chord
-                b_events.append({
-                    "note": bass_note, # Or slide?
-                    "time": duration - 0.5,
-                    "duration": 0.25,
-                    "velocity": 90
-                })
-                b_events.append({
-                    "note": bass_note, 
-                    "time": duration - 0.25,
-                    "duration": 0.2,
-                    "velocity": 80
-                })
-
-        elif "future_bass" in mood_lower or "dubstep" in mood_lower:
-            # Rhythmic following of chords, but mono
-            # Dotted rhythms: 3/16, 3/16, 2/16 (3+3+2)
-            if random.random() < 0.6:
-                # 3+3+2 pattern (on 16th notes: 0, 0.75, 1.5)
-                # Scaled to 8th notes step = 0.5. 
-                # 3+3+2 in 16ths = 1.5 beats + 1.5 beats + 1 beat = 4 beats
-                
-                # Beat 1
-                b_events.append({"note": bass_note, "time": 0.0, "duration": 0.7, "velocity": 110})
-                # Beat 2.5 (dotted quarter)
-                b_events.append({"note": bass_note, "time": 1.5, "duration": 0.7, "velocity": 105})
-                # Beat 4 (quarter) - wait, 1.5+1.5=3. So beat 4 is next.
-                b_events.append({"note": bass_note, "time": 3.0, "duration": 0.9, "velocity": 100})
-            else:
-                # Simple Sustain
-                b_events.append({
-                    "note": bass_note,
-                    "time": 0.0,
-                    "duration": duration * 0.9,
-                    "velocity": 110
-                })
-
-        elif "pop" in mood_lower or "rock" in mood_lower or "punk" in mood_lower:
-            # Driving 8th notes with Root-Fifth alternation
-            step = 0.5
-            for t in range(int(duration / step)):
-                note_to_play = bass_note
-                
-                # Rock/Punk: Straight 8ths, downpicking (consistent velocity)
-                # Pop: Root on 1, Fifth on 3 maybe?
-                
-                # Variation: Play 5th on weak beats sometimes
-                if t % 4 == 2 and random.random() < 0.3: # Beat 2
-                     note_to_play = fifth_note
-                elif t % 4 == 3 and random.random() < 0.3: # Beat 2.5
-                     note_to_play = octave_note
-                     
-                # Velocity accents on downbeats (0, 2, 4...)
-                vel = 100 if t % 2 == 0 else 85
-                
-                b_events.append({
-                    "note": note_to_play,
-                    "time": t * step,
-                    "duration": step * 0.7, # Slightly staccato
-                    "velocity": vel + random.randint(-5, 5)
-                })
-
-        elif "funk" in mood_lower or "disco" in mood_lower:
-            # Syncopated 16th notes, Octaves, Ghost notes
-            # Simplified: Root on 1, Octave on 1.5, rests
-            
-            # Beat 1: Root
-            b_events.append({"note": bass_note, "time": 0.0, "duration": 0.4, "velocity": 105})
-            
-            # Beat 1.75 (16th pickup to 2)? Or Beat 2?
-            # Let's do Root - Octave pattern
-            if duration >= 2.0:
-                 # Beat 2: Octave (short)
-                 b_events.append({"note": octave_note, "time": 1.0, "duration": 0.2, "velocity": 95})
-                 # Beat 2.5: Root
-                 b_events.append({"note": bass_note, "time": 1.5, "duration": 0.4, "velocity": 100})
-                 # Beat 3.5: Octave
-                 b_events.append({"note": octave_note, "time": 2.5, "duration": 0.2, "velocity": 95})
-                 # Beat 3.75: Octave
-                 b_events.append({"note": octave_note, "time": 2.75, "duration": 0.2, "velocity": 90})
-
-        elif "walker" in mood_lower or "cinematic" in mood_lower:
-             # Deep, long, low
-             bass_note_deep = bass_note
-             if bass_note_deep > 36: bass_note_deep -= 12
-             b_events.append({
-                "note": bass_note_deep,
-                "time": 0.0,
-                "duration": duration,
-                "velocity": 95
-            })
-             
-        elif "lo_fi" in mood_lower or "rnb" in mood_lower or "neo_soul" in mood_lower:
-            # Laid back, late
-            # Root on 1
-            b_events.append({
-                "note": bass_note,
-                "time": random.uniform(0.05, 0.12), # Laid back
-                "duration": duration * 0.4,
-                "velocity": 85
-            })
-            
-            # Maybe a pickup note at the end?
-            if random.random() < 0.5 and duration >= 2:
-                 b_events.append({
-                    "note": fifth_note if random.random() < 0.5 else octave_note,
-                    "time": duration - 0.5,
-                    "duration": 0.4,
-                    "velocity": 75
-                })
+    # 4. Generate Bass Lines
+    checkpoint("bass")
+    with stage("bass"):
+        bass_events = [
+            render_bass(prog["progression"], profiles[prog["mood"], prog["scale"]].bass_style, rng=np_rng)
+            for prog, np_rng in zip(progressions, np_rngs)
+        ]
+
+    return [
+        {
+            "key": prog["key"],
+            "scale": prog["scale"],
+            "mood": prog["mood"],
+            "chords": chords,
+            "melody": melody_notes,
+            "bass": bass,
+            "raw_progression": prog["progression"],
+            "progression": prog["progression"], # Alias for frontend compatibility
+            "tempo": tempo,
+            "seed": seed
+        }
+        for prog, chords, melody_notes, bass, (_, seed) in zip(progressions, chord_events, melody_events, bass_events, rngs)
+    ]
+
+def generate_track_data_batch(n: int, key: str, scale: str, mood: str, length: int = 4, complexity: float = 0.5, melody: bool = True, tempo: int = 140, pattern_override: List[int] = None, seed: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Generates n variations of the same settings in one pass.
+
+    Random key/scale/mood are resolved once up front so every variation shares them;
+    each track then gets its own seed drawn from the batch RNG. A track can be
+    reproduced on its own by calling generate_track_data with its returned
+    key/scale/mood and seed.
+    """
+    key, scale, mood, seeds = batch_plan(key, scale, mood, seed)
+    track_seeds = [next(seeds) for _ in range(n)]
+    return render_tracks(key, scale, mood, length, complexity, melody, tempo, pattern_override, [(random.Random(s), s) for s in track_seeds])
+
+def batch_plan(key: str, scale: str, mood: str, seed: Optional[int] = None) -> Tuple[str, str, str, Iterator[int]]:
+    """
+    Resolves random key/scale/mood once for a batch and returns them with an endless
+    iterator of per-track seeds (the same sequence generate_track_data_batch uses),
+    so large batches can be generated lazily, one track at a time.
+    """
+    batch_rng = random.Random(seed)
+    key, scale, mood = resolve_settings(key, scale, mood, batch_rng)
+
+    def seeds():
+        while True:
+            yield batch_rng.getrandbits(32)
+    return key, scale, mood, seeds()
+
+# --- Partial Regeneration ---
+# Rhythm, melody and bass are each rendered from the block-chord progression
+# alone, so one layer can be re-rolled over an existing raw_progression (as
+# returned by generate_track_data) without regenerating the chords the user
+# wants to keep. Each call draws from its own seed, like generate_track_data.
+
+def regenerate_rhythm(progression: List[Dict[str, Any]], scale: str, mood: str, complexity: float = 0.5, rng: Optional[random.Random] = None) -> NoteArray:
+    """New rhythm patterns (the "chords" part) for the same progression."""
+    rng = rng or random.Random()
+    return render_chord_rhythms(progression, resolve_mood(mood, scale), complexity, rng)
+
+def regenerate_melody(progression: List[Dict[str, Any]], key: str, scale: str, mood: str, complexity: float = 0.5, rng: Optional[random.Random] = None) -> NoteArray:
+    """A new melody over the same progression."""
+    rng = rng or random.Random()
+    return generate_melody(key, scale, progression, complexity, mood, rng=rng)
 
+def regenerate_bass(progression: List[Dict[str, Any]], scale: str, mood: str, rng: Optional[random.Random] = None) -> NoteArray:
+    """A new bass line under the same progression."""
+    rng = rng or random.Random()
+    return render_bass(progression, resolve_mood(mood, scale).bass_style, rng=numpy_rng(rng))
+
+# Layer name -> track part it replaces
+TRACK_LAYERS = {"rhythm": "chords", "melody": "melody", "bass": "bass"}
+
+def regenerate_layer(layer: str, progression: List[Dict[str, Any]], key: str, scale: str, mood: str, complexity: float = 0.5, seed: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Re-rolls one layer ("rhythm", "melody" or "bass") of a track over its
+    raw_progression. Returns the new part under its track key (rhythm replaces
+    "chords") with the settings and seed used; the same seed reproduces it.
+    """
+    if layer not in TRACK_LAYERS:
+        raise ValueError(f"Unknown layer: {layer!r}")
+    if seed is None:
+        seed = random.getrandbits(32)
+    rng = random.Random(seed)
+    label_request(mood=mood)
+    with stage(layer):
+        if layer == "rhythm":
+            notes = regenerate_rhythm(progression, scale, mood, complexity, rng=rng)
+        elif layer == "melody":
+            notes = regenerate_melody(progression, key, scale, mood, complexity, rng=rng)
         else:
-            # Basic fallback: Root note on downbeat, maybe repeat on beat 3
-            b_events.append({
-                "note": bass_note,
-                "time": 0.0,
-                "duration": duration * 0.45,
-                "velocity": 90
-            })
-            if duration >= 2.0:
-                b_events.append({
-                    "note": bass_note,
-                    "time": duration / 2, # Halfway
-                    "duration": duration * 0.45,
-                    "velocity": 85
-                })
-            
-        # Shift events to absolute time and add to main list
-        for event in b_events:
-            # Make sure we don't exceed chord duration
-            if event["time"] < duration:
-                # Clip duration if it goes over
-                if event["time"] + event["duration"] > duration:
-                    event["duration"] = duration - event["time"]
-                    
-                event["time"] += current_bass_time
-                bass_events.append(event)
-            
-        current_bass_time += duration
+            notes = regenerate_bass(progression, scale, mood, rng=rng)
+    return {"key": key, "scale": scale, "mood": mood, TRACK_LAYERS[layer]: notes, "seed": seed}
 
-    return {
-        "key": key,
-        "scale": scale,
-        "mood": mood,
-        "chords": chord_events,
-        "melody": melody_events,
-        "bass": bass_events,
-        "raw_progression": chords_output,
-        "progression": chords_output, # Alias for frontend compatibility
-        "tempo": tempo
-    }
+# --- Result Cache ---
+# Seeded generation is fully deterministic, so repeated requests for the same
+# settings (e.g. re-clicking a preset) can be answered from memory.
+TRACK_CACHE_SIZE = int(os.getenv("TRACK_CACHE_SIZE", "256"))
+
+def complexity_bucket(complexity: float) -> float:
+    """Snaps complexity to 0.05 steps so near-identical slider values share a cache entry."""
+    return round(round(complexity * 20) / 20, 2)
+
+@lru_cache(maxsize=TRACK_CACHE_SIZE)
+def _cached_track_data(key: str, scale: str, mood: str, length: int, complexity: float, tempo: int, melody: bool, seed: int) -> Dict[str, Any]:
+    return generate_track_data(key, scale, mood, length, complexity, melody, tempo, seed=seed)
+
+def generate_track_data_cached(key: str, scale: str, mood: str, length: int = 4, complexity: float = 0.5, melody: bool = True, tempo: int = 140, seed: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Cached front door for generate_track_data.
+
+    Unseeded requests are always generated fresh. Seeded requests are keyed by
+    (key, scale, mood, length, complexity bucket, tempo, melody, seed) and served
+    from an LRU cache. The returned dict is a shallow copy: the event lists inside
+    are shared with the cache and must be treated as read-only.
+    """
+    if seed is None:
+        return generate_track_data(key, scale, mood, length, complexity, melody, tempo)
+
+    result = _cached_track_data(key, scale, mood, length, complexity_bucket(complexity), tempo, melody, seed)
+    return dict(result)
@@ -0,0 +1,44 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Any, Dict, Iterator, Optional
+
+# --- Generation Hooks ---
+# What generation reports back to whoever runs it: time per stage, labels for
+# metrics (mood, length) and checkpoints where it can be cancelled. The context
+# vars live here so app.logic doesn't depend on the HTTP layer; app/utils/log.py
+# and app/utils/deadline.py bind them per request. Outside a request (scripts,
+# tests) every hook is a no-op.
+
+STAGE_TIMINGS: ContextVar[Optional[Dict[str, float]]] = ContextVar("stage_timings", default=None)
+# What the request generated (mood, length), for metrics labels
+REQUEST_LABELS: ContextVar[Optional[Dict[str, Any]]] = ContextVar("request_labels", default=None)
+# Anything with check(stage) that raises to stop generation (app.utils.deadline.Budget)
+BUDGET: ContextVar[Optional[Any]] = ContextVar("budget", default=None)
+
+def label_request(**labels):
+    """Records what the current request is generating (e.g. mood, length) for its metrics."""
+    current = REQUEST_LABELS.get()
+    if current is not None:
+        current.update(labels)
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """
+    Times a block into the current request's stage timings (milliseconds, summed
+    if the stage runs more than once, e.g. per track of a batch). Outside a
+    request it only costs two clock reads.
+    """
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        timings = STAGE_TIMINGS.get()
+        if timings is not None:
+            timings[name] = timings.get(name, 0.0) + (perf_counter() - start) * 1000
+
+def checkpoint(stage: str):
+    """Raises (Cancelled) if the current request is out of time or was cancelled. No-op outside a request."""
+    budget = BUDGET.get()
+    if budget is not None:
+        budget.check(stage)
@@ -1,6 +1,7 @@
 import random
 from typing import List, Dict, Any, Optional
 from .scales import get_scale_notes, get_triad_notes
+from .notes import NoteArray
 
 # Rhythmic Patterns (Start time, Duration) for 1 bar (4 beats)
 RHYTHMS = [
@@ -42,8 +43,9 @@ class Motif:
         self.intervals = intervals # Intervals relative to start_degree
         self.start_degree = start_degree
 
-def generate_motif(mood: str) -> Motif:
+def generate_motif(mood: str, rng: Optional[random.Random] = None) -> Motif:
     """Generates a rhythmic and melodic motif based on mood."""
+    rng = rng or random
     
     # Select Rhythm
     if "walker" in mood.lower():
@@ -53,13 +55,13 @@ def generate_motif(mood: str) -> Motif:
             [(0.0, 1.0), (1.0, 1.0), (2.0, 1.0), (3.0, 1.0)], # 4 Quarters
             [(0.0, 0.5), (0.5, 0.5), (1.0, 1.0), (2.0, 1.0), (3.0, 1.0)], # 2 8ths + 3 Quarters
         ]
-        rhythm = random.choice(possible_rhythms)
+        rhythm = rng.choice(possible_rhythms)
         # Intervals: Stepwise motion mostly. 
         # Example: 0, 1, 2, 0 (C D E C)
         intervals = [0, 1, 2, 0] if len(rhythm) >= 4 else [0, 1, 0]
         # Adjust intervals to match rhythm length
         # Start with simple steps
-        intervals = [random.choice([-1, 0, 1, 2]) for _ in range(len(rhythm))]
+        intervals = [rng.choice([-1, 0, 1, 2]) for _ in range(len(rhythm))]
         
         # Walker themes often ascend then resolve
         if len(intervals) >= 3:
@@ -68,14 +70,14 @@ def generate_motif(mood: str) -> Motif:
             intervals[2] = 2
     
     elif "drill" in mood.lower():
-        rhythm = random.choice([r for r in RHYTHMS if len(r) > 5])
+        rhythm = rng.choice([r for r in RHYTHMS if len(r) > 5])
         # Drill: Fast repetitive notes, small intervals
-        intervals = [random.choice([0, 0, 1, -1]) for _ in range(len(rhythm))]
+        intervals = [rng.choice([0, 0, 1, -1]) for _ in range(len(rhythm))]
         
     elif "pop" in mood.lower() or "tropical" in mood.lower():
-        rhythm = random.choice([RHYTHMS[9], RHYTHMS[10], RHYTHMS[2]])
+        rhythm = rng.choice([RHYTHMS[9], RHYTHMS[10], RHYTHMS[2]])
         # Pop: Catchy, skips allowed
-        intervals = [random.choice([0, 2, 4, -2]) for _ in range(len(rhythm))]
+        intervals = [rng.choice([0, 2, 4, -2]) for _ in range(len(rhythm))]
 
     elif "reggaeton" in mood.lower():
         # Tresillo / Latin feel
@@ -100,16 +102,18 @@ def generate_motif(mood: str) -> Motif:
         intervals = (intervals * 2)[:len(rhythm)]
         
     else:
-        rhythm = random.choice(RHYTHMS)
-        intervals = [random.choice([-2, -1, 0, 1, 2]) for _ in range(len(rhythm))]
+        rhythm = rng.choice(RHYTHMS)
+        intervals = [rng.choice([-2, -1, 0, 1, 2]) for _ in range(len(rhythm))]
         
     return Motif(rhythm, intervals)
 
-def generate_melody(key: str, scale: str, progression: List[Dict[str, Any]], complexity: float = 0.5, mood: str = "dark_trap") -> List[Dict[str, Any]]:
+def generate_melody(key: str, scale: str, progression: List[Dict[str, Any]], complexity: float = 0.5, mood: str = "dark_trap", rng: Optional[random.Random] = None) -> NoteArray:
     """
     Generates a melody track based on the chord progression using Motif-based Call & Answer logic.
     """
-    melody_events = []
+    rng = rng or random
+    # Event columns, turned into a NoteArray at the end
+    pitches, times, durations, velocities = [], [], [], []
     
     # 1. Setup Range based on Mood
     low_oct = 4
@@ -131,13 +135,13 @@ def generate_melody(key: str, scale: str, progression: List[Dict[str, Any]], com
     
     all_scale_notes = sorted(list(set(all_scale_notes)))
     if not all_scale_notes:
-        return []
+        return NoteArray.empty()
 
     # 2. Generate Main Motif (Theme A)
-    motif_a = generate_motif(mood)
+    motif_a = generate_motif(mood, rng)
     
     # 3. Generate Secondary Motif (Theme B) - Variation or different
-    motif_b = generate_motif(mood)
+    motif_b = generate_motif(mood, rng)
     
     # Structure: A A B A (Classic Pop/Walker)
     # Walker structure often: A1 (Call), A2 (Answer), A1 (Call), B (Resolution/Bridge)
@@ -210,24 +214,22 @@ def generate_melody(key: str, scale: str, progression: List[Dict[str, Any]], com
             note_val = all_scale_notes[target_idx]
             
             # Humanization
-            velocity = 90 + random.randint(-10, 10)
+            velocity = 90 + rng.randint(-10, 10)
             if k == 0: velocity += 10 # Accent first note
             
             # Walker specific: High velocity for leads
             if "walker" in mood.lower():
                 velocity = min(127, velocity + 15)
                 
-            timing_offset = random.uniform(-0.02, 0.02)
+            timing_offset = rng.uniform(-0.02, 0.02)
             
-            melody_events.append({
-                "note": note_val,
-                "time": bar_start_time + rel_start + timing_offset,
-                "duration": duration * 0.95, # Legato-ish
-                "velocity": velocity
-            })
+            pitches.append(note_val)
+            times.append(bar_start_time + rel_start + timing_offset)
+            durations.append(duration * 0.95) # Legato-ish
+            velocities.append(velocity)
             
         # Update anchor for next bar to follow the melody contour (Gap Fill)
         # If we ended high, maybe start lower next time, or stay there.
         # For now, let's reset to a chord tone of the next chord (handled at start of loop)
             
-    return melody_events
+    return NoteArray(pitches, times, durations, velocities)
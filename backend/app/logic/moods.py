@@ -0,0 +1,223 @@
+import random
+from dataclasses import dataclass, field, replace
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+# --- Mood Profiles ---
+# Everything genre-specific the pipeline needs (progression templates, voicing,
+# rhythm, bass, humanization, CC automation) lives here as data. A mood string is
+# normalised once through resolve_mood and every stage reads from the same profile,
+# so adding a genre means adding a MoodProfile entry (plus aliases) below.
+
+@dataclass(frozen=True)
+class HumanizeProfile:
+    velocity_variance: int = 5
+    timing_variance: float = 0.02 # in beats
+    strum_delay: float = 0.0 # in beats, only applied to chords
+
+@dataclass(frozen=True)
+class MoodProfile:
+    name: str
+    templates: str = "dark_trap" # PROGRESSIONS key
+    octave: int = 4 # Trap/Drill/Walker sit lower
+
+    # Extension policy: per-degree choices, falling back to default_extensions.
+    # complex_extension replaces both when complexity > 0.7.
+    extensions: Dict[int, Tuple[str, ...]] = field(default_factory=dict)
+    default_extensions: Tuple[str, ...] = ("triad",)
+    complex_extension: Optional[str] = None
+
+    voicing: Optional[str] = None # VOICINGS key in chords.py
+    voice_leading: bool = True # Parallel-motion genres skip smooth voice leading
+    tritone_subs: bool = False
+
+    # Chord performance
+    rhythm_set: str = "basic" # GENRE_RHYTHMS key
+    arp_probability: float = 0.0
+    arp_rate: float = 0.25
+    arp_min_complexity: float = 0.0
+    strum: float = 0.0
+    split_bass: bool = False # Walker: sustained sub note under rhythmic upper structure
+
+    bass_style: str = "basic"
+    humanize: HumanizeProfile = HumanizeProfile()
+
+    # CC automation for the chords track
+    sustain_pedal: bool = False
+    expression_swells: bool = False
+
+    def pick_extension(self, degree: int, complexity: float, rng: Optional[random.Random] = None) -> str:
+        """Decides the best extension based on chord function and genre."""
+        if self.complex_extension and complexity > 0.7:
+            return self.complex_extension
+
+        options = self.extensions.get(degree, self.default_extensions)
+        if len(options) == 1:
+            return options[0]
+        return (rng or random).choice(options)
+
+# Shared extension policies
+JAZZ_EXTENSIONS = {
+    5: ("9", "13", "7b9", "7#9", "alt"), # Dominant variations
+    2: ("9", "11", "m9"), # Supertonic
+    1: ("maj9", "6/9", "maj7"), # Tonic
+}
+JAZZ_DEFAULT = ("7", "9", "11")
+HOUSE_EXTENSIONS = {
+    5: ("7",), # V7
+    2: ("m7",), # ii7
+    6: ("m7",), # vi7
+    1: ("triad", "add9", "sus2"),
+}
+TRAP_EXTENSIONS = {5: ("m7",)} # Minor v for Phrygian feel
+
+# Shared humanization feels
+LOOSE = HumanizeProfile(velocity_variance=12, timing_variance=0.04, strum_delay=0.03) # Slight roll
+TIGHT = HumanizeProfile(velocity_variance=8, timing_variance=0.01) # Tight but not robotic
+EMOTIONAL = HumanizeProfile(velocity_variance=10, timing_variance=0.015, strum_delay=0.005)
+ORCHESTRAL = HumanizeProfile(velocity_variance=15, timing_variance=0.05)
+
+MOOD_PROFILES: Dict[str, MoodProfile] = {
+    "dark_trap": MoodProfile(
+        "dark_trap", octave=3, extensions=TRAP_EXTENSIONS, complex_extension="9", # 9ths for spookiness
+        voicing="trap", voice_leading=False, rhythm_set="trap",
+        arp_probability=0.3, arp_rate=0.125, arp_min_complexity=0.7, # Fast trap arps
+        bass_style="808", humanize=TIGHT
+    ),
+    "boom_bap": MoodProfile("boom_bap", templates="boom_bap"),
+    "emotional": MoodProfile("emotional", templates="emotional"),
+    "uk_drill": MoodProfile(
+        "uk_drill", templates="uk_drill", octave=3, extensions=TRAP_EXTENSIONS,
+        voicing="drill", voice_leading=False, rhythm_set="drill", bass_style="808", humanize=TIGHT
+    ),
+    "lo_fi": MoodProfile(
+        "lo_fi", templates="lo_fi", extensions=JAZZ_EXTENSIONS, default_extensions=JAZZ_DEFAULT,
+        voicing="drop2", tritone_subs=True, rhythm_set="lo_fi",
+        bass_style="laid_back", humanize=LOOSE, sustain_pedal=True
+    ),
+    "rnb": MoodProfile(
+        "rnb", templates="rnb", extensions=JAZZ_EXTENSIONS, default_extensions=JAZZ_DEFAULT,
+        voicing="drop2", rhythm_set="rnb", strum=0.03, bass_style="laid_back", sustain_pedal=True
+    ),
+    "future_bass": MoodProfile(
+        "future_bass", templates="future_bass", default_extensions=("7", "9", "add9"), # Thick 7ths and 9ths
+        voicing="supersaw", rhythm_set="future_bass", bass_style="dotted"
+    ),
+    "jazz": MoodProfile(
+        "jazz", templates="jazz", extensions=JAZZ_EXTENSIONS, default_extensions=JAZZ_DEFAULT,
+        voicing="drop2", tritone_subs=True, rhythm_set="jazz", humanize=LOOSE, sustain_pedal=True
+    ),
+    "cinematic": MoodProfile(
+        "cinematic", templates="cinematic", voicing="cinematic", rhythm_set="cinematic",
+        bass_style="deep", humanize=ORCHESTRAL, sustain_pedal=True, expression_swells=True
+    ),
+    "house": MoodProfile(
+        "house", templates="house", extensions=HOUSE_EXTENSIONS, voicing="sub_root",
+        voice_leading=False, rhythm_set="house", bass_style="offbeat"
+    ),
+    "pop": MoodProfile(
+        "pop", templates="pop", default_extensions=("triad", "add9"), # Add9 is common in pop
+        voicing="sub_root", rhythm_set="pop", arp_probability=0.2,
+        bass_style="root_fifth", sustain_pedal=True
+    ),
+    "neo_soul": MoodProfile(
+        "neo_soul", templates="neo_soul", default_extensions=("9", "11", "7", "11"),
+        tritone_subs=True, rhythm_set="rnb", strum=0.03,
+        bass_style="laid_back", humanize=LOOSE, sustain_pedal=True
+    ),
+    "reggaeton": MoodProfile("reggaeton", templates="reggaeton", default_extensions=("triad", "7"), rhythm_set="reggaeton"),
+    "techno": MoodProfile(
+        "techno", templates="techno", voice_leading=False, rhythm_set="techno", bass_style="offbeat" # Clean, driving
+    ),
+    "gospel": MoodProfile("gospel", templates="gospel", default_extensions=("7", "9", "13", "11")),
+    "synthwave": MoodProfile(
+        "synthwave", templates="synthwave", default_extensions=("triad", "7", "add9"),
+        rhythm_set="synthwave", arp_probability=0.4
+    ),
+    "dubstep": MoodProfile(
+        "dubstep", templates="dubstep", default_extensions=("triad", "7"),
+        voice_leading=False, rhythm_set="dubstep", bass_style="dotted"
+    ),
+    "trance": MoodProfile(
+        "trance", templates="trance", default_extensions=("triad", "sus4", "sus2"), # Trance loves sus chords
+        rhythm_set="trance", arp_probability=0.5, bass_style="offbeat"
+    ),
+    "dnb": MoodProfile("dnb", templates="dnb", default_extensions=("7", "9", "triad"), rhythm_set="dnb"), # Liquid DnB loves 7ths
+    "progressive_house": MoodProfile(
+        "progressive_house", templates="progressive_house", default_extensions=("triad", "7", "add9"),
+        voicing="sub_root", voice_leading=False, rhythm_set="house", bass_style="offbeat"
+    ),
+    "big_room": MoodProfile("big_room", templates="big_room"), # Simple power
+    "electro_house": MoodProfile(
+        "electro_house", templates="electro_house", default_extensions=("triad", "7"),
+        voicing="sub_root", voice_leading=False, rhythm_set="house", bass_style="offbeat"
+    ),
+    "tropical_house": MoodProfile(
+        "tropical_house", templates="tropical_house", default_extensions=("triad", "6", "add9"), # 6th chords are nice here
+        voicing="sub_root", voice_leading=False, rhythm_set="house", bass_style="offbeat"
+    ),
+    "hardstyle": MoodProfile("hardstyle", templates="hardstyle"), # Detuned saws don't like complex intervals
+    "melodic_dubstep": MoodProfile(
+        "melodic_dubstep", templates="melodic_dubstep", default_extensions=("triad", "7"),
+        voice_leading=False, rhythm_set="dubstep", bass_style="dotted"
+    ),
+    "walker": MoodProfile(
+        "walker", octave=3, voicing="walker", voice_leading=False, # Wide, open voicing for emotion
+        rhythm_set="walker", split_bass=True, bass_style="deep", humanize=EMOTIONAL, sustain_pedal=True
+    ),
+}
+
+# Moods that only change the performance, not the harmony
+MOOD_PROFILES["default"] = MoodProfile("default", extensions=TRAP_EXTENSIONS, complex_extension="9", octave=3, voicing="trap", voice_leading=False)
+MOOD_PROFILES["rock"] = replace(MOOD_PROFILES["default"], name="rock", bass_style="root_fifth")
+MOOD_PROFILES["funk"] = replace(MOOD_PROFILES["default"], name="funk", bass_style="funk")
+
+# Fallback map for similar genres, checked in order against the normalised mood
+MOOD_ALIASES: List[Tuple[Tuple[str, ...], str]] = [
+    (("drill",), "uk_drill"),
+    (("faded", "walker"), "walker"),
+    (("lofi", "chill"), "lo_fi"),
+    (("r&b", "soul"), "rnb"),
+    (("jazz",), "jazz"),
+    (("cinematic",), "cinematic"),
+    (("house",), "house"),
+    (("pop",), "pop"),
+    (("drum", "dnb"), "dnb"),
+    (("future", "bass", "kawaii"), "future_bass"),
+    (("neo",), "neo_soul"),
+    (("reggaeton",), "reggaeton"),
+    (("techno", "rave"), "techno"),
+    (("gospel", "church"), "gospel"),
+    (("synth", "wave", "retro"), "synthwave"),
+    (("dubstep",), "dubstep"),
+    (("trance",), "trance"),
+    (("progressive",), "progressive_house"),
+    (("electro",), "electro_house"),
+    (("tropical",), "tropical_house"),
+    (("hardstyle",), "hardstyle"),
+    (("trap",), "dark_trap"),
+    (("rock", "punk"), "rock"),
+    (("funk", "disco"), "funk"),
+]
+
+# Unknown moods follow the scale's character
+SCALE_FALLBACKS = {"dorian": "boom_bap"}
+
+def normalize_mood(mood: Optional[str]) -> str:
+    return (mood or "").lower().replace(" ", "_").replace("-", "_")
+
+@lru_cache(maxsize=512)
+def resolve_mood(mood: Optional[str], scale: Optional[str] = None) -> MoodProfile:
+    """
+    Maps a free-form mood string (e.g. "Lo-Fi", "R&B / Soul", "uk_drill") to its MoodProfile.
+    scale only matters for moods that match no genre at all.
+    """
+    mood_key = normalize_mood(mood)
+    if mood_key in MOOD_PROFILES:
+        return MOOD_PROFILES[mood_key]
+
+    for needles, name in MOOD_ALIASES:
+        if any(n in mood_key for n in needles):
+            return MOOD_PROFILES[name]
+
+    return MOOD_PROFILES[SCALE_FALLBACKS.get(scale, "default")]
@@ -0,0 +1,187 @@
+import random
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+# --- Note Arrays ---
+# Note events travel through the pipeline as one struct-of-arrays per track
+# instead of a list of {"note", "time", "duration", "velocity"} dicts. Stages
+# shift / clip / concatenate whole arrays at once and the dicts the frontend
+# expects are only built at the JSON boundary (to_events / jsonable_track).
+
+PITCH_DTYPE = np.int16
+TIME_DTYPE = np.float64 # in beats
+VELOCITY_DTYPE = np.uint8
+
+TRACK_PARTS = ("chords", "melody", "bass")
+
+def numpy_rng(rng=None) -> np.random.Generator:
+    """
+    Derives a NumPy generator from the per-request `random.Random`, so vectorised
+    stages stay reproducible from the same seed. Generators are passed through,
+    which lets a caller derive one per track and share it between stages.
+    """
+    if isinstance(rng, np.random.Generator):
+        return rng
+    return np.random.default_rng((rng or random).getrandbits(64))
+
+class NoteArray:
+    """
+    Columnar note events: pitch (int16), time and duration (float64 beats),
+    velocity (uint8). Operations return new arrays; columns are never resized
+    in place.
+    """
+    __slots__ = ("pitch", "time", "duration", "velocity")
+
+    def __init__(self, pitch, time, duration, velocity):
+        self.pitch = np.asarray(pitch, dtype=PITCH_DTYPE)
+        self.time = np.asarray(time, dtype=TIME_DTYPE)
+        self.duration = np.asarray(duration, dtype=TIME_DTYPE)
+        velocity = np.asarray(velocity)
+        if velocity.dtype != VELOCITY_DTYPE:
+            # Clamp before the cast so out-of-range velocities don't wrap around
+            velocity = np.minimum(np.maximum(velocity, 1), 127).astype(VELOCITY_DTYPE)
+        self.velocity = velocity
+
+    @classmethod
+    def empty(cls) -> "NoteArray":
+        return cls((), (), (), ())
+
+    @classmethod
+    def from_events(cls, events: Iterable[Dict[str, Any]]) -> "NoteArray":
+        """Builds a NoteArray from a list of event dicts (e.g. a parsed request body)."""
+        if isinstance(events, NoteArray):
+            return events
+        events = list(events)
+        if not events:
+            return cls.empty()
+        return cls(
+            [e["note"] for e in events],
+            [e["time"] for e in events],
+            [e["duration"] for e in events],
+            [e.get("velocity", 80) for e in events],
+        )
+
+    @classmethod
+    def from_columns(cls, columns: Dict[str, Iterable[int]], resolution: int) -> "NoteArray":
+        """
+        Builds a NoteArray from the columnar wire format (see to_columns): "note",
+        "dt" (start ticks since the previous event), "dur" (ticks) and optional "vel".
+        """
+        note = np.asarray(columns["note"], dtype=np.int64)
+        dt = np.asarray(columns["dt"], dtype=np.int64)
+        dur = np.asarray(columns["dur"], dtype=np.int64)
+        vel = columns.get("vel")
+        vel = np.full(len(note), 80) if vel is None else np.asarray(vel, dtype=np.int64)
+        if not len(note) == len(dt) == len(dur) == len(vel):
+            raise ValueError("note columns must all have the same length")
+        return cls(note, np.cumsum(dt) / resolution, dur / resolution, vel)
+
+    @classmethod
+    def concat(cls, arrays: Iterable["NoteArray"]) -> "NoteArray":
+        arrays = [a for a in arrays if len(a)]
+        if not arrays:
+            return cls.empty()
+        if len(arrays) == 1:
+            return arrays[0]
+        return cls(
+            np.concatenate([a.pitch for a in arrays]),
+            np.concatenate([a.time for a in arrays]),
+            np.concatenate([a.duration for a in arrays]),
+            np.concatenate([a.velocity for a in arrays]),
+        )
+
+    def __len__(self) -> int:
+        return len(self.pitch)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, NoteArray):
+            return NotImplemented
+        return (
+            np.array_equal(self.pitch, other.pitch)
+            and np.array_equal(self.time, other.time)
+            and np.array_equal(self.duration, other.duration)
+            and np.array_equal(self.velocity, other.velocity)
+        )
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        # Convenience for scripts that walk events one by one
+        return iter(self.to_events())
+
+    def __repr__(self) -> str:
+        return f"NoteArray({len(self)} notes)"
+
+    def take(self, index) -> "NoteArray":
+        """Selects events by boolean mask or index array."""
+        return NoteArray(self.pitch[index], self.time[index], self.duration[index], self.velocity[index])
+
+    def shift(self, offset) -> "NoteArray":
+        """
+        Moves events by offset beats (a scalar, or one offset per event);
+        events never start before 0.
+        """
+        return NoteArray(self.pitch, np.maximum(self.time + offset, 0.0), self.duration, self.velocity)
+
+    def clip(self, length) -> "NoteArray":
+        """
+        Drops events starting at or after length and cuts the rest off at length
+        (a scalar, or one length per event).
+        """
+        keep = self.time < length
+        kept = self.take(keep)
+        if np.ndim(length):
+            length = np.asarray(length)[keep]
+        kept.duration = np.minimum(kept.duration, length - kept.time)
+        return kept
+
+    def sort(self) -> "NoteArray":
+        """Orders events by start time, then pitch (stable)."""
+        order = np.lexsort((self.pitch, self.time))
+        return self.take(order)
+
+    def quantize(self, resolution: int) -> "NoteArray":
+        """
+        Rounds times and durations to 1/resolution beat (durations to at least one
+        step), keeping only the decimals needed to tell the steps apart, so they
+        print as short floats.
+        """
+        digits = len(str(resolution)) + 1
+        time = np.round(np.round(self.time * resolution) / resolution, digits)
+        duration = np.round(np.maximum(np.round(self.duration * resolution), 1) / resolution, digits)
+        return NoteArray(self.pitch, time, duration, self.velocity)
+
+    def to_columns(self, resolution: int) -> Dict[str, List[int]]:
+        """
+        Columnar wire format: one integer list per field with times in ticks
+        (resolution per beat). Start times are delta-encoded, so chords and
+        regular rhythms turn into long runs of small numbers.
+        """
+        ticks = np.round(self.time * resolution).astype(np.int64)
+        return {
+            "note": self.pitch.tolist(),
+            "dt": np.diff(ticks, prepend=0).tolist(),
+            "dur": np.maximum(np.round(self.duration * resolution), 1).astype(np.int64).tolist(),
+            "vel": self.velocity.tolist(),
+        }
+
+    def to_events(self, resolution: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Converts to the list-of-dicts format used in JSON responses, optionally
+        quantized to 1/resolution beat.
+        """
+        notes = self.quantize(resolution) if resolution else self
+        return [
+            {"note": n, "time": t, "duration": d, "velocity": v}
+            for n, t, d, v in zip(notes.pitch.tolist(), notes.time.tolist(), notes.duration.tolist(), notes.velocity.tolist())
+        ]
+
+def jsonable_track(track: Dict[str, Any], resolution: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Shallow copy of a track dict with its NoteArray parts converted to event lists
+    (times quantized to 1/resolution beat if given).
+    """
+    out = dict(track)
+    for part in TRACK_PARTS:
+        if isinstance(out.get(part), NoteArray):
+            out[part] = out[part].to_events(resolution)
+    return out
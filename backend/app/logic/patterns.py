@@ -1,6 +1,10 @@
 import random
 import math
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+from .notes import NoteArray, numpy_rng
 
 def euclidean_pattern(steps: int, pulses: int) -> List[int]:
     """
@@ -18,7 +22,7 @@ def euclidean_pattern(steps: int, pulses: int) -> List[int]:
             pattern.append(0)
     return pattern
 
-def apply_arpeggio(notes: List[int], pattern_type: str = "up", length: float = 4.0, steps: int = 16, octaves: int = 1, rate: float = 0.25) -> List[Dict[str, Any]]:
+def apply_arpeggio(notes: List[int], pattern_type: str = "up", length: float = 4.0, steps: int = 16, octaves: int = 1, rate: float = 0.25, rng: Optional[random.Random] = None) -> NoteArray:
     """
     Converts a block chord (list of notes) into an arpeggio pattern.
     
@@ -29,271 +33,296 @@ def apply_arpeggio(notes: List[int], pattern_type: str = "up", length: float = 4
         steps: Number of steps to generate (overrides length if used for loop count, but we use length/rate for total steps)
         octaves: Number of octaves to span (1 = original only, 2 = original + octave up)
         rate: Duration of each step in beats (e.g., 0.25 for 16th notes)
+        rng: Random source to draw from (defaults to the global `random` module); a
+             NumPy Generator shared across chords is used as-is
     """
-    events = []
     if not notes:
-        return events
-        
-    num_original_notes = len(notes)
+        return NoteArray.empty()
+    gen = numpy_rng(rng)
     
     # Expand notes across octaves
-    expanded_notes = []
-    for oct_idx in range(octaves):
-        for note in notes:
-            expanded_notes.append(note + (oct_idx * 12))
-            
     # Sort expanded notes for consistent patterns
-    expanded_notes.sort()
+    expanded_notes = np.sort((np.asarray(notes)[None, :] + 12 * np.arange(octaves)[:, None]).ravel())
     num_notes = len(expanded_notes)
     
     # Calculate total steps based on length and rate
     total_steps = int(length / rate)
+    step = np.arange(total_steps)
+    cycle = step % num_notes
+    velocity = 90 + gen.integers(-10, 11, total_steps)
     
-    current_step = 0
-    
-    while current_step < total_steps:
-        note_idx = 0
-        velocity = 90 + random.randint(-10, 10)
+    # Calculate index based on pattern type
+    if pattern_type == "up":
+        note_idx = cycle
+        
+    elif pattern_type == "down":
+        note_idx = (num_notes - 1) - cycle
         
-        # Calculate index based on pattern type
-        if pattern_type == "up":
-            note_idx = current_step % num_notes
+    elif pattern_type == "up_down":
+        cycle_len = max(1, (num_notes * 2) - 2) # Safety for single note
+        ud = step % cycle_len
+        note_idx = np.where(ud < num_notes, ud, (num_notes - 1) - (ud - (num_notes - 1)))
             
-        elif pattern_type == "down":
-            note_idx = (num_notes - 1) - (current_step % num_notes)
+    elif pattern_type == "random":
+        note_idx = gen.integers(0, num_notes, total_steps)
+        
+    elif pattern_type == "converge":
+        # 0, N-1, 1, N-2, 2, N-3...
+        note_idx = np.where(cycle % 2 == 0, cycle // 2, (num_notes - 1) - (cycle // 2))
             
-        elif pattern_type == "up_down":
-            cycle_len = (num_notes * 2) - 2
-            if cycle_len < 1: cycle_len = 1 # Safety for single note
-            cycle = current_step % cycle_len
-            if cycle < num_notes:
-                note_idx = cycle
-            else:
-                note_idx = (num_notes - 1) - (cycle - (num_notes - 1))
-                
-        elif pattern_type == "random":
-            note_idx = random.randint(0, num_notes - 1)
+    elif pattern_type == "diverge":
+        # Middle out: Mid, Mid+1, Mid-1...
+        mid = num_notes // 2
+        note_idx = np.where(cycle == 0, mid, np.where(cycle % 2 != 0, mid + (cycle // 2) + 1, mid - (cycle // 2)))
+        # Bounds check
+        note_idx = np.clip(note_idx, 0, num_notes - 1)
             
-        elif pattern_type == "converge":
-            # 0, N-1, 1, N-2, 2, N-3...
-            cycle = current_step % num_notes
-            if cycle % 2 == 0:
-                note_idx = cycle // 2
-            else:
-                note_idx = (num_notes - 1) - (cycle // 2)
-                
-        elif pattern_type == "diverge":
-            # Middle out: Mid, Mid+1, Mid-1...
-            mid = num_notes // 2
-            cycle = current_step % num_notes
-            if cycle == 0:
-                note_idx = mid
-            elif cycle % 2 != 0:
-                note_idx = mid + (cycle // 2) + 1
-            else:
-                note_idx = mid - (cycle // 2)
-            # Bounds check
-            note_idx = max(0, min(note_idx, num_notes - 1))
+    elif pattern_type == "thumb_up":
+        # Lowest note, then random high notes
+        downbeat = step % 4 == 0
+        note_idx = np.where(downbeat, 0, gen.integers(min(1, num_notes - 1), num_notes, total_steps))
+        velocity = velocity + 15 * downbeat # Accent
             
-        elif pattern_type == "thumb_up":
-            # Lowest note, then random high notes
-            cycle = current_step % 4
-            if cycle == 0:
-                note_idx = 0 # Root
-                velocity += 15 # Accent
-            else:
-                note_idx = random.randint(1, num_notes - 1)
-                
-        elif pattern_type == "pinky_up":
-             # Highest note, then random low notes
-            cycle = current_step % 4
-            if cycle == 0:
-                note_idx = num_notes - 1 # Top
-                velocity += 15 # Accent
-            else:
-                note_idx = random.randint(0, num_notes - 2)
-        
-        # Safety check
-        if note_idx >= num_notes: note_idx = 0
-        
-        note = expanded_notes[note_idx]
-        
-        # Add event
-        events.append({
-            "note": note,
-            "time": current_step * rate,
-            "duration": rate * 0.9, # Legato-ish
-            "velocity": velocity
-        })
-        
-        current_step += 1
-        
-    return events
+    elif pattern_type == "pinky_up":
+        # Highest note, then random low notes
+        downbeat = step % 4 == 0
+        note_idx = np.where(downbeat, num_notes - 1, gen.integers(0, max(1, num_notes - 1), total_steps))
+        velocity = velocity + 15 * downbeat # Accent
 
-def apply_rhythm(notes: List[int], rhythm_type: str = "basic", length: float = 4.0, strum_speed: float = 0.0) -> List[Dict[str, Any]]:
-    """
-    Applies a rhythmic pattern to the full chord.
+    else:
+        note_idx = np.zeros(total_steps, dtype=int)
     
-    Args:
-        notes: List of MIDI notes
-        rhythm_type: Name of the rhythm pattern
-        length: Duration in beats
-        strum_speed: Delay in seconds between notes in a chord (0.02 is standard strum)
-    """
-    events = []
+    # Safety check
+    note_idx = np.where(note_idx >= num_notes, 0, note_idx)
     
-    # Define rhythm patterns (start_time, duration, velocity_scale)
-    # 1.0 = Quarter Note, 0.5 = Eighth Note, 0.25 = Sixteenth Note
-    patterns = {
-        "basic": [(0.0, 4.0, 1.0)], # Whole note
-        
-        # --- Essential Genres ---
-        "charleston": [(0.0, 1.5, 1.0), (1.5, 2.5, 0.8)], # Dotted quarter, then rest/tied
-        "reggaeton": [(0.0, 0.75, 1.0), (0.75, 0.25, 0.6), (1.0, 1.0, 0.8), (2.0, 0.75, 1.0), (2.75, 0.25, 0.6), (3.0, 1.0, 0.8)],
-        "syncopated": [(0.0, 0.75, 1.0), (0.75, 0.75, 0.9), (1.5, 0.5, 0.8), (2.5, 0.5, 1.0), (3.5, 0.5, 0.7)],
-        "waltz": [(0.0, 1.0, 1.0), (1.0, 1.0, 0.6), (2.0, 1.0, 0.6), (3.0, 1.0, 0.8)], # Extended to 4/4
-        
-        # --- Modern / Urban ---
-        "drill_stabs": [(0.0, 0.25, 1.0), (0.75, 0.25, 0.9), (1.5, 0.25, 1.0), (2.5, 0.25, 0.9), (3.25, 0.25, 1.0), (3.75, 0.25, 0.8)], # Sharp staccato stabs
-        "drill_sustained": [(0.0, 4.0, 0.9)], # Long dark pad
-        "drill_counter": [(0.5, 0.25, 0.8), (1.25, 0.25, 0.9), (2.0, 0.25, 0.8), (3.5, 0.5, 0.9)], # Off-beat accents
-        "trap_bounce": [(0.0, 1.5, 1.0), (1.5, 1.5, 0.9), (3.0, 1.0, 0.8)], # Classic Tresillo-ish
-        "neo_soul": [(0.0, 1.25, 1.0), (1.25, 0.25, 0.7), (1.5, 1.0, 0.9), (2.75, 1.25, 0.8)], # Laid back, slightly behind
-        "rnb_strum": [(0.0, 2.0, 1.0), (2.0, 1.0, 0.9), (3.0, 1.0, 0.8)], # Smooth changes
-        "lofi_chop": [(0.0, 1.0, 0.9), (1.5, 1.0, 0.8), (2.5, 0.5, 0.7), (3.0, 1.0, 0.8)], # MPC style chops
-        
-        # --- Electronic ---
-        "house_stab": [(0.0, 0.5, 1.0), (0.5, 0.5, 0.0), (1.0, 0.5, 1.0), (1.5, 0.5, 0.0), (2.0, 0.5, 1.0), (2.5, 0.5, 0.0), (3.0, 0.5, 1.0), (3.5, 0.5, 0.0)], # Offbeat stabs
-        "house_piano": [(0.0, 0.75, 1.0), (0.75, 0.75, 0.9), (1.5, 0.5, 1.0), (2.0, 1.0, 0.9), (3.0, 1.0, 1.0)], # Classic M1 piano rhythm
-        "techno_drive": [(0.0, 0.25, 1.0), (0.5, 0.25, 0.9), (1.0, 0.25, 1.0), (1.5, 0.25, 0.9), (2.0, 0.25, 1.0), (2.5, 0.25, 0.9), (3.0, 0.25, 1.0), (3.5, 0.25, 0.9)], # Driving 16ths
-        "techno_rumble": [(0.0, 0.25, 1.0), (0.75, 0.25, 0.7), (1.5, 0.25, 0.9), (2.25, 0.25, 0.7), (3.0, 0.25, 0.9), (3.75, 0.25, 0.7)], # Spacey
-        "future_bass_wub": [(0.0, 0.75, 1.0), (0.75, 0.75, 0.9), (1.5, 0.5, 0.8), (2.0, 0.75, 1.0), (2.75, 0.75, 0.9), (3.5, 0.5, 0.8)], # Super Saw Rhythm
-        "future_bass_saw": [(0.0, 1.5, 1.0), (1.5, 0.5, 0.9), (2.0, 1.0, 1.0), (3.0, 0.5, 0.8), (3.5, 0.5, 0.9)], # Big chords
-        "future_bass_16th": [(0.0, 0.25, 1.0), (0.25, 0.25, 0.8), (0.5, 0.25, 1.0), (0.75, 0.25, 0.8), (1.0, 0.5, 1.0), (1.5, 0.5, 0.0), (2.0, 0.25, 1.0), (2.25, 0.25, 0.8), (2.5, 0.25, 1.0), (2.75, 0.25, 0.8), (3.0, 0.5, 1.0), (3.5, 0.5, 0.0)], # Fast flutter
-        "synthwave_pulse": [(0.0, 0.5, 1.0), (0.5, 0.5, 0.8), (1.0, 0.5, 1.0), (1.5, 0.5, 0.8), (2.0, 0.5, 1.0), (2.5, 0.5, 0.8), (3.0, 0.5, 1.0), (3.5, 0.5, 0.8)], # Steady 8ths
-        "synthwave_arps": [(0.0, 0.25, 1.0), (0.5, 0.25, 0.9), (1.0, 0.25, 1.0), (1.5, 0.25, 0.9), (2.0, 0.25, 1.0), (2.5, 0.25, 0.9), (3.0, 0.25, 1.0), (3.5, 0.25, 0.9)], # Short arp base
-        
-        # --- Acoustic / Pop ---
-        "pop_strum": [(0.0, 1.0, 1.0), (1.0, 1.0, 0.9), (2.0, 1.0, 1.0), (3.0, 1.0, 0.9)], # Basic quarter notes
-        "pop_arpeggio": [(0.0, 0.5, 1.0), (0.5, 0.5, 0.9), (1.0, 0.5, 1.0), (1.5, 0.5, 0.9), (2.0, 0.5, 1.0), (2.5, 0.5, 0.9), (3.0, 0.5, 1.0), (3.5, 0.5, 0.9)], # Simple broken chords
-        "jazz_swing": [(0.0, 1.0, 1.0), (1.0, 0.66, 0.8), (1.66, 0.33, 0.6), (2.0, 1.0, 1.0), (3.0, 0.66, 0.8), (3.66, 0.33, 0.6)], # Swing feel
-        "gospel_sway": [(0.0, 1.5, 1.0), (1.5, 1.5, 0.9), (3.0, 0.5, 0.8), (3.5, 0.5, 0.9)], # 6/8 feel sway
-        "cinematic_swell": [(0.0, 4.0, 0.6)], # Very soft, long pad
-        
-        # --- New Complex Patterns ---
-        "afrobeat": [(0.0, 0.75, 1.0), (0.75, 0.25, 0.7), (1.0, 0.5, 0.9), (1.5, 0.75, 0.8), (2.25, 0.75, 1.0), (3.0, 0.5, 0.9), (3.5, 0.5, 0.7)],
-        "reggaeton_bounce": [(0.0, 0.75, 1.0), (0.75, 0.25, 0.6), (1.0, 0.5, 0.9), (1.5, 0.5, 0.8), (2.0, 0.75, 1.0), (2.75, 0.25, 0.6), (3.0, 0.5, 0.9), (3.5, 0.5, 0.8)],
-        "dnb_pad": [(0.0, 2.5, 0.9), (2.5, 1.5, 0.8)], # Atmospheric pad
-        "dnb_stab": [(0.0, 0.5, 1.0), (1.5, 0.5, 0.9), (2.5, 0.5, 1.0), (3.5, 0.5, 0.9)], # Liquid piano stabs
-        "dubstep_wub": [(0.0, 1.0, 1.0), (1.0, 0.5, 0.8), (1.5, 0.5, 0.9), (2.0, 2.0, 1.0)], # Half-time feel
-        "euro_trance": [(0.0, 0.75, 1.0), (0.75, 0.75, 0.0), (1.5, 0.75, 1.0), (2.25, 0.75, 0.0), (3.0, 0.75, 1.0), (3.75, 0.25, 0.0)], # Gate effect
-        "trance_gate": [(0.0, 0.25, 1.0), (0.25, 0.25, 0.0), (0.5, 0.25, 1.0), (0.75, 0.25, 0.0), (1.0, 0.25, 1.0), (1.25, 0.25, 0.0), (1.5, 0.25, 1.0), (1.75, 0.25, 0.0), (2.0, 0.25, 1.0), (2.25, 0.25, 0.0), (2.5, 0.25, 1.0), (2.75, 0.25, 0.0), (3.0, 0.25, 1.0), (3.25, 0.25, 0.0), (3.5, 0.25, 1.0), (3.75, 0.25, 0.0)], # Fast gate
-        
-        # --- Specific Artists ---
-        "walker_piano": [(0.0, 0.5, 1.3), (0.5, 0.5, 0.8), (1.0, 0.5, 1.3), (1.5, 0.5, 0.8), (2.0, 0.5, 1.3), (2.5, 0.5, 0.8), (3.0, 0.5, 1.3), (3.5, 0.5, 0.8)], # Heavy pulse
-        "walker_arp": [(0.0, 0.5, 1.2), (0.5, 0.25, 0.9), (0.75, 0.25, 0.9), (1.0, 0.5, 1.1), (1.5, 0.25, 0.9), (1.75, 0.25, 0.9), (2.0, 0.5, 1.2), (2.5, 0.25, 0.9), (2.75, 0.25, 0.9), (3.0, 0.5, 1.1), (3.5, 0.25, 0.9), (3.75, 0.25, 0.9)], # Dotted feel
-    }
+    return NoteArray(
+        expanded_notes[note_idx],
+        step * rate,
+        np.full(total_steps, rate * 0.9), # Legato-ish
+        velocity
+    )
+
+# Define rhythm patterns (start_time, duration, velocity_scale)
+# 1.0 = Quarter Note, 0.5 = Eighth Note, 0.25 = Sixteenth Note
+RHYTHM_PATTERNS = {
+    "basic": [(0.0, 4.0, 1.0)], # Whole note
     
-    selected_pattern = patterns.get(rhythm_type, patterns["basic"])
+    # --- Essential Genres ---
+    "charleston": [(0.0, 1.5, 1.0), (1.5, 2.5, 0.8)], # Dotted quarter, then rest/tied
+    "reggaeton": [(0.0, 0.75, 1.0), (0.75, 0.25, 0.6), (1.0, 1.0, 0.8), (2.0, 0.75, 1.0), (2.75, 0.25, 0.6), (3.0, 1.0, 0.8)],
+    "syncopated": [(0.0, 0.75, 1.0), (0.75, 0.75, 0.9), (1.5, 0.5, 0.8), (2.5, 0.5, 1.0), (3.5, 0.5, 0.7)],
+    "waltz": [(0.0, 1.0, 1.0), (1.0, 1.0, 0.6), (2.0, 1.0, 0.6), (3.0, 1.0, 0.8)], # Extended to 4/4
     
-    # Walker Arpeggiator Logic (Override standard block chords)
-    if rhythm_type == "walker_arp":
-        # Create a custom arpeggio pattern instead of block chords
-        # Pattern: Root (strong), 5th+Octave (weak), 5th (weak), Root...
-        events = []
-        if not notes: return []
-        
-        root = notes[0]
-        # Find a suitable fifth (avoid close clusters if possible)
-        fifth = root + 7
-        if len(notes) > 2:
-            fifth = notes[2]
-        elif len(notes) > 1:
-            fifth = notes[1]
-            
-        octave = root + 12
-        
-        # Simple broken chord pattern: 
-        # Beat 1: Root
-        # Beat 1.5: 5th
-        # Beat 2: Octave
-        # Beat 2.5: 5th
-        
-        arp_sequence = [root, fifth, octave, fifth]
-        step_size = 0.5
-        
-        current_time = 0.0
-        step_idx = 0
+    # --- Modern / Urban ---
+    "drill_stabs": [(0.0, 0.25, 1.0), (0.75, 0.25, 0.9), (1.5, 0.25, 1.0), (2.5, 0.25, 0.9), (3.25, 0.25, 1.0), (3.75, 0.25, 0.8)], # Sharp staccato stabs
+    "drill_sustained": [(0.0, 4.0, 0.9)], # Long dark pad
+    "drill_counter": [(0.5, 0.25, 0.8), (1.25, 0.25, 0.9), (2.0, 0.25, 0.8), (3.5, 0.5, 0.9)], # Off-beat accents
+    "trap_bounce": [(0.0, 1.5, 1.0), (1.5, 1.5, 0.9), (3.0, 1.0, 0.8)], # Classic Tresillo-ish
+    "neo_soul": [(0.0, 1.25, 1.0), (1.25, 0.25, 0.7), (1.5, 1.0, 0.9), (2.75, 1.25, 0.8)], # Laid back, slightly behind
+    "rnb_strum": [(0.0, 2.0, 1.0), (2.0, 1.0, 0.9), (3.0, 1.0, 0.8)], # Smooth changes
+    "lofi_chop": [(0.0, 1.0, 0.9), (1.5, 1.0, 0.8), (2.5, 0.5, 0.7), (3.0, 1.0, 0.8)], # MPC style chops
+    
+    # --- Electronic ---
+    "house_stab": [(0.0, 0.5, 1.0), (0.5, 0.5, 0.0), (1.0, 0.5, 1.0), (1.5, 0.5, 0.0), (2.0, 0.5, 1.0), (2.5, 0.5, 0.0), (3.0, 0.5, 1.0), (3.5, 0.5, 0.0)], # Offbeat stabs
+    "house_piano": [(0.0, 0.75, 1.0), (0.75, 0.75, 0.9), (1.5, 0.5, 1.0), (2.0, 1.0, 0.9), (3.0, 1.0, 1.0)], # Classic M1 piano rhythm
+    "techno_drive": [(0.0, 0.25, 1.0), (0.5, 0.25, 0.9), (1.0, 0.25, 1.0), (1.5, 0.25, 0.9), (2.0, 0.25, 1.0), (2.5, 0.25, 0.9), (3.0, 0.25, 1.0), (3.5, 0.25, 0.9)], # Driving 16ths
+    "techno_rumble": [(0.0, 0.25, 1.0), (0.75, 0.25, 0.7), (1.5, 0.25, 0.9), (2.25, 0.25, 0.7), (3.0, 0.25, 0.9), (3.75, 0.25, 0.7)], # Spacey
+    "future_bass_wub": [(0.0, 0.75, 1.0), (0.75, 0.75, 0.9), (1.5, 0.5, 0.8), (2.0, 0.75, 1.0), (2.75, 0.75, 0.9), (3.5, 0.5, 0.8)], # Super Saw Rhythm
+    "future_bass_saw": [(0.0, 1.5, 1.0), (1.5, 0.5, 0.9), (2.0, 1.0, 1.0), (3.0, 0.5, 0.8), (3.5, 0.5, 0.9)], # Big chords
+    "future_bass_16th": [(0.0, 0.25, 1.0), (0.25, 0.25, 0.8), (0.5, 0.25, 1.0), (0.75, 0.25, 0.8), (1.0, 0.5, 1.0), (1.5, 0.5, 0.0), (2.0, 0.25, 1.0), (2.25, 0.25, 0.8), (2.5, 0.25, 1.0), (2.75, 0.25, 0.8), (3.0, 0.5, 1.0), (3.5, 0.5, 0.0)], # Fast flutter
+    "synthwave_pulse": [(0.0, 0.5, 1.0), (0.5, 0.5, 0.8), (1.0, 0.5, 1.0), (1.5, 0.5, 0.8), (2.0, 0.5, 1.0), (2.5, 0.5, 0.8), (3.0, 0.5, 1.0), (3.5, 0.5, 0.8)], # Steady 8ths
+    "synthwave_arps": [(0.0, 0.25, 1.0), (0.5, 0.25, 0.9), (1.0, 0.25, 1.0), (1.5, 0.25, 0.9), (2.0, 0.25, 1.0), (2.5, 0.25, 0.9), (3.0, 0.25, 1.0), (3.5, 0.25, 0.9)], # Short arp base
+    
+    # --- Acoustic / Pop ---
+    "pop_strum": [(0.0, 1.0, 1.0), (1.0, 1.0, 0.9), (2.0, 1.0, 1.0), (3.0, 1.0, 0.9)], # Basic quarter notes
+    "pop_arpeggio": [(0.0, 0.5, 1.0), (0.5, 0.5, 0.9), (1.0, 0.5, 1.0), (1.5, 0.5, 0.9), (2.0, 0.5, 1.0), (2.5, 0.5, 0.9), (3.0, 0.5, 1.0), (3.5, 0.5, 0.9)], # Simple broken chords
+    "jazz_swing": [(0.0, 1.0, 1.0), (1.0, 0.66, 0.8), (1.66, 0.33, 0.6), (2.0, 1.0, 1.0), (3.0, 0.66, 0.8), (3.66, 0.33, 0.6)], # Swing feel
+    "gospel_sway": [(0.0, 1.5, 1.0), (1.5, 1.5, 0.9), (3.0, 0.5, 0.8), (3.5, 0.5, 0.9)], # 6/8 feel sway
+    "cinematic_swell": [(0.0, 4.0, 0.6)], # Very soft, long pad
+    
+    # --- New Complex Patterns ---
+    "afrobeat": [(0.0, 0.75, 1.0), (0.75, 0.25, 0.7), (1.0, 0.5, 0.9), (1.5, 0.75, 0.8), (2.25, 0.75, 1.0), (3.0, 0.5, 0.9), (3.5, 0.5, 0.7)],
+    "reggaeton_bounce": [(0.0, 0.75, 1.0), (0.75, 0.25, 0.6), (1.0, 0.5, 0.9), (1.5, 0.5, 0.8), (2.0, 0.75, 1.0), (2.75, 0.25, 0.6), (3.0, 0.5, 0.9), (3.5, 0.5, 0.8)],
+    "dnb_pad": [(0.0, 2.5, 0.9), (2.5, 1.5, 0.8)], # Atmospheric pad
+    "dnb_stab": [(0.0, 0.5, 1.0), (1.5, 0.5, 0.9), (2.5, 0.5, 1.0), (3.5, 0.5, 0.9)], # Liquid piano stabs
+    "dubstep_wub": [(0.0, 1.0, 1.0), (1.0, 0.5, 0.8), (1.5, 0.5, 0.9), (2.0, 2.0, 1.0)], # Half-time feel
+    "euro_trance": [(0.0, 0.75, 1.0), (0.75, 0.75, 0.0), (1.5, 0.75, 1.0), (2.25, 0.75, 0.0), (3.0, 0.75, 1.0), (3.75, 0.25, 0.0)], # Gate effect
+    "trance_gate": [(0.0, 0.25, 1.0), (0.25, 0.25, 0.0), (0.5, 0.25, 1.0), (0.75, 0.25, 0.0), (1.0, 0.25, 1.0), (1.25, 0.25, 0.0), (1.5, 0.25, 1.0), (1.75, 0.25, 0.0), (2.0, 0.25, 1.0), (2.25, 0.25, 0.0), (2.5, 0.25, 1.0), (2.75, 0.25, 0.0), (3.0, 0.25, 1.0), (3.25, 0.25, 0.0), (3.5, 0.25, 1.0), (3.75, 0.25, 0.0)], # Fast gate
+    
+    # --- Specific Artists ---
+    "walker_piano": [(0.0, 0.5, 1.3), (0.5, 0.5, 0.8), (1.0, 0.5, 1.3), (1.5, 0.5, 0.8), (2.0, 0.5, 1.3), (2.5, 0.5, 0.8), (3.0, 0.5, 1.3), (3.5, 0.5, 0.8)], # Heavy pulse
+    "walker_arp": [(0.0, 0.5, 1.2), (0.5, 0.25, 0.9), (0.75, 0.25, 0.9), (1.0, 0.5, 1.1), (1.5, 0.25, 0.9), (1.75, 0.25, 0.9), (2.0, 0.5, 1.2), (2.5, 0.25, 0.9), (2.75, 0.25, 0.9), (3.0, 0.5, 1.1), (3.5, 0.25, 0.9), (3.75, 0.25, 0.9)], # Dotted feel
+}
+
+def rhythm_array(pattern: List[tuple]) -> np.ndarray:
+    """
+    Converts a (start, duration, velocity_scale) pattern into (start, duration,
+    base_velocity) columns, with the bar / beat accents already folded in.
+    """
+    hits = np.array(pattern, dtype=float).reshape(-1, 3)
+    start = hits[:, 0]
+    # Velocity Humanization
+    # Accent first beat of bar (+10), other downbeats (+5)
+    beat_accent = 5 * (start % 4.0 == 0) + 5 * (start % 1.0 == 0)
+    hits[:, 2] = np.trunc(80 * hits[:, 2]) + beat_accent
+    return hits
+
+# Built once so rendering a rhythm is just a broadcast
+RHYTHM_ARRAYS = {name: rhythm_array(pattern) for name, pattern in RHYTHM_PATTERNS.items()}
+
+# Rhythms that roll the chord with a random 10-30ms strum when no strum speed is given
+RANDOM_STRUM_RHYTHMS = ("neo_soul", "lofi")
+
+def walker_arp(notes: List[int], length: float, gen: np.random.Generator) -> NoteArray:
+    """
+    Walker Arpeggiator Logic (Override standard block chords)
+    Pattern: Root (strong), 5th+Octave (weak), 5th (weak), Root...
+    """
+    root = notes[0]
+    # Find a suitable fifth (avoid close clusters if possible)
+    fifth = root + 7
+    if len(notes) > 2:
+        fifth = notes[2]
+    elif len(notes) > 1:
+        fifth = notes[1]
         
-        while current_time < length:
-            n = arp_sequence[step_idx % len(arp_sequence)]
-            
-            # Stronger velocity for downbeats
-            is_strong = (current_time % 2.0 == 0)
-            vel = 100 if is_strong else 85
-            
-            events.append({
-                "note": n,
-                "time": current_time + random.uniform(-0.01, 0.01),
-                "duration": step_size * 0.95,
-                "velocity": vel + random.randint(-5, 5)
-            })
-            
-            current_time += step_size
-            step_idx += 1
-            
-        return events
+    octave = root + 12
+    
+    # Simple broken chord pattern: 
+    # Beat 1: Root
+    # Beat 1.5: 5th
+    # Beat 2: Octave
+    # Beat 2.5: 5th
+    arp_sequence = np.array([root, fifth, octave, fifth])
+    step_size = 0.5
+    
+    steps = np.arange(int(np.ceil(length / step_size)))
+    times = steps * step_size
+    
+    # Stronger velocity for downbeats
+    velocity = np.where(times % 2.0 == 0, 100, 85) + gen.integers(-5, 6, len(steps))
+    
+    return NoteArray(
+        arp_sequence[steps % 4],
+        times + gen.uniform(-0.01, 0.01, len(steps)),
+        np.full(len(steps), step_size * 0.95),
+        velocity
+    )
+
+def euclidean_hits(gen: np.random.Generator) -> np.ndarray:
+    """Random Euclidean rhythm over a bar of 16ths, as rhythm_array columns."""
+    pulses = int(gen.integers(3, 10))
+    steps = 16
+    euc_pattern = euclidean_pattern(steps, pulses)
+    selected_pattern = []
+    step_len = 0.25
+    for i, hit in enumerate(euc_pattern):
+        if hit:
+            selected_pattern.append((i * step_len, step_len, 1.0 if i % 4 == 0 else 0.8))
+    return rhythm_array(selected_pattern)
+
+def apply_rhythms(jobs: List[tuple], rng: Optional[random.Random] = None) -> NoteArray:
+    """
+    Renders many chords at once. Each job is (notes, rhythm_type, length,
+    strum_speed, offset) with the same meaning as apply_rhythm's arguments plus
+    the chord's start time; every hit of every chord is humanized in a single
+    batch of NumPy draws.
+    """
+    return apply_rhythms_batch([jobs], [numpy_rng(rng)])[0]
 
-    # Check if we should use Euclidean rhythms for "random" or unknown types
-    if rhythm_type == "euclidean_random":
-        pulses = random.randint(3, 9)
-        steps = 16
-        euc_pattern = euclidean_pattern(steps, pulses)
-        selected_pattern = []
-        step_len = 0.25
-        for i, hit in enumerate(euc_pattern):
-            if hit:
-                selected_pattern.append((i * step_len, step_len, 1.0 if i % 4 == 0 else 0.8))
+def apply_rhythms_batch(tracks: List[List[tuple]], gens: List[np.random.Generator]) -> List[NoteArray]:
+    """
+    apply_rhythms for several tracks (one job list and Generator each) in one
+    pass. Each track draws from its own Generator exactly as it would alone, so
+    the results match rendering them one by one; the humanization arithmetic
+    runs once over every track's hits.
+    """
+    special_parts = [[] for _ in tracks]
+    pitches = []
+    hit_rows = []
+    hit_sizes = [] # notes per hit
+    hit_meta = [] # (length, strum_speed, offset, random_strum) per hit
+    track_sizes = [] # events per track
+    strum_draws, time_draws, velocity_draws = [], [], []
     
-    for start, dur, vel_scale in selected_pattern:
-        # If the pattern exceeds the chord length, stop
-        if start >= length:
-            break
-            
-        real_dur = min(dur, length - start)
-        
-        # Determine Strum Offset
-        current_strum_speed = strum_speed
-        if current_strum_speed == 0.0:
-            if "neo_soul" in rhythm_type or "lofi" in rhythm_type:
-                 current_strum_speed = random.uniform(0.01, 0.03) # 10-30ms strum
-            elif "pop_strum" in rhythm_type:
-                 current_strum_speed = 0.02
-        
-        for i, note in enumerate(notes):
-            # Apply slight swing/humanization to time
-            humanize = random.uniform(-0.02, 0.02)
-            
-            # Apply strum (lowest note first)
-            current_strum = i * current_strum_speed
+    for track, (jobs, gen) in enumerate(zip(tracks, gens)):
+        first_hit, first_event = len(hit_meta), len(pitches)
+        for notes, rhythm_type, length, strum_speed, offset in jobs:
+            if not notes:
+                continue
+            if rhythm_type == "walker_arp":
+                special_parts[track].append(walker_arp(notes, length, gen).shift(offset))
+                continue
             
-            # Velocity Humanization
-            # Accent first beat of bar
-            beat_accent = 0
-            if start % 4.0 == 0: beat_accent = 10
-            elif start % 1.0 == 0: beat_accent = 5
-            
-            # Higher notes slightly softer naturally? Or louder? Let's keep random.
-            pitch_variance = 0 # (note % 12) / 2 # Slight variance by pitch class?
+            # Check if we should use Euclidean rhythms for "random" or unknown types
+            if rhythm_type == "euclidean_random":
+                hits = euclidean_hits(gen)
+            else:
+                hits = RHYTHM_ARRAYS.get(rhythm_type, RHYTHM_ARRAYS["basic"])
             
-            final_velocity = int(80 * vel_scale) + beat_accent + random.randint(-5, 5)
-            final_velocity = max(1, min(127, final_velocity))
+            # Patterns are sorted by start: if the pattern exceeds the chord length, stop
+            if hits[-1, 0] >= length:
+                hits = hits[hits[:, 0] < length]
             
-            events.append({
-                "note": note,
-                "time": start + humanize + current_strum,
-                "duration": real_dur * 0.95,
-                "velocity": final_velocity
-            })
+            # Determine Strum Offset
+            random_strum = False
+            if strum_speed == 0.0:
+                if any(r in rhythm_type for r in RANDOM_STRUM_RHYTHMS):
+                    random_strum = True
+                elif "pop_strum" in rhythm_type:
+                    strum_speed = 0.02
             
-    return events
+            hit_rows.append(hits)
+            hit_sizes.extend([len(notes)] * len(hits))
+            hit_meta.extend([(length, strum_speed, offset, random_strum)] * len(hits))
+            pitches.extend(list(notes) * len(hits))
+
+        # This track's draws, in the order a single-track render makes them
+        track_hits, track_events = len(hit_meta) - first_hit, len(pitches) - first_event
+        track_sizes.append(track_events)
+        if track_hits:
+            strum_draws.append(gen.uniform(0.01, 0.03, track_hits)) # 10-30ms strum
+            time_draws.append(gen.uniform(-0.02, 0.02, track_events))
+            velocity_draws.append(gen.integers(-5, 6, track_events))
+    
+    if not hit_rows:
+        return [NoteArray.concat(parts) for parts in special_parts]
+    
+    # Hit level columns
+    hits = np.concatenate(hit_rows)
+    start, dur, base_velocity = hits[:, 0], hits[:, 1], hits[:, 2]
+    length, strum_speed, offset, random_strum = np.array(hit_meta).T
+    strum_speed = np.where(random_strum == 1, np.concatenate(strum_draws), strum_speed)
+    real_dur = np.minimum(dur, length - start)
+    
+    # Event level: every hit plays each of its chord's notes
+    sizes = np.array(hit_sizes)
+    total = len(pitches)
+    first_event = np.repeat(np.cumsum(sizes) - sizes, sizes)
+    note_pos = np.arange(total) - first_event
+    
+    # Apply strum (lowest note first) and slight swing/humanization to time
+    times = np.repeat(start + offset, sizes) + np.concatenate(time_draws) + note_pos * np.repeat(strum_speed, sizes)
+    velocity = np.repeat(base_velocity, sizes) + np.concatenate(velocity_draws)
+    
+    # Ensure time is never negative (Tone.js doesn't like negative time)
+    events = NoteArray(pitches, np.maximum(times, 0.0), np.repeat(real_dur * 0.95, sizes), velocity)
+    ends = np.cumsum(track_sizes)
+    return [
+        NoteArray.concat([events.take(slice(end - size, end))] + parts)
+        for size, end, parts in zip(track_sizes, ends, special_parts)
+    ]
+
+def apply_rhythm(notes: List[int], rhythm_type: str = "basic", length: float = 4.0, strum_speed: float = 0.0, rng: Optional[random.Random] = None) -> NoteArray:
+    """
+    Applies a rhythmic pattern to the full chord.
+    
+    Args:
+        notes: List of MIDI notes
+        rhythm_type: Name of the rhythm pattern
+        length: Duration in beats
+        strum_speed: Delay in seconds between notes in a chord (0.02 is standard strum)
+        rng: Random source to draw from (defaults to the global `random` module); a
+             NumPy Generator shared across chords is used as-is
+    """
+    return apply_rhythms([(notes, rhythm_type, length, strum_speed, 0.0)], rng)
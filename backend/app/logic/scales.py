@@ -5,6 +5,9 @@ from typing import List, Dict
 # Constants
 NOTES = ["C", "C#", "D", "D#", "E", "F", "F#", "G", "G#", "A", "A#", "B"]
 NOTE_TO_INT = {note: i for i, note in enumerate(NOTES)}
+FLAT_TO_SHARP = {"Db": "C#", "Eb": "D#", "Gb": "F#", "Ab": "G#", "Bb": "A#"}
+# Sharps and flats in one flat lookup so get_note_index is a single dict hit
+NOTE_INDEX = {**NOTE_TO_INT, **{flat: NOTE_TO_INT[sharp] for flat, sharp in FLAT_TO_SHARP.items()}}
 
 SCALES = {
     "minor": [0, 2, 3, 5, 7, 8, 10],            # Natural Minor (Aeolian)
@@ -12,18 +15,24 @@ SCALES = {
     "phrygian": [0, 1, 3, 5, 7, 8, 10],         # Phrygian (Dark/Aggressive)
     "dorian": [0, 2, 3, 5, 7, 9, 10],           # Dorian (Jazzy/Soulful)
     "lydian": [0, 2, 4, 6, 7, 9, 11],           # Lydian (Dreamy/Bright)
+    "mixolydian": [0, 2, 4, 5, 7, 9, 10],       # Mixolydian (Bluesy/Rock)
+    "locrian": [0, 1, 3, 5, 6, 8, 10],          # Locrian (Unstable/Horror)
+    "melodic_minor": [0, 2, 3, 5, 7, 9, 11],    # Melodic Minor (Jazz)
     "minor_pentatonic": [0, 3, 5, 7, 10],       # Simple/Safe
     "major": [0, 2, 4, 5, 7, 9, 11]             # Major
 }
 
 def get_note_index(note_name: str) -> int:
     """Converts a note name (e.g., 'C#') to its integer index (0-11)."""
-    flat_map = {"Db": "C#", "Eb": "D#", "Gb": "F#", "Ab": "G#", "Bb": "A#"}
-    norm_note = flat_map.get(note_name, note_name)
-    return NOTE_TO_INT.get(norm_note, 0)
+    return NOTE_INDEX.get(note_name, 0)
+
+def normalize_scale(scale_type: str) -> str:
+    """The SCALES key for a scale name: case-insensitive, unknown names fall back to minor."""
+    scale_type = scale_type.lower()
+    return scale_type if scale_type in SCALES else "minor"
 
 def get_scale_intervals(scale_type: str) -> List[int]:
-    return SCALES.get(scale_type.lower(), SCALES["minor"])
+    return SCALES[normalize_scale(scale_type)]
 
 def get_triad_notes(root_note_name: str, scale_type: str, degree: int, octave: int = 4) -> List[int]:
     """
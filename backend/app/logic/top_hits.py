@@ -1,10 +1,13 @@
 from typing import List, Dict, Any
+import logging
 import random
 import os
 from app.logic.chords import generate_progression, generate_track_data
 from app.logic.melody import generate_melody
 from app.utils.midi_parser import parse_midi_file
 
+logger = logging.getLogger(__name__)
+
 TOP_HITS_TEMPLATES = [
     {
         "id": "despacito_latin",
@@ -461,6 +464,21 @@ def get_shape_of_you_pattern():
         }
     }
 
+def is_static_template(template_id: str) -> bool:
+    """
+    True if generate_top_hit_track always returns the same track for this template
+    (MIDI file overrides and hardcoded replicas), so its response can be precomputed.
+    """
+    if template_id == "alan_walker_faded":
+        base_path = os.path.join(os.getcwd(), "app", "data", "midi")
+        if os.path.exists(os.path.join(base_path, "alan_walker_faded_chords.mid")) or os.path.exists(os.path.join(base_path, "alan_walker_faded_melody.mid")):
+            return True
+
+    base_dir = os.path.dirname(os.path.dirname(__file__)) # app/
+    if os.path.exists(os.path.join(base_dir, "data", "midi", f"{template_id}.mid")):
+        return True
+    return template_id in ("despacito_latin", "shape_of_you")
+
 def generate_top_hit_track(template_id: str) -> Dict[str, Any]:
     """Generates a full track data dictionary based on a template ID."""
     
@@ -472,7 +490,7 @@ def generate_top_hit_track(template_id: str) -> Dict[str, Any]:
         pluck_path = os.path.join(base_path, "alan_walker_faded_pluck.mid")
         
         if os.path.exists(chords_path) or os.path.exists(melody_path):
-            print("Found Alan Walker MIDI files, merging...")
+            logger.debug("Found Alan Walker MIDI files, merging...")
             combined_data = {
                 "tempo": 90,
                 "key": "D#",
@@ -517,7 +535,7 @@ def generate_top_hit_track(template_id: str) -> Dict[str, Any]:
     midi_path = os.path.join(base_dir, "data", "midi", midi_filename)
     
     if os.path.exists(midi_path):
-        print(f"Found MIDI file override: {midi_path}")
+        logger.debug("Found MIDI file override: %s", midi_path)
         midi_data = parse_midi_file(midi_path)
         if midi_data:
             # Optional: Override instruments/metadata for specific templates
@@ -0,0 +1,105 @@
+from functools import lru_cache
+from typing import List, Tuple
+
+import numpy as np
+
+# --- Global Voice Leading ---
+# smooth_voice_leading (chords.py) places each chord next to the previous one and
+# can't look ahead. The optimiser below picks the upper structure of every chord
+# at once: each chord gets a small set of candidate voicings (close-position
+# inversions and their drop-2 spreads, at every octave in range), transitions are
+# scored with a cost matrix per pair of candidate sets and a Viterbi pass finds
+# the cheapest path through the whole progression. The bass note (notes[0]) is
+# kept, as in the greedy version.
+#
+# Candidate sets and cost matrices depend only on pitch classes and range, so
+# both are memoised; after warm-up a 16-chord progression is a handful of small
+# NumPy operations.
+
+VOICING_SPAN = 24 # Upper notes sit within two octaves above the bass
+DRIFT_WEIGHT = 0.25 # Cost per semitone the voicing's centre moves away from the chord as written
+
+@lru_cache(maxsize=2048)
+def candidate_voicings(pitch_classes: Tuple[int, ...], low: int, high: int) -> np.ndarray:
+    """
+    All close-position inversions (plus drop-2 spreads) of the pitch classes with
+    every note inside low..high, as a (candidates, notes) array sorted low to high.
+    """
+    pcs = sorted(pitch_classes)
+    voicings = []
+    for r in range(len(pcs)):
+        order = pcs[r:] + pcs[:r]
+        first = low + (order[0] - low) % 12
+        while first <= high:
+            voicing = [first]
+            for pc in order[1:]:
+                voicing.append(voicing[-1] + ((pc - voicing[-1]) % 12 or 12))
+            if voicing[-1] <= high:
+                voicings.append(voicing)
+                if len(voicing) >= 3 and voicing[-2] - 12 >= low:
+                    # Drop 2: second note from the top down an octave
+                    voicings.append(sorted(voicing[:-2] + [voicing[-2] - 12, voicing[-1]]))
+            first += 12
+
+    if not voicings:
+        return np.empty((0, len(pcs)), dtype=int)
+    candidates = np.unique(np.array(voicings, dtype=int), axis=0)
+    candidates.flags.writeable = False # Shared through the cache
+    return candidates
+
+@lru_cache(maxsize=4096)
+def transition_costs(a: Tuple[Tuple[int, ...], int, int], b: Tuple[Tuple[int, ...], int, int]) -> np.ndarray:
+    """
+    Movement cost between every candidate of chord a and every candidate of chord b
+    (keys as for candidate_voicings): how far each note has to travel to the nearest
+    note of the other chord, averaged, in both directions.
+    """
+    A, B = candidate_voicings(*a), candidate_voicings(*b)
+    distance = np.abs(A[:, None, :, None] - B[None, :, None, :]) # (Ka, Kb, na, nb)
+    costs = distance.min(axis=2).mean(axis=2) + distance.min(axis=3).mean(axis=2)
+    costs.flags.writeable = False
+    return costs
+
+def voicing_key(notes: List[int]) -> Tuple[Tuple[int, ...], int, int]:
+    bass = notes[0]
+    return tuple(sorted(n % 12 for n in notes[1:])), bass + 1, bass + VOICING_SPAN
+
+def optimize_voice_leading(progression: List[List[int]]) -> List[List[int]]:
+    """
+    Re-voices the upper structure of every chord (notes[0] is kept as the bass) to
+    minimise total movement across the whole progression. Chords with fewer than
+    two notes, or whose notes don't fit the range, are left as they are.
+    """
+    voiced = [list(notes) for notes in progression]
+    index = [i for i, notes in enumerate(progression) if len(notes) >= 2]
+    keys = [voicing_key(progression[i]) for i in index]
+    candidates = [candidate_voicings(*key) for key in keys]
+    usable = [len(c) > 0 for c in candidates]
+    index = [i for i, ok in zip(index, usable) if ok]
+    keys = [k for k, ok in zip(keys, usable) if ok]
+    candidates = [c for c, ok in zip(candidates, usable) if ok]
+    if not index:
+        return voiced
+
+    # Stay close to the register each chord was written in
+    drift = [
+        DRIFT_WEIGHT * np.abs(c.mean(axis=1) - np.mean(progression[i][1:]))
+        for i, c in zip(index, candidates)
+    ]
+
+    # Viterbi over candidate voicings
+    cost = drift[0]
+    back = []
+    for t in range(1, len(index)):
+        total = cost[:, None] + transition_costs(keys[t - 1], keys[t]) + drift[t][None, :]
+        best = total.argmin(axis=0)
+        cost = total[best, np.arange(total.shape[1])]
+        back.append(best)
+
+    choice = int(cost.argmin())
+    for t in range(len(index) - 1, -1, -1):
+        i = index[t]
+        voiced[i] = [progression[i][0]] + candidates[t][choice].tolist()
+        if t:
+            choice = int(back[t - 1][choice])
+    return voiced
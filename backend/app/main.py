@@ -1,31 +1,91 @@
 
-from fastapi import FastAPI, BackgroundTasks, Request
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi import FastAPI, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.middleware.gzip import GZipMiddleware
-from pydantic import BaseModel
-from typing import List, Optional
+from pydantic import BaseModel, conint
+from typing import Any, Dict, List, Optional, Union
 import sys
+import asyncio
+import json
+import logging
 import os
-import mido
 import random
+from contextlib import asynccontextmanager
+from dataclasses import astuple
+from functools import partial
 
 # Add the parent directory to sys.path to allow imports from 'app'
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from app.logic.chords import generate_progression, generate_track_data
-from app.logic.top_hits import get_top_hits_templates, generate_top_hit_track
-from app.utils.midi_export import create_midi_file
+from app.logic.chords import generate_progression, generate_track_data, batch_plan, build_chord_table, CHORD_TABLE
+from app.logic.top_hits import get_top_hits_templates, generate_top_hit_track, is_static_template
+from app.logic.notes import NoteArray
+from app.utils.responses import FastJSONResponse, MAX_SEED, dumps
+from app.utils.http_cache import PrecomputedBody, precompute_body, precompute_json, cached_response
+from app.utils.wire import JSON, NotAcceptable, negotiate, offered_media_types, wire_track, encode_body, wire_response, parse_body
+from app.utils.session import TrackSession
+from app.utils.admission import AdmissionMiddleware, Overloaded, admit_request, retry_after
+from app.utils.deadline import DeadlineMiddleware, Cancelled, tighten_deadline
+from app.utils.log import RequestLogMiddleware, configure_logging
+from app.utils.metrics import CANCELLED, MetricsMiddleware, TimedGZipMiddleware, render_metrics
+from app.utils.profiling import ProfilingMiddleware
+from app.utils.singleflight import SingleFlight
+from app.utils.snapshot import load_snapshot
+from app.utils.track_store import TRACKS
+from app.utils.workers import WORKER_PROCESSES, pool_ready, run_job, stream_jobs, start_pool, stop_pool, generate_track_job, generate_batch_job, stream_track_job, layer_job, top_hit_job, encode_midi_job
 
-app = FastAPI(title="Universal MIDI Generator")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load (or build) the precomputed tables and warm the generation worker pool before taking traffic
+    warm_tables()
+    start_pool()
+    yield
+    stop_pool()
 
-app.add_middleware(GZipMiddleware, minimum_size=1000)
+configure_logging()
+logger = logging.getLogger(__name__)
+
+app = FastAPI(title="Universal MIDI Generator", lifespan=lifespan, default_response_class=FastJSONResponse)
+
+app.add_middleware(TimedGZipMiddleware, minimum_size=1000) # GZipMiddleware that times itself ("compress" stage)
+# Bounded concurrency and wait queue for worker jobs; overflow gets 503 + Retry-After
+app.add_middleware(AdmissionMiddleware)
+
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request: Request, exc: Overloaded):
+    logger.info("Shed %s: %s", request.url.path, exc.reason)
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Server busy, please retry", "reason": exc.reason},
+        headers={"Retry-After": retry_after()},
+    )
+
+# Request deadline (X-Deadline-Ms / deadline_ms) and disconnect checks between generation stages
+app.add_middleware(DeadlineMiddleware)
+
+@app.exception_handler(Cancelled)
+async def cancelled_handler(request: Request, exc: Cancelled):
+    logger.info("Cancelled %s before %s: %s", request.url.path, exc.stage, exc.reason)
+    CANCELLED.inc(exc.reason, exc.stage)
+    if exc.reason == "deadline":
+        return JSONResponse(status_code=504, content={"detail": "Deadline exceeded", "stage": exc.stage})
+    # Nobody is listening; 499 (client closed request) is for the access log and metrics
+    return JSONResponse(status_code=499, content={"detail": "Client disconnected", "stage": exc.stage})
+
+@app.exception_handler(NotAcceptable)
+async def not_acceptable_handler(request: Request, exc: NotAcceptable):
+    return JSONResponse(
+        status_code=406,
+        content={"detail": "None of the offered media types is acceptable", "offered": offered_media_types()},
+        headers={"Vary": "Accept"},
+    )
 
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
-    print(f"Validation error: {exc.errors()}")
-    print(f"Body: {await request.body()}")
+    logger.info("Validation error on %s: %s", request.url.path, exc.errors())
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Body: %r", await request.body())
     return JSONResponse(
         status_code=422,
         content={"detail": exc.errors(), "body": str(await request.body())},
@@ -37,8 +97,16 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID", "X-Profile", "Retry-After"],
 )
 
+# Request and stage histograms for /metrics, observed in RequestLogMiddleware's context
+app.add_middleware(MetricsMiddleware)
+# Opt-in profiling of single requests (PROFILING=1 plus X-Profile / ?profile=)
+app.add_middleware(ProfilingMiddleware)
+# Outermost: request id, stage timings and one access log line per request
+app.add_middleware(RequestLogMiddleware)
+
 class ChordRequest(BaseModel):
     key: str = "Random"
     scale: str = "Random"
@@ -48,6 +116,26 @@ class ChordRequest(BaseModel):
     melody: bool = True
     tempo: int = 140
     source: str = "auto" # auto, generate, library
+    seed: Optional[conint(ge=0, le=MAX_SEED)] = None # Same seed + settings -> same track (served from cache)
+    deadline_ms: Optional[float] = None # Time budget; also X-Deadline-Ms (the tighter one wins)
+
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "64"))
+
+class BatchChordRequest(ChordRequest):
+    count: conint(ge=1, le=MAX_BATCH_SIZE) = 8 # Number of variations
+
+class StreamChordRequest(ChordRequest):
+    count: int = 8 # Number of variations, clamped to MAX_STREAM_SIZE
+
+# BPM range accepted for downloads (encode_midi divides by the tempo)
+MIN_TEMPO, MAX_TEMPO = 20, 400
+# Streamed batches (/generate/chords/stream) hold only STREAM_CONCURRENCY tracks at a time
+MAX_STREAM_SIZE = int(os.getenv("MAX_STREAM_SIZE", "1000"))
+STREAM_CONCURRENCY = int(os.getenv("STREAM_CONCURRENCY", "0")) or max(1, WORKER_PROCESSES)
+
+# Identical requests in flight at the same time share one computation (see app/utils/singleflight.py)
+CHORD_FLIGHTS = SingleFlight("chords")
+TOP_HIT_FLIGHTS = SingleFlight("top_hit")
 
 class NoteEvent(BaseModel):
     note: int
@@ -61,17 +149,35 @@ class ChordData(BaseModel):
     velocity: int = 80
     name: Optional[str] = None
 
+class LayerRequest(BaseModel):
+    # An existing track's raw_progression plus the settings it was generated with
+    raw_progression: List[ChordData]
+    key: str
+    scale: str
+    mood: str = "neutral"
+    complexity: float = 0.5
+    seed: Optional[conint(ge=0, le=MAX_SEED)] = None # Same seed + progression -> same layer
+
+class NoteColumns(BaseModel):
+    # Columnar note events (see app/utils/wire.py); validated per column, not per note
+    note: List[int]
+    dt: List[int] # Start ticks since the previous event
+    dur: List[int]
+    vel: Optional[List[int]] = None
+
 class MidiRequest(BaseModel):
     progression: Optional[List[ChordData]] = None
-    chords: Optional[List[NoteEvent]] = None
-    melody: Optional[List[NoteEvent]] = None
-    bass: Optional[List[NoteEvent]] = None
-    tempo: int = 120
+    chords: Optional[Union[NoteColumns, List[NoteEvent]]] = None
+    melody: Optional[Union[NoteColumns, List[NoteEvent]]] = None
+    bass: Optional[Union[NoteColumns, List[NoteEvent]]] = None
+    resolution: int = 960 # Ticks per beat of columnar parts
+    tempo: conint(ge=MIN_TEMPO, le=MAX_TEMPO) = 120
     mood: str = "neutral"
     instruments: Optional[dict] = None # {"chords": 0, "melody": 0, "bass": 33}
 
 def midi_to_json(file_path):
     """Parses a MIDI file into the JSON format expected by the frontend."""
+    import mido # Kept off the cold-start import path
     mid = mido.MidiFile(file_path)
     tpb = mid.ticks_per_beat
     
@@ -168,18 +274,108 @@ def midi_to_json(file_path):
                      
     return output
 
+# --- Precomputed Top Hits Responses ---
+# Browsers may reuse these for STATIC_MAX_AGE seconds, then revalidate with the ETag
+STATIC_CACHE_CONTROL = f"public, max-age={int(os.getenv('STATIC_MAX_AGE', '3600'))}"
+
+# "list" -> the /api/top-hits body; (template_id, media_type) -> static templates only
+TOP_HIT_BODIES: Dict[Any, PrecomputedBody] = {}
+
+def top_hits_body() -> PrecomputedBody:
+    body = TOP_HIT_BODIES.get("list")
+    if body is None:
+        body = TOP_HIT_BODIES["list"] = precompute_json(get_top_hits_templates())
+    return body
+
+def static_top_hit_body(template_id: str, media_type: str = JSON) -> Optional[PrecomputedBody]:
+    """Precomputed /generate/top-hit response for templates that always produce the same track."""
+    body = TOP_HIT_BODIES.get((template_id, media_type))
+    if body is None:
+        if not is_static_template(template_id):
+            return None
+        content = top_hit_response(wire_track(generate_top_hit_track(template_id), media_type))
+        body = TOP_HIT_BODIES[(template_id, media_type)] = precompute_body(encode_body(content, media_type), media_type)
+    return body
+
+def precompute_top_hits():
+    top_hits_body()
+    for template in get_top_hits_templates():
+        for media_type in offered_media_types():
+            static_top_hit_body(template["id"], media_type)
+
+# --- Warm-up & Readiness ---
+# Startup builds the chord table and the top-hits bodies (parsing every template's
+# MIDI file), or loads both from the prebuilt snapshot (app/utils/snapshot.py).
+# /ready answers 503 until that is done and the worker pool is up, so a load
+# balancer only routes to warm instances. Without a lifespan (serverless), the
+# first /ready call starts the warm-up in the background.
+READINESS = {"tables": None} # None, "warming", "snapshot" or "built"
+
+def build_tables() -> Dict[str, Any]:
+    """Everything warm_tables needs, in snapshot (marshal-able) form."""
+    precompute_top_hits()
+    return {
+        "chord_table": dict(build_chord_table()),
+        "top_hit_bodies": {key: astuple(body) for key, body in TOP_HIT_BODIES.items()},
+    }
+
+def warm_tables():
+    if READINESS["tables"] not in (None, "warming"):
+        return
+    try:
+        tables = load_snapshot()
+        if tables is not None:
+            CHORD_TABLE.update(tables["chord_table"])
+            TOP_HIT_BODIES.update({key: PrecomputedBody(*body) for key, body in tables["top_hit_bodies"].items()})
+            READINESS["tables"] = "snapshot"
+        else:
+            build_tables()
+            READINESS["tables"] = "built"
+    except Exception:
+        READINESS["tables"] = None # Let the next /ready call retry
+        logger.exception("Warm-up failed")
+        raise
+    logger.info("Tables ready (%s)", READINESS["tables"])
+
+@app.get("/ready")
+async def ready():
+    checks = {"tables": READINESS["tables"] in ("snapshot", "built"), "workers": pool_ready()}
+    if READINESS["tables"] is None:
+        READINESS["tables"] = "warming"
+        asyncio.get_running_loop().run_in_executor(None, warm_tables)
+    if all(checks.values()):
+        return {"ready": True, "checks": checks, "tables": READINESS["tables"]}
+    return JSONResponse(status_code=503, content={"ready": False, "checks": checks, "tables": READINESS["tables"]}, headers={"Retry-After": "1"})
+
 @app.get("/api/top-hits")
-def get_top_hits():
-    return get_top_hits_templates()
+def get_top_hits(request: Request):
+    return cached_response(request, top_hits_body(), STATIC_CACHE_CONTROL)
 
 class TopHitRequest(BaseModel):
     template_id: str
 
 @app.post("/generate/top-hit")
-def generate_top_hit(request: TopHitRequest):
-    data = generate_top_hit_track(request.template_id)
+async def generate_top_hit(request: TopHitRequest, http_request: Request):
+    return await top_hit(request.template_id, http_request)
+
+@app.get("/generate/top-hit/{template_id}")
+async def get_top_hit(template_id: str, request: Request):
+    # Cacheable variant of POST /generate/top-hit (ETag / If-None-Match for static templates)
+    return await top_hit(template_id, request)
+
+async def top_hit(template_id: str, request: Request):
+    media_type = negotiate(request.headers.get("accept"))
+    cached = static_top_hit_body(template_id, media_type)
+    if cached is not None:
+        return cached_response(request, cached, STATIC_CACHE_CONTROL)
+
+    # Generated templates are different every time, but concurrent requests for one share a track
+    data = await TOP_HIT_FLIGHTS.do((template_id, media_type), run_job, top_hit_job, template_id, media_type)
+    return wire_response(top_hit_response(data), media_type, headers={"Cache-Control": "no-store"})
+
+def top_hit_response(data):
     # Return in standard format
-    return {
+    response = {
         "chords": data.get("chords", []),
         "melody": data.get("melody", []),
         "bass": data.get("bass", []),
@@ -189,6 +385,9 @@ def generate_top_hit(request: TopHitRequest):
         "mood": data["mood"],
         "instruments": data.get("instruments", {})
     }
+    if "resolution" in data: # Columnar formats
+        response["resolution"] = data["resolution"]
+    return response
 
 @app.get("/api/python")
 def hello_python():
@@ -198,43 +397,190 @@ def hello_python():
 def read_root():
     return {"message": "Universal MIDI Generator API is running"}
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus text format: request latency per route and time per generation stage."""
+    return Response(content=render_metrics(), media_type="text/plain; version=0.0.4")
+
 @app.post("/generate/chords")
-def generate_chords(request: ChordRequest):
-    print("Generating new track...")
+async def generate_chords(request: ChordRequest, http_request: Request):
+    logger.debug("Generating new track...")
+    tighten_deadline(request.deadline_ms)
+    media_type = negotiate(http_request.headers.get("accept"))
     
-    # Generate track data
-    result = generate_track_data(
+    settings = dict(
         key=request.key if request.key != "Random" else None,
         scale=request.scale if request.scale != "Random" else None,
         mood=request.mood if request.mood != "Random" else None,
         length=request.length,
         complexity=request.complexity,
         melody=request.melody,
-        tempo=request.tempo
+        tempo=request.tempo,
+        seed=request.seed
+    )
+    # Generate track data (in the worker pool). Seeded requests are deterministic,
+    # so identical ones in flight at the same time share one generation.
+    if request.seed is not None:
+        result, track = await CHORD_FLIGHTS.do((media_type, *settings.items()), run_job, generate_track_job, media_type=media_type, store=True, **settings)
+    else:
+        result, track = await run_job(generate_track_job, media_type=media_type, store=True, **settings)
+    # Kept server-side so the download can be GET /download/midi/{track_id}
+    TRACKS.put(track)
+    result = {**result, "track_id": track.id, "source": "Generated"} # Possibly shared with coalesced requests
+    return wire_response(result, media_type)
+
+@app.post("/generate/chords/batch")
+async def generate_chords_batch(request: BatchChordRequest, http_request: Request):
+    count = request.count
+    logger.debug("Generating batch of %d tracks...", count)
+    tighten_deadline(request.deadline_ms)
+    media_type = negotiate(http_request.headers.get("accept"))
+
+    tracks = await run_job(
+        generate_batch_job,
+        count,
+        media_type=media_type,
+        key=request.key if request.key != "Random" else None,
+        scale=request.scale if request.scale != "Random" else None,
+        mood=request.mood if request.mood != "Random" else None,
+        length=request.length,
+        complexity=request.complexity,
+        melody=request.melody,
+        tempo=request.tempo,
+        seed=request.seed
+    )
+    for track in tracks:
+        track["source"] = "Generated"
+    return wire_response({"count": len(tracks), "seed": request.seed, "tracks": tracks}, media_type)
+
+@app.post("/generate/chords/stream")
+async def generate_chords_stream(request: StreamChordRequest):
+    """
+    Same variations as /generate/chords/batch (for the same seed), streamed as
+    NDJSON: one track per line, in completion order, each with its "index".
+    """
+    count = max(1, min(MAX_STREAM_SIZE, request.count))
+    logger.debug("Streaming batch of %d tracks...", count)
+    tighten_deadline(request.deadline_ms) # Ends the stream early once it passes
+
+    key, scale, mood, seeds = batch_plan(
+        request.key if request.key != "Random" else None,
+        request.scale if request.scale != "Random" else None,
+        request.mood if request.mood != "Random" else None,
+        request.seed
+    )
+    jobs = (
+        partial(
+            stream_track_job, index,
+            key=key, scale=scale, mood=mood,
+            length=request.length,
+            complexity=request.complexity,
+            melody=request.melody,
+            tempo=request.tempo,
+            seed=seed
+        )
+        for index, seed in zip(range(count), seeds)
     )
-    result["source"] = "Generated"
-    return result
+    await admit_request() # Before the 200 goes out: the stream's jobs all run under this slot
+    return StreamingResponse(stream_jobs(jobs, STREAM_CONCURRENCY), media_type="application/x-ndjson")
 
-def remove_file(path: str):
+@app.websocket("/ws/session")
+async def track_session(websocket: WebSocket):
+    """
+    Interactive editing: the track and its settings live on the server for the
+    lifetime of the connection, commands are small JSON messages and replies only
+    carry the fields that changed (see app/utils/session.py for the protocol).
+    """
+    await websocket.accept()
+    session = TrackSession()
     try:
-        os.unlink(path)
-    except Exception as e:
-        print(f"Error removing file {path}: {e}")
+        while True:
+            message = await websocket.receive_text()
+            try:
+                command = json.loads(message)
+            except ValueError:
+                command = None
+            if not isinstance(command, dict):
+                await websocket.send_text(dumps({"id": None, "error": "Commands must be JSON objects"}).decode())
+                continue
+
+            reply = await session.handle(command)
+            if isinstance(reply, bytes):
+                await websocket.send_bytes(reply)
+            else:
+                await websocket.send_text(dumps(reply).decode())
+    except WebSocketDisconnect:
+        pass
+
+# --- Partial Regeneration ---
+# New melody / bass / rhythm for a progression the client already has: only that
+# layer is generated, so the chords the user liked stay as they are.
+
+async def regenerate(layer: str, request: LayerRequest, http_request: Request):
+    logger.debug("Regenerating %s over %d chords...", layer, len(request.raw_progression))
+    media_type = negotiate(http_request.headers.get("accept"))
+    result = await run_job(
+        layer_job,
+        layer,
+        [chord.dict() for chord in request.raw_progression],
+        media_type,
+        key=request.key,
+        scale=request.scale,
+        mood=request.mood,
+        complexity=request.complexity,
+        seed=request.seed
+    )
+    # Merged into the client's track, this part no longer matches any stored track
+    result["track_id"] = None
+    return wire_response(result, media_type)
+
+@app.post("/generate/melody")
+async def generate_melody_layer(request: LayerRequest, http_request: Request):
+    return await regenerate("melody", request, http_request)
+
+@app.post("/generate/bass")
+async def generate_bass_layer(request: LayerRequest, http_request: Request):
+    return await regenerate("bass", request, http_request)
+
+@app.post("/generate/rhythm")
+async def generate_rhythm_layer(request: LayerRequest, http_request: Request):
+    """New rhythm patterns for the chords; returned as the "chords" part."""
+    return await regenerate("rhythm", request, http_request)
+
+def midi_response(data: bytes, filename: str = "track.mid") -> Response:
+    """Serves encoded MIDI bytes as a download, straight from memory (no temp file)."""
+    return Response(
+        content=data,
+        media_type="audio/midi",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+def part_size(part) -> int:
+    if part is None:
+        return 0
+    return len(part.note) if isinstance(part, NoteColumns) else len(part)
+
+def part_notes(part, resolution: int) -> NoteArray:
+    if isinstance(part, NoteColumns):
+        return NoteArray.from_columns(part.dict(), resolution)
+    return NoteArray.from_events(event.dict() for event in part)
 
 @app.post("/download/midi")
-def download_midi(request: MidiRequest, background_tasks: BackgroundTasks):
-    print(f"Received MIDI download request. Chords events: {len(request.chords) if request.chords else 0}, Melody events: {len(request.melody) if request.melody else 0}")
+async def download_midi(http_request: Request):
+    # Parsed by hand so JSON, columnar JSON and MessagePack bodies are all accepted
+    request = await parse_body(http_request, MidiRequest)
+    logger.debug("Received MIDI download request. Chords events: %d, Melody events: %d", part_size(request.chords), part_size(request.melody))
     
     progression_data = {}
     
     if request.chords or request.melody or request.bass:
-        # New format
-        if request.chords:
-            progression_data["chords"] = [event.dict() for event in request.chords]
-        if request.melody:
-            progression_data["melody"] = [event.dict() for event in request.melody]
-        if request.bass:
-            progression_data["bass"] = [event.dict() for event in request.bass]
+        # New format (event lists or note columns)
+        try:
+            for part in ("chords", "melody", "bass"):
+                if getattr(request, part):
+                    progression_data[part] = part_notes(getattr(request, part), request.resolution)
+        except ValueError as exc:
+            raise RequestValidationError([{"loc": ("body", part), "msg": str(exc), "type": "value_error"}])
     elif request.progression:
         # Legacy format
         progression_data = [chord.dict() for chord in request.progression]
@@ -242,17 +588,36 @@ def download_midi(request: MidiRequest, background_tasks: BackgroundTasks):
         # Empty?
         progression_data = []
         
-    # Generate MIDI file
-    file_path = create_midi_file(progression_data, request.tempo, request.mood, request.instruments)
-    
-    # Schedule file removal after response is sent
-    background_tasks.add_task(remove_file, file_path)
+    # Encode the MIDI file in memory (in the worker pool)
+    data = await run_job(encode_midi_job, progression_data, request.tempo, request.mood, request.instruments)
     
-    return FileResponse(
-        path=file_path,
-        filename="track.mid",
-        media_type="audio/midi"
-    )
+    return midi_response(data)
+
+@app.get("/download/midi/{track_id}")
+async def download_stored_midi(
+    track_id: str,
+    tempo: Optional[int] = Query(None, ge=MIN_TEMPO, le=MAX_TEMPO),
+    chords: int = Query(0, ge=0, le=127),
+    melody: int = Query(0, ge=0, le=127),
+    bass: int = Query(33, ge=0, le=127),
+):
+    """
+    MIDI file of a track from /generate/chords by its track_id (404 once evicted
+    or expired). Tempo defaults to the track's; chords/melody/bass are General
+    MIDI programs, as in /download/midi's "instruments".
+    """
+    track = TRACKS.get(track_id)
+    if track is None:
+        return JSONResponse(status_code=404, content={"detail": "Unknown or expired track_id, POST the track to /download/midi instead"})
+    tempo = tempo or track.tempo
+    variant = (tempo, chords, melody, bass)
+    data = track.midi.get(variant)
+    if data is None:
+        # Encoded straight from the stored note arrays; repeat downloads reuse the bytes
+        instruments = {"chords": chords, "melody": melody, "bass": bass}
+        data = await run_job(encode_midi_job, track.parts, tempo, track.mood, instruments)
+        track.cache_midi(variant, data)
+    return midi_response(data)
 
 if __name__ == "__main__":
     import uvicorn
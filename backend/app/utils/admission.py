@@ -0,0 +1,150 @@
+import asyncio
+import os
+from collections import deque
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Deque, Optional
+
+from app.utils.metrics import ADMISSION_WAIT, ADMISSION_REJECTED, ADMISSION_STATE
+
+# --- Admission Control ---
+# Generation and export are CPU-bound: past the point where every worker is busy,
+# extra requests only queue, and under a burst they queue until clients time out
+# and nobody reads the answers. So at most ADMISSION_CONCURRENCY requests run
+# worker jobs at once, at most ADMISSION_QUEUE more wait (first come, first
+# served) for up to ADMISSION_QUEUE_TIME seconds, and everything beyond that is
+# answered right away with 503 and Retry-After (see the Overloaded handler in
+# main.py).
+#
+# A request takes its slot when it submits its first job (run_job calls
+# admit_request) and keeps it until its response has been sent, streams
+# included. Requests that never run a job (health checks, metrics, precomputed
+# top hits, requests coalesced onto another one's job) never wait for a slot.
+# Limits are per API process, like the worker pool (see app/utils/workers.py).
+
+# gunicorn workers (gunicorn reads the same variable, see Procfile); each API process gets its share of the cores
+WEB_CONCURRENCY = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+CPU_SHARE = max(1, (os.cpu_count() or 1) // WEB_CONCURRENCY)
+
+ADMISSION_CONCURRENCY = int(os.getenv("ADMISSION_CONCURRENCY", "0")) # 0: one per worker process (or CPU share)
+ADMISSION_QUEUE = int(os.getenv("ADMISSION_QUEUE", "64"))
+ADMISSION_QUEUE_TIME = float(os.getenv("ADMISSION_QUEUE_TIME", "5")) # Seconds
+
+class Overloaded(Exception):
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason # "queue_full" or "queue_timeout"
+
+class AdmissionController:
+    """A FIFO semaphore with a bounded, time-limited wait queue. Event loop only."""
+    def __init__(self, concurrency: int, max_queue: int, max_wait: float):
+        self.concurrency = max(1, concurrency)
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.active = 0
+        self.waiters: Deque[asyncio.Future] = deque()
+
+    async def acquire(self):
+        """Takes a slot, waiting up to max_wait for one; raises Overloaded otherwise."""
+        if self.active < self.concurrency and not self.waiters:
+            self.active += 1
+            self.report()
+            return
+        if len(self.waiters) >= self.max_queue:
+            raise Overloaded("queue_full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        self.report()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.max_wait)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as exc:
+            if waiter.done():
+                self.release() # The slot was handed over just as we gave up: pass it on
+            else:
+                waiter.cancel()
+                self.waiters.remove(waiter)
+                self.report()
+            if isinstance(exc, asyncio.TimeoutError):
+                raise Overloaded("queue_timeout") from None
+            raise
+
+    def release(self):
+        """Frees a slot, handing it straight to the longest waiter if there is one."""
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None) # active stays the same: the slot changes hands
+                self.report()
+                return
+        self.active -= 1
+        self.report()
+
+    def report(self):
+        ADMISSION_STATE.set(self.active, "active")
+        ADMISSION_STATE.set(len(self.waiters), "queued")
+
+ADMISSION = AdmissionController(
+    ADMISSION_CONCURRENCY or int(os.getenv("WORKER_PROCESSES", "0")) or CPU_SHARE,
+    ADMISSION_QUEUE, ADMISSION_QUEUE_TIME,
+)
+
+class Ticket:
+    """A request's claim on an admission slot, taken on first use."""
+    __slots__ = ("controller", "admitted")
+
+    def __init__(self, controller: AdmissionController):
+        self.controller = controller
+        self.admitted = False
+
+    async def admit(self):
+        if self.admitted:
+            return
+        start = perf_counter()
+        try:
+            await self.controller.acquire()
+        except Overloaded as exc:
+            ADMISSION_WAIT.observe(perf_counter() - start, "rejected")
+            ADMISSION_REJECTED.inc(exc.reason)
+            raise
+        ADMISSION_WAIT.observe(perf_counter() - start, "admitted")
+        self.admitted = True
+
+    def release(self):
+        if self.admitted:
+            self.admitted = False
+            self.controller.release()
+
+ADMISSION_TICKET: ContextVar[Optional[Ticket]] = ContextVar("admission_ticket", default=None)
+
+async def admit_request():
+    """Waits for the current request's slot (no-op outside HTTP requests, or once admitted)."""
+    ticket = ADMISSION_TICKET.get()
+    if ticket is not None:
+        await ticket.admit()
+
+def retry_after(controller: AdmissionController = None) -> str:
+    """Retry-After seconds for a shed request: about as long as a queued request may wait."""
+    return str(max(1, round((controller or ADMISSION).max_wait)))
+
+class AdmissionMiddleware:
+    """
+    Gives each HTTP request a Ticket and releases its slot, if it took one, once
+    the response has been sent.
+    """
+    def __init__(self, app, controller: AdmissionController = None):
+        self.app = app
+        self.controller = controller or ADMISSION
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        ticket = Ticket(self.controller)
+        token = ADMISSION_TICKET.set(ticket)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            ADMISSION_TICKET.reset(token)
+            ticket.release()
@@ -0,0 +1,197 @@
+import asyncio
+import math
+import threading
+import time
+from typing import Awaitable, Optional
+
+# The request's Budget is bound here; generation calls checkpoint() between stages
+from app.logic.hooks import BUDGET, checkpoint
+
+# --- Deadlines & Cancellation ---
+# A request can carry a time budget: an "X-Deadline-Ms" header, or a
+# "deadline_ms" field on the generation requests (the tighter one wins). Work is
+# also abandoned when the client disconnects, e.g. after clicking "generate" five
+# times, only the last answer is read.
+#
+# Checks are cooperative. checkpoint(stage) runs between the stages of
+# generate_track_data (progression -> rhythm -> melody -> bass) and raises
+# Cancelled once the deadline has passed or the request was cancelled. While a
+# job runs, run_job waits for whichever comes first: the job, the deadline, or
+# the client disconnecting. DeadlineMiddleware wraps the request's receive once
+# (Connection) and flags the disconnect whoever reads it; once the request has
+# been read, watch() keeps one read pending to see it. Streaming responses read
+# receive themselves, so there it just waits for their listener. When the
+# deadline or disconnect trips it stops waiting, flags the job and skips the
+# export. Threadpool jobs share the request's Budget and see the flag at their
+# next checkpoint; worker processes get the deadline, which they check
+# themselves, and a SharedFlag that run_job sets when the client goes away.
+# Cancelled requests answer 504 (deadline) or 499 (client gone, for the logs) and
+# are counted in generation_cancelled_total.
+
+DEADLINE_HEADER = b"x-deadline-ms"
+DISCONNECT = {"type": "http.disconnect"}
+
+class Cancelled(Exception):
+    def __init__(self, reason: str, stage: str):
+        super().__init__(reason, stage) # Both in args, so it pickles back from worker processes
+        self.reason = reason # "deadline" or "disconnected"
+        self.stage = stage # The stage that was skipped
+
+class Connection:
+    """An HTTP request's receive, wrapped to notice the client disconnecting."""
+    def __init__(self, receive):
+        self._receive = receive
+        self.disconnected = asyncio.Event()
+        self.responding = False # The response has started; streaming responses listen themselves
+        self.messages: Optional[asyncio.Queue] = None # Read ahead by the listener, for the app
+        self.listener: Optional[asyncio.Future] = None
+
+    async def receive(self):
+        if self.messages is None:
+            return self.seen(await self._receive())
+        if self.messages.empty() and self.disconnected.is_set():
+            return DISCONNECT
+        return await self.messages.get()
+
+    def seen(self, message):
+        if message["type"] == "http.disconnect":
+            self.disconnected.set()
+        return message
+
+    def listen(self):
+        """Keeps a read pending so a disconnect is seen. Jobs run once the app has read the request."""
+        if self.listener is None and not self.responding:
+            self.messages = asyncio.Queue()
+            self.listener = asyncio.ensure_future(self.read_ahead())
+
+    async def read_ahead(self):
+        while not self.disconnected.is_set():
+            self.messages.put_nowait(self.seen(await self._receive()))
+
+    def close(self):
+        if self.listener is not None:
+            self.listener.cancel()
+
+class SharedFlag:
+    """
+    A cancellation flag in one slot of a shared byte array (multiprocessing.RawArray),
+    so a worker process sees the API process cancel its job. Same interface as
+    the threading.Event a Budget uses otherwise.
+    """
+    __slots__ = ("flags", "slot")
+
+    def __init__(self, flags, slot: int):
+        self.flags = flags
+        self.slot = slot
+
+    def is_set(self) -> bool:
+        return self.flags[self.slot] != 0
+
+    def set(self):
+        self.flags[self.slot] = 1
+
+    def clear(self):
+        self.flags[self.slot] = 0
+
+class Budget:
+    """A request's deadline (time.time() seconds, or None) and cancellation flag."""
+    __slots__ = ("deadline", "cancelled", "reason", "connection")
+
+    def __init__(self, deadline: Optional[float] = None, connection: Optional[Connection] = None, cancelled=None):
+        self.deadline = deadline
+        # Set from the event loop, read by threadpool jobs (or a SharedFlag, in worker processes)
+        self.cancelled = threading.Event() if cancelled is None else cancelled
+        self.reason = "disconnected"
+        self.connection = connection
+
+    def tighten(self, ms: Optional[float]):
+        """Applies a budget of ms milliseconds from now, if it ends before the current deadline."""
+        if ms is None or not 0 < ms < math.inf:
+            return
+        deadline = time.time() + ms / 1000
+        if self.deadline is None or deadline < self.deadline:
+            self.deadline = deadline
+
+    def check(self, stage: str):
+        if self.cancelled.is_set():
+            raise Cancelled(self.reason, stage)
+        if self.deadline is not None and time.time() >= self.deadline:
+            raise Cancelled("deadline", stage)
+
+    def cancel(self, reason: str):
+        self.reason = reason
+        self.cancelled.set()
+
+    async def watch(self, awaitable: Awaitable, stage: str = "worker"):
+        """
+        Awaits a job, giving up (Cancelled) as soon as the client disconnects or
+        the deadline passes. The job is flagged and left to wind down on its own.
+        """
+        task = asyncio.ensure_future(awaitable)
+        waiting = {task}
+        if self.connection is not None:
+            self.connection.listen()
+            disconnected = asyncio.ensure_future(self.connection.disconnected.wait())
+            waiting.add(disconnected)
+        try:
+            while True:
+                timeout = None if self.deadline is None else max(0.0, self.deadline - time.time())
+                done, _ = await asyncio.wait(waiting, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if task in done:
+                    return task.result()
+                try:
+                    if self.connection is not None and self.connection.disconnected.is_set():
+                        self.cancel("disconnected")
+                    self.check(stage)
+                except Cancelled as exc:
+                    self.cancel(exc.reason)
+                    task.add_done_callback(discard_result)
+                    task.cancel()
+                    raise
+        finally:
+            for future in waiting - {task}:
+                future.cancel()
+
+def discard_result(task: asyncio.Future):
+    if not task.cancelled():
+        task.exception() # Retrieved, so asyncio doesn't log it
+
+def tighten_deadline(ms: Optional[float]):
+    budget = BUDGET.get()
+    if budget is not None:
+        budget.tighten(ms)
+
+def header_budget_ms(scope) -> Optional[float]:
+    for name, value in scope["headers"]:
+        if name == DEADLINE_HEADER:
+            try:
+                return float(value)
+            except ValueError:
+                return None
+    return None
+
+class DeadlineMiddleware:
+    """Gives each HTTP request a Budget (deadline from X-Deadline-Ms, disconnect flag)."""
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        connection = Connection(receive)
+        budget = Budget(connection=connection)
+        budget.tighten(header_budget_ms(scope))
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                connection.responding = True
+            await send(message)
+
+        token = BUDGET.set(budget)
+        try:
+            await self.app(scope, connection.receive, send_wrapper)
+        finally:
+            BUDGET.reset(token)
+            connection.close()
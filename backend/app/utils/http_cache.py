@@ -0,0 +1,81 @@
+import gzip
+import hashlib
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from fastapi import Request
+from fastapi.responses import Response
+
+from app.utils.responses import dumps
+
+# --- Precomputed Responses ---
+# Bodies that only change on deploy (the top-hits list, MIDI-backed templates) are
+# serialised and gzipped once and served as bytes with a strong ETag, so repeat
+# requests skip serialisation and compression and revalidations become a 304.
+
+def quality_values(header: Optional[str]) -> Dict[str, float]:
+    """{value: q} for an Accept-style header; values are lowercased, malformed q-values count as 0."""
+    qualities = {}
+    for item in (header or "").split(","):
+        value, _, params = item.partition(";")
+        value = value.strip().lower()
+        if not value:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, number = param.strip().partition("=")
+            if name.lower() == "q":
+                try:
+                    q = min(max(float(number), 0.0), 1.0)
+                except ValueError:
+                    q = 0.0
+        qualities[value] = q
+    return qualities
+
+def accepts_encoding(header: Optional[str], coding: str = "gzip") -> bool:
+    """Whether Accept-Encoding lists a content coding with q > 0 (like GZipMiddleware, "*" isn't enough)."""
+    return quality_values(header).get(coding, 0.0) > 0
+
+@dataclass(frozen=True)
+class PrecomputedBody:
+    body: bytes
+    gzipped: bytes
+    etag: str
+    media_type: str = "application/json"
+
+def precompute_body(body: bytes, media_type: str = "application/json") -> PrecomputedBody:
+    """Gzips an encoded body and derives its ETag."""
+    return PrecomputedBody(
+        body=body,
+        gzipped=gzip.compress(body, compresslevel=9, mtime=0), # mtime=0 keeps the bytes stable
+        etag='"' + hashlib.sha256(body).hexdigest()[:32] + '"',
+        media_type=media_type,
+    )
+
+def precompute_json(content: Any) -> PrecomputedBody:
+    """Serialises content like FastJSONResponse and precomputes it."""
+    return precompute_body(dumps(content))
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """If-None-Match check (weak comparison, as RFC 9110 specifies for it)."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    tags = [tag.strip() for tag in header.split(",")]
+    return etag in tags or f"W/{etag}" in tags
+
+def cached_response(request: Request, cached: PrecomputedBody, cache_control: str) -> Response:
+    """
+    Serves a precomputed body: 304 if the client already has it (GET only),
+    otherwise the gzipped or plain bytes depending on Accept-Encoding.
+    """
+    headers = {"ETag": cached.etag, "Cache-Control": cache_control, "Vary": "Accept, Accept-Encoding"}
+    if request.method == "GET" and etag_matches(request, cached.etag):
+        return Response(status_code=304, headers=headers)
+
+    if accepts_encoding(request.headers.get("accept-encoding")):
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=cached.gzipped, media_type=cached.media_type, headers=headers)
+    return Response(content=cached.body, media_type=cached.media_type, headers=headers)
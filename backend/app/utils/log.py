@@ -0,0 +1,171 @@
+import json
+import logging
+import os
+import re
+import sys
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Any, Dict, Iterator, Optional
+
+# Stage timings and metrics labels are bound here per request; generation records into them
+from app.logic.hooks import STAGE_TIMINGS, REQUEST_LABELS, label_request, stage
+
+# --- Logging ---
+# Everything under the "app" logger goes through one handler configured here.
+# Messages use lazy %-formatting, so a disabled level costs a level check and
+# nothing else. Each HTTP request gets an id (X-Request-ID, taken from the client
+# or generated) and a dict of per-stage timings; both ride along in context vars
+# and end up on the request's access log line.
+#
+#   LOG_LEVEL=INFO                              level for the "app" loggers
+#   LOG_LEVELS=app.logic=DEBUG,app.main=WARNING per-module overrides
+#   LOG_FORMAT=text|json                        json: one object per line
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+
+REQUEST_ID: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+# Client-supplied request ids are echoed into logs and headers, so keep them tame
+REQUEST_ID_PATTERN = re.compile(r"^[A-Za-z0-9._:-]{1,64}$")
+
+access_logger = logging.getLogger("app.access")
+
+_configured = False
+
+class RequestContextFilter(logging.Filter):
+    """Adds the current request id to every record (as "-" outside a request)."""
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = REQUEST_ID.get() or "-"
+        return True
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, with the request id and any stage timings."""
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", "-")
+        if request_id != "-":
+            entry["request_id"] = request_id
+        for field in ("method", "path", "status", "duration_ms"):
+            if hasattr(record, field):
+                entry[field] = getattr(record, field)
+        stages = getattr(record, "stages", None)
+        if stages:
+            entry["stages"] = {name: round(ms, 3) for name, ms in stages.items()}
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+def parse_levels(spec: str) -> Dict[str, str]:
+    """"app.logic=DEBUG,app.main=WARNING" -> {"app.logic": "DEBUG", "app.main": "WARNING"}"""
+    levels = {}
+    for item in spec.split(","):
+        name, _, level = item.partition("=")
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+def configure_logging(level: Optional[str] = None, levels: Optional[str] = None, fmt: Optional[str] = None, force: bool = False):
+    """Sets up the "app" logger tree. Safe to call more than once (workers call it too)."""
+    global _configured
+    if _configured and not force:
+        return
+    root = logging.getLogger("app")
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+
+    handler = logging.StreamHandler(sys.stderr)
+    handler.addFilter(RequestContextFilter())
+    if (fmt or LOG_FORMAT) == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s"))
+    root.addHandler(handler)
+    root.setLevel(level or LOG_LEVEL)
+    root.propagate = False # Don't double-log through uvicorn's root handlers
+
+    for name, module_level in parse_levels(LOG_LEVELS if levels is None else levels).items():
+        logging.getLogger(name).setLevel(module_level)
+    _configured = True
+
+# --- Request Context ---
+
+def new_request_id(supplied: Optional[str] = None) -> str:
+    if supplied and REQUEST_ID_PATTERN.match(supplied):
+        return supplied
+    return uuid.uuid4().hex
+
+@contextmanager
+def request_context(request_id: Optional[str], labels: Optional[Dict[str, Any]] = None) -> Iterator[Dict[str, float]]:
+    """
+    Binds a request id, a fresh stage timings dict (yielded) and a labels dict
+    (see label_request) to the current context.
+    """
+    timings: Dict[str, float] = {}
+    id_token = REQUEST_ID.set(request_id)
+    timings_token = STAGE_TIMINGS.set(timings)
+    labels_token = REQUEST_LABELS.set({} if labels is None else labels)
+    try:
+        yield timings
+    finally:
+        REQUEST_LABELS.reset(labels_token)
+        STAGE_TIMINGS.reset(timings_token)
+        REQUEST_ID.reset(id_token)
+
+def merge_timings(timings: Dict[str, float], labels: Optional[Dict[str, Any]] = None):
+    """Adds timings (and labels) recorded elsewhere, e.g. in a worker process, to the current request."""
+    current = STAGE_TIMINGS.get()
+    if current is not None:
+        for name, ms in timings.items():
+            current[name] = current.get(name, 0.0) + ms
+    if labels:
+        label_request(**labels)
+
+class RequestLogMiddleware:
+    """
+    ASGI middleware: assigns the request id, collects stage timings and writes one
+    access log line per HTTP request once the response has been sent (so streamed
+    bodies are included in the duration).
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        supplied = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                supplied = value.decode("latin-1")
+                break
+        request_id = new_request_id(supplied)
+        status = 500
+
+        async def send_with_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-request-id", request_id.encode())]
+            await send(message)
+
+        with request_context(request_id) as timings:
+            start = perf_counter()
+            try:
+                await self.app(scope, receive, send_with_id)
+            finally:
+                if access_logger.isEnabledFor(logging.INFO):
+                    duration_ms = round((perf_counter() - start) * 1000, 3)
+                    access_logger.info(
+                        "%s %s %d %.1fms", scope["method"], scope["path"], status, duration_ms,
+                        extra={"method": scope["method"], "path": scope["path"], "status": status, "duration_ms": duration_ms, "stages": dict(timings)}
+                    )
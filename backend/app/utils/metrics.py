@@ -0,0 +1,234 @@
+import bisect
+from time import perf_counter
+from typing import Dict, Optional, Sequence, Tuple
+
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.routing import Match
+
+from app.logic.moods import MOOD_PROFILES, normalize_mood
+from app.utils.http_cache import accepts_encoding
+from app.utils.log import STAGE_TIMINGS, REQUEST_LABELS
+
+# --- Metrics ---
+# Prometheus text exposition (/metrics) without a client library. Every
+# observation is made from the event loop thread when a request finishes (stage
+# timings recorded in the threadpool or worker processes are carried back with
+# the request, see app/utils/log.py), so the histograms need no locks: an
+# observation is a bisect and three additions.
+#
+# Metrics are per process. With several gunicorn workers (see Procfile) each
+# scrape sees one of them; run one worker per container to get complete numbers.
+
+REQUEST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STAGE_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+# Label values are bounded so a client can't blow up the number of series
+LENGTH_LABELS = {1, 2, 4, 8, 16, 32, 64}
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1) # Last slot: above every bound (+Inf)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+class HistogramFamily:
+    """One metric name with a histogram per label combination."""
+    def __init__(self, name: str, help: str, label_names: Tuple[str, ...], buckets: Sequence[float]):
+        self.name = name
+        self.help = help
+        self.label_names = label_names
+        self.buckets = buckets
+        self.series: Dict[Tuple[str, ...], Histogram] = {}
+
+    def observe(self, value: float, *labels: str):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = Histogram(self.buckets)
+        series.observe(value)
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, series in sorted(self.series.items()):
+            pairs = ",".join(f'{name}="{escape_label(value)}"' for name, value in zip(self.label_names, labels))
+            prefix = pairs + "," if pairs else ""
+            cumulative = 0
+            for bound, count in zip(self.buckets, series.counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {series.count}')
+            lines.append(f"{self.name}_sum{{{pairs}}} {series.sum}")
+            lines.append(f"{self.name}_count{{{pairs}}} {series.count}")
+        return "\n".join(lines) + "\n"
+
+class CounterFamily:
+    """One counter per label combination."""
+    def __init__(self, name: str, help: str, label_names: Tuple[str, ...]):
+        self.name = name
+        self.help = help
+        self.label_names = label_names
+        self.series: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1):
+        self.series[labels] = self.series.get(labels, 0) + amount
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self.series.items()):
+            pairs = ",".join(f'{name}="{escape_label(value)}"' for name, value in zip(self.label_names, labels))
+            lines.append(f"{self.name}{{{pairs}}} {value}")
+        return "\n".join(lines) + "\n"
+
+class GaugeFamily(CounterFamily):
+    """Current values (set, not accumulated)."""
+    def set(self, value: float, *labels: str):
+        self.series[labels] = value
+
+    def render(self) -> str:
+        return super().render().replace(f"# TYPE {self.name} counter", f"# TYPE {self.name} gauge", 1)
+
+def escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+REQUEST_DURATION = HistogramFamily(
+    "http_request_duration_seconds", "HTTP request latency by route (streamed bodies included).",
+    ("method", "route", "status"), REQUEST_BUCKETS,
+)
+STAGE_DURATION = HistogramFamily(
+    "generation_stage_duration_seconds", "Time per pipeline stage within a request, summed over the tracks it generated.",
+    ("stage", "mood", "length"), STAGE_BUCKETS,
+)
+SINGLE_FLIGHT = CounterFamily(
+    "singleflight_requests_total", "Requests that ran a computation (leader) or shared one already in flight (coalesced).",
+    ("flight", "result"),
+)
+ADMISSION_WAIT = HistogramFamily(
+    "admission_wait_seconds", "Time generation/export requests waited for a slot, by outcome (admitted or rejected).",
+    ("outcome",), REQUEST_BUCKETS,
+)
+ADMISSION_REJECTED = CounterFamily(
+    "admission_rejected_total", "Requests shed with 503 because the wait queue was full or the wait ran out.",
+    ("reason",),
+)
+ADMISSION_STATE = GaugeFamily(
+    "admission_requests", "Generation/export requests running (active) and waiting for a slot (queued).",
+    ("state",),
+)
+CANCELLED = CounterFamily(
+    "generation_cancelled_total", "Work abandoned because the client disconnected or its deadline passed, by the stage it stopped before.",
+    ("reason", "stage"),
+)
+FAMILIES = [REQUEST_DURATION, STAGE_DURATION, SINGLE_FLIGHT, ADMISSION_WAIT, ADMISSION_REJECTED, ADMISSION_STATE, CANCELLED]
+
+def mood_label(mood: Optional[str]) -> str:
+    if mood is None:
+        return "none"
+    mood = normalize_mood(mood)
+    return mood if mood in MOOD_PROFILES else "other"
+
+def length_label(length: Optional[int]) -> str:
+    if length is None:
+        return "none"
+    return str(length) if length in LENGTH_LABELS else "other"
+
+def observe_request(method: str, route: str, status: int, seconds: float, timings: Dict[str, float], labels: Dict[str, object]):
+    REQUEST_DURATION.observe(seconds, method, route, str(status))
+    if timings:
+        mood, length = mood_label(labels.get("mood")), length_label(labels.get("length"))
+        for name, ms in timings.items():
+            STAGE_DURATION.observe(ms / 1000, name, mood, length)
+
+def render_metrics() -> str:
+    return "".join(family.render() for family in FAMILIES)
+
+def reset_metrics():
+    for family in FAMILIES:
+        family.series.clear()
+
+def route_label(scope) -> str:
+    """The matched route's path template (/download/midi/{id}, not the raw path), so labels stay bounded."""
+    route = scope.get("route")
+    if route is not None and hasattr(route, "path"):
+        return route.path
+    app = scope.get("app")
+    for candidate in getattr(app, "routes", ()):
+        match, _ = candidate.matches(scope)
+        if match == Match.FULL:
+            return candidate.path
+    return "unmatched"
+
+class MetricsMiddleware:
+    """
+    Records the request histogram and the request's stage timings once the
+    response has been sent. Sits inside RequestLogMiddleware, whose context holds
+    the timings.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        async def send_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = perf_counter()
+        try:
+            await self.app(scope, receive, send_status)
+        finally:
+            observe_request(
+                scope["method"], route_label(scope), status, perf_counter() - start,
+                STAGE_TIMINGS.get() or {}, REQUEST_LABELS.get() or {},
+            )
+
+class TimedGZipMiddleware:
+    """
+    GZipMiddleware that records the time spent compressing as the "compress"
+    stage: the time between the app handing a message to gzip and gzip passing it
+    on, minus the time spent downstream. Requests that refuse gzip (e.g.
+    "gzip;q=0") skip it entirely.
+    """
+    def __init__(self, app, **options):
+        self.app = app
+        self.gzip = GZipMiddleware(self.timed_app, **options)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not accepts_encoding(Headers(scope=scope).get("accept-encoding")):
+            await self.app(scope, receive, send)
+            return
+
+        downstream = [0.0]
+        async def timed_send(message):
+            start = perf_counter()
+            await send(message)
+            downstream[0] += perf_counter() - start
+
+        scope["app.gzip_downstream"] = downstream # Same scope dict all the way down, so the router's "route" stays visible
+        await self.gzip(scope, receive, timed_send)
+
+    async def timed_app(self, scope, receive, gzip_send):
+        downstream = scope["app.gzip_downstream"]
+
+        async def marked_send(message):
+            before, start = downstream[0], perf_counter()
+            await gzip_send(message)
+            elapsed = perf_counter() - start - (downstream[0] - before)
+            timings = STAGE_TIMINGS.get()
+            if timings is not None:
+                timings["compress"] = timings.get("compress", 0.0) + elapsed * 1000
+
+        await self.app(scope, receive, marked_send)
@@ -1,114 +1,233 @@
 
-import mido
-from mido import MidiFile, MidiTrack, Message, MetaMessage
 import tempfile
 import os
 import random
 
-def humanize_track(events, mood="neutral", is_chords=False):
+import numpy as np
+
+from app.logic.moods import resolve_mood
+from app.logic.notes import NoteArray, numpy_rng
+from app.utils.log import stage, label_request
+
+def to_note_array(track_events) -> NoteArray:
+    """
+    Normalizes one track of input to a NoteArray: a NoteArray, a list of note
+    event dicts, or a list of block chords ({"notes", "duration", "velocity"}).
+    """
+    if isinstance(track_events, NoteArray):
+        return track_events
+    if len(track_events) > 0 and "notes" in track_events[0]:
+        # Block chords play back to back
+        durations = [chord.get("duration", 4.0) for chord in track_events]
+        starts = np.concatenate(([0.0], np.cumsum(durations)[:-1]))
+        sizes = [len(chord["notes"]) for chord in track_events]
+        return NoteArray(
+            [note for chord in track_events for note in chord["notes"]],
+            np.repeat(starts, sizes),
+            np.repeat(durations, sizes),
+            np.repeat([chord.get("velocity", 80) for chord in track_events], sizes)
+        )
+    return NoteArray.from_events(track_events)
+
+def humanize_track(events, mood="neutral", is_chords=False, rng=None) -> NoteArray:
     """
-    Applies humanization (velocity, timing, strumming) to a list of MIDI events.
-    events: List of dicts with 'note', 'time', 'duration', 'velocity'
+    Applies humanization (velocity, timing, strumming) to a track.
+    events: NoteArray (or list of dicts with 'note', 'time', 'duration', 'velocity')
+    rng: random.Random instance to derive the NumPy draws from (defaults to the global `random` module)
+    Returns a new NoteArray; the input is left untouched.
     """
-    humanized_events = []
+    notes = to_note_array(events)
+    count = len(notes)
+    if not count:
+        return notes
+    gen = numpy_rng(rng)
     
     # Humanization Parameters based on mood
-    velocity_variance = 5
-    timing_variance = 0.02 # in beats
-    strum_delay = 0.0 # in beats
-    
-    if "lo_fi" in mood or "neo_soul" in mood or "jazz" in mood:
-        velocity_variance = 12
-        timing_variance = 0.04
-        if is_chords:
-            strum_delay = 0.03 # Slight roll
-    elif "drill" in mood or "trap" in mood:
-        velocity_variance = 8 # Hi-hats need dynamics
-        timing_variance = 0.01 # Tight but not robotic
-    elif "walker" in mood.lower() or "faded" in mood.lower():
-        velocity_variance = 10 # Emotional dynamics
-        timing_variance = 0.015 # Slight humanization
-        if is_chords:
-            strum_delay = 0.005 # Very tight, almost imperceptible strum
-    elif "classical" in mood or "cinematic" in mood:
-        velocity_variance = 15
-        timing_variance = 0.05
+    feel = resolve_mood(mood).humanize
+    velocity_variance = feel.velocity_variance
+    timing_variance = feel.timing_variance # in beats
+    strum_delay = feel.strum_delay if is_chords else 0.0 # in beats
     
-    # Group events by start time for strumming (only for chords)
-    events_by_time = {}
-    if is_chords:
-        for event in events:
-            t = event["time"]
-            if t not in events_by_time:
-                events_by_time[t] = []
-            events_by_time[t].append(event)
+    # All Gaussian offsets for the track in one draw: row 0 timing, row 1 velocity
+    gauss = gen.standard_normal((2, count))
+    time_offset = gauss[0] * timing_variance
+    vel_change = np.trunc(gauss[1] * velocity_variance)
     
-    # Process
     if is_chords:
-        for t in sorted(events_by_time.keys()):
-            chord_notes = events_by_time[t]
-            # Sort by pitch (low to high) for strumming
-            chord_notes.sort(key=lambda x: x["note"])
-            
-            # Randomize strum direction (mostly down, sometimes up)
-            if random.random() < 0.2:
-                chord_notes.reverse()
-            
-            current_strum_offset = 0.0
-            
-            for event in chord_notes:
-                # Copy event
-                new_event = event.copy()
-                
-                # Apply Timing Offset (Gaussian)
-                offset = random.gauss(0, timing_variance)
-                
-                # Apply Strumming
-                new_event["time"] += current_strum_offset + offset
-                current_strum_offset += strum_delay + random.uniform(0, 0.01)
-                
-                # Apply Velocity Randomization
-                vel_change = int(random.gauss(0, velocity_variance))
-                new_event["velocity"] = max(1, min(127, new_event["velocity"] + vel_change))
-                
-                humanized_events.append(new_event)
+        # Group events by start time for strumming, sorted by pitch (low to high) within a group
+        order = np.lexsort((notes.pitch, notes.time))
+        notes = notes.take(order)
+        new_group = np.ones(count, dtype=bool)
+        new_group[1:] = notes.time[1:] != notes.time[:-1]
+        group_id = np.cumsum(new_group) - 1
+        group_start = np.flatnonzero(new_group)
+        group_size = np.diff(np.append(group_start, count))
+        pos = np.arange(count) - group_start[group_id]
+        
+        # Randomize strum direction (mostly down, sometimes up)
+        upstroke = gen.random(len(group_start)) < 0.2
+        strum_rank = np.where(upstroke[group_id], group_size[group_id] - 1 - pos, pos)
+        
+        # Apply Strumming: each note waits for the ones strummed before it (grouped cumulative sum)
+        strum_order = np.lexsort((strum_rank, group_id))
+        step = strum_delay + gen.uniform(0, 0.01, count)
+        waited = np.cumsum(step) - step
+        waited -= waited[group_start][group_id] # restart at every group (groups stay contiguous in strum_order)
+        strum_offset = np.empty(count)
+        strum_offset[strum_order] = waited
+        time_offset += strum_offset
     else:
-        # Melody Processing
-        for event in events:
-            new_event = event.copy()
-            
-            # Apply Timing Offset
-            offset = random.gauss(0, timing_variance)
-            new_event["time"] += offset
-            
-            # Apply Velocity Randomization
-            vel_change = int(random.gauss(0, velocity_variance))
-            
-            # Accent strong beats (Assuming 4/4)
-            if round(event["time"]) % 1.0 < 0.1: # Downbeat
-                vel_change += 10
-            
-            new_event["velocity"] = max(1, min(127, new_event["velocity"] + vel_change))
-            humanized_events.append(new_event)
-            
-    return humanized_events
+        # Accent strong beats (Assuming 4/4)
+        vel_change += 10 * (np.round(notes.time) % 1.0 < 0.1) # Downbeat
+    
+    # Apply Velocity Randomization (clamped to 1-127 by NoteArray)
+    return NoteArray(notes.pitch, notes.time + time_offset, notes.duration, notes.velocity + vel_change)
+
+# --- Standard MIDI File Encoding ---
+# Tracks are written straight into bytes from sorted event arrays: no mido
+# Message objects, and delta times / running status are computed with NumPy.
+# The output is byte-for-byte what mido would write for the same messages.
+
+TICKS_PER_BEAT = 480
+
+NOTE_OFF = 0x80
+NOTE_ON = 0x90
+CONTROL_CHANGE = 0xB0
+PROGRAM_CHANGE = 0xC0
+
+END_OF_TRACK = b"\x00\xff\x2f\x00"
+
+def encode_variable_int(value: int) -> bytes:
+    """Encodes a non-negative int as a MIDI variable-length quantity."""
+    out = [value & 0x7F]
+    value >>= 7
+    while value:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    return bytes(reversed(out))
+
+def encode_channel_events(ticks: np.ndarray, status: np.ndarray, data1: np.ndarray, data2: np.ndarray) -> bytes:
+    """
+    Encodes time-sorted two-data-byte channel messages (note on/off, CC) given
+    as absolute ticks. Deltas are variable-length and running status drops
+    repeated status bytes.
+    """
+    count = len(ticks)
+    if not count:
+        return b""
+    
+    # Delta times; an event before tick 0 can only happen first and is played at 0
+    delta = np.diff(ticks, prepend=0)
+    delta[0] = max(0, delta[0])
+    vlq_len = 1 + (delta >= 1 << 7) + (delta >= 1 << 14) + (delta >= 1 << 21)
+    
+    # Running status: only write the status byte when it changes
+    new_status = np.ones(count, dtype=bool)
+    new_status[1:] = status[1:] != status[:-1]
+    
+    size = vlq_len + new_status + 2
+    start = np.cumsum(size) - size
+    out = np.empty(int(size.sum()), dtype=np.uint8)
+    
+    # Variable-length delta: 7 bits per byte, most significant first, continuation bit on all but the last
+    for k in range(4):
+        has_byte = vlq_len > k
+        shift = 7 * (vlq_len[has_byte] - 1 - k)
+        more = (vlq_len[has_byte] - 1 > k) * 0x80
+        out[start[has_byte] + k] = ((delta[has_byte] >> shift) & 0x7F) | more
+    
+    out[(start + vlq_len)[new_status]] = status[new_status]
+    data_at = start + vlq_len + new_status
+    out[data_at] = data1
+    out[data_at + 1] = data2
+    return out.tobytes()
+
+def encode_track(name: str, us_per_beat: int, channel: int, program: int, events: bytes) -> bytes:
+    """Wraps encoded channel events in an MTrk chunk with name, tempo and program change up front."""
+    name_bytes = name.encode("latin1")
+    data = b"".join([
+        b"\x00\xff\x03", encode_variable_int(len(name_bytes)), name_bytes, # Track Name
+        b"\x00\xff\x51\x03", us_per_beat.to_bytes(3, "big"), # Set Tempo
+        bytes([0, PROGRAM_CHANGE | channel, program]), # Program Change
+        events,
+        END_OF_TRACK,
+    ])
+    return b"MTrk" + len(data).to_bytes(4, "big") + data
 
-def create_midi_file(progression_data, tempo: int = 120, mood: str = "neutral", instruments: dict = None):
+def control_changes(track_name: str, profile, on_ticks: np.ndarray, last_tick: int):
     """
-    Creates a MIDI file from the progression data.
+    Advanced MIDI CC Automation (Sustain, Expression) for the chords track.
+    Returns (ticks, controls, values) arrays in insertion order.
+    """
+    ticks, controls, values = [np.zeros(0, dtype=np.int64)], [np.zeros(0, dtype=np.int64)], [np.zeros(0, dtype=np.int64)]
+    if track_name == "chords":
+        # 1. Sustain Pedal (CC 64) for Piano/Keys genres
+        if profile.sustain_pedal:
+            # Group events by start time to avoid redundant pedal messages
+            starts = np.unique(on_ticks)
+            # Legato Pedaling: Quick Up-Down transition at each chord change
+            # Pedal Up just before the chord (5 ticks), Pedal Down exactly at the chord
+            ticks.append(np.column_stack((np.maximum(starts - 5, 0), starts)).ravel())
+            controls.append(np.full(2 * len(starts), 64))
+            values.append(np.tile([0, 127], len(starts)))
+        
+        # 2. Expression (CC 11) for Cinematic Swells
+        if profile.expression_swells:
+            # Per bar swells (every 4 beats) over the whole track
+            total_duration = int(max(last_tick, ticks[-1].max(initial=0)))
+            bar_ticks = TICKS_PER_BEAT * 4
+            half = bar_ticks // 2
+            # Swell Up: 50 to 127, then Swell Down: 127 to 50 (resolution of 100 ticks)
+            up = np.arange(0, half, 100)
+            down = np.arange(half, bar_ticks, 100)
+            bar_offsets = np.concatenate([up, down])
+            bar_values = np.concatenate([50 + np.trunc(77 * (up / half)), 127 - np.trunc(77 * ((down - half) / half))]).astype(np.int64)
+            bars = np.arange(0, total_duration, bar_ticks)
+            ticks.append((bars[:, None] + bar_offsets).ravel())
+            controls.append(np.full(len(bars) * len(bar_offsets), 11))
+            values.append(np.tile(bar_values, len(bars)))
+    
+    return np.concatenate(ticks), np.concatenate(controls), np.concatenate(values)
+
+def track_channel_events(track_name: str, notes: NoteArray, channel: int, profile) -> bytes:
+    """Turns a humanized track into note on/off pairs plus CC automation and encodes them."""
+    # Convert to ticks (truncating like int())
+    start_ticks = np.trunc(notes.time * TICKS_PER_BEAT).astype(np.int64)
+    end_ticks = start_ticks + np.trunc(notes.duration * TICKS_PER_BEAT).astype(np.int64)
+    pitch = np.clip(notes.pitch, 0, 127)
+    velocity = np.minimum(notes.velocity, 127)
+    
+    cc_ticks, cc_controls, cc_values = control_changes(
+        track_name, profile, start_ticks, int(end_ticks.max()) if len(notes) else 0
+    )
+    
+    # Note on/off pairs interleaved per note, then CCs; sort by time keeping that order for ties
+    count = len(notes)
+    ticks = np.concatenate([np.column_stack((start_ticks, end_ticks)).ravel(), cc_ticks])
+    status = np.concatenate([np.tile(np.array([NOTE_ON, NOTE_OFF], dtype=np.uint8), count), np.full(len(cc_ticks), CONTROL_CHANGE, dtype=np.uint8)]) | channel
+    data1 = np.concatenate([np.repeat(pitch, 2), np.clip(cc_controls, 0, 127)]).astype(np.uint8)
+    data2 = np.concatenate([np.column_stack((velocity, np.zeros(count, dtype=velocity.dtype))).ravel(), np.clip(cc_values, 0, 127)]).astype(np.uint8)
+    
+    order = np.argsort(ticks, kind="stable")
+    return encode_channel_events(ticks[order], status[order], data1[order], data2[order])
+
+def encode_midi(progression_data, tempo: int = 120, mood: str = "neutral", instruments: dict = None, rng=None) -> bytes:
+    """
+    Encodes the progression data as a type 1 Standard MIDI File.
     progression_data: 
         - list of chords (legacy)
-        - dict with keys "chords" and "melody" (new)
-    Returns the path to the temporary file.
+        - dict with keys "chords", "melody" and "bass" (NoteArrays or lists of events)
+    rng: random.Random instance used for humanization (defaults to the global `random` module)
+    Returns the file contents.
     """
-    mid = MidiFile()
-    
     # Default Instruments (General MIDI Program Numbers)
     # 0: Acoustic Grand Piano
     # 33: Electric Bass (finger)
     # 26: Electric Guitar (jazz)
     if instruments is None:
         instruments = {"chords": 0, "melody": 0, "bass": 33}
+    profile = resolve_mood(mood)
+    label_request(mood=mood)
     tracks_data = {}
     
     if isinstance(progression_data, list):
@@ -116,20 +235,14 @@ def create_midi_file(progression_data, tempo: int = 120, mood: str = "neutral",
         tracks_data["chords"] = progression_data
     elif isinstance(progression_data, dict):
         # New format: Dict with "chords" and "melody" lists of events
-        if "chords" in progression_data:
-            tracks_data["chords"] = progression_data["chords"]
-        if "melody" in progression_data:
-            tracks_data["melody"] = progression_data["melody"]
-        if "bass" in progression_data:
-            tracks_data["bass"] = progression_data["bass"]
-            
-    # Ticks per beat (default is 480)
-    ticks_per_beat = mid.ticks_per_beat
+        for track_name in ("chords", "melody", "bass"):
+            if track_name in progression_data:
+                tracks_data[track_name] = progression_data[track_name]
+    
+    us_per_beat = int(60_000_000 / tempo)
+    chunks = [b"MThd" + (6).to_bytes(4, "big") + (1).to_bytes(2, "big") + len(tracks_data).to_bytes(2, "big") + TICKS_PER_BEAT.to_bytes(2, "big")]
             
     for i, (track_name, track_events) in enumerate(tracks_data.items()):
-        track = MidiTrack()
-        mid.tracks.append(track)
-        
         # Determine Channel
         channel = 0
         if track_name == "melody":
@@ -139,153 +252,30 @@ def create_midi_file(progression_data, tempo: int = 120, mood: str = "neutral",
         else:
             channel = i % 16
         
-        # Add Track Name
-        track.append(MetaMessage('track_name', name=track_name.capitalize()))
-        
-        # Set Tempo
-        us_per_beat = int(60_000_000 / tempo)
-        track.append(MetaMessage('set_tempo', tempo=us_per_beat))
-        
         # Set Instrument (Program Change)
         program_number = instruments.get(track_name, 0)
         # Ensure valid MIDI program (0-127)
         program_number = max(0, min(127, int(program_number)))
         
-        track.append(Message('program_change', program=program_number, time=0, channel=channel))
-        
-        # Convert input data to MIDI events
-        midi_events = []
+        # Normalize to Event Stream if Block Chords, then apply Humanization
+        with stage("humanize"):
+            notes = humanize_track(to_note_array(track_events), mood=mood, is_chords=(track_name == "chords"), rng=rng)
         
-        # Normalize to Event Stream if Block Chords
-        is_block_chords = False
-        if len(track_events) > 0 and "notes" in track_events[0]:
-            is_block_chords = True
-            
-        processed_events = []
-        
-        if is_block_chords:
-            current_beat_time = 0.0
-            for chord in track_events:
-                duration = chord.get("duration", 4.0)
-                velocity = chord.get("velocity", 80)
-                
-                for note in chord["notes"]:
-                    processed_events.append({
-                        "note": note,
-                        "time": current_beat_time,
-                        "duration": duration,
-                        "velocity": velocity
-                    })
-                current_beat_time += duration
-        else:
-            # Already event stream
-            processed_events = track_events
-
-        # Apply Humanization
-        processed_events = humanize_track(processed_events, mood=mood, is_chords=(track_name == "chords"))
-
-        # Convert to Mido Events
-        for event in processed_events:
-            start_ticks = int(event["time"] * ticks_per_beat)
-            duration_ticks = int(event["duration"] * ticks_per_beat)
-            
-            midi_events.append({
-                "type": "note_on", 
-                "note": event["note"], 
-                "velocity": event["velocity"], 
-                "time": start_ticks
-            })
-            midi_events.append({
-                "type": "note_off", 
-                "note": event["note"], 
-                "velocity": 0, 
-                "time": start_ticks + duration_ticks
-            })
-
-        # --- Advanced MIDI CC Automation (Sustain, Expression) ---
-        if track_name == "chords":
-            # 1. Sustain Pedal (CC 64) for Piano/Keys genres
-            if any(m in mood.lower() for m in ["lo_fi", "neo_soul", "jazz", "cinematic", "pop", "rnb", "ballad", "walker", "faded"]):
-                # Group events by start time to avoid redundant pedal messages
-                unique_starts = sorted(list(set(e["time"] for e in midi_events if e["type"] == "note_on")))
-                
-                for t_start in unique_starts:
-                    # Legato Pedaling: Quick Up-Down transition at each chord change
-                    # Pedal Up just before the chord
-                    up_time = max(0, int(t_start - 5)) # 5 ticks before
-                    midi_events.append({
-                        "type": "control_change",
-                        "control": 64, # Sustain Pedal
-                        "value": 0,    # Off
-                        "time": up_time
-                    })
-                    
-                    # Pedal Down exactly at the chord (or slightly after for realism? No, simulataneous is fine for MIDI)
-                    midi_events.append({
-                        "type": "control_change",
-                        "control": 64,
-                        "value": 127,  # On
-                        "time": t_start
-                    })
-            
-            # 2. Expression (CC 11) for Cinematic Swells
-            if "cinematic" in mood or "ambient" in mood:
-                # Create a swell for each chord
-                # Find chord durations
-                # This is tricky with individual note events. 
-                # Simplified: Swell volume over the whole track or per bar?
-                # Let's do per bar swells (every 4 beats)
-                total_duration = max(e["time"] for e in midi_events)
-                bar_ticks = ticks_per_beat * 4
-                
-                for t in range(0, total_duration, bar_ticks):
-                    # Swell Up
-                    for i in range(0, bar_ticks // 2, 100): # Resolution of 100 ticks
-                        val = 50 + int(77 * (i / (bar_ticks // 2))) # 50 to 127
-                        midi_events.append({
-                            "type": "control_change",
-                            "control": 11,
-                            "value": val,
-                            "time": t + i
-                        })
-                    # Swell Down
-                    for i in range(bar_ticks // 2, bar_ticks, 100):
-                        val = 127 - int(77 * ((i - bar_ticks//2) / (bar_ticks // 2))) # 127 to 50
-                        midi_events.append({
-                            "type": "control_change",
-                            "control": 11,
-                            "value": val,
-                            "time": t + i
-                        })
-
-        # Sort and Write
-        midi_events.sort(key=lambda x: x["time"])
-        
-        last_event_time = 0
-        for event in midi_events:
-            delta = event["time"] - last_event_time
-            if delta < 0: delta = 0
-            
-            # Write Message
-            if event["type"] == "note_on":
-                 note = max(0, min(127, int(event["note"])))
-                 velocity = max(0, min(127, int(event["velocity"])))
-                 track.append(Message('note_on', note=note, velocity=velocity, time=delta, channel=channel))
-                 
-            elif event["type"] == "note_off":
-                 note = max(0, min(127, int(event["note"])))
-                 track.append(Message('note_off', note=note, velocity=0, time=delta, channel=channel))
-                 
-            elif event["type"] == "control_change":
-                 control = max(0, min(127, int(event["control"])))
-                 value = max(0, min(127, int(event["value"])))
-                 track.append(Message('control_change', control=control, value=value, time=delta, channel=channel))
-            
-            last_event_time = event["time"]
+        with stage("midi_encode"):
+            events = track_channel_events(track_name, notes, channel, profile)
+            chunks.append(encode_track(track_name.capitalize(), us_per_beat, channel, program_number, events))
+    
+    return b"".join(chunks)
 
+def create_midi_file(progression_data, tempo: int = 120, mood: str = "neutral", instruments: dict = None, rng=None):
+    """
+    Creates a MIDI file from the progression data (see encode_midi).
+    Returns the path to the temporary file. Used by the offline library
+    scripts; the API serves encode_midi bytes directly.
+    """
     # Create a temp file
     fd, path = tempfile.mkstemp(suffix=".mid")
-    os.close(fd)
-    mid.save(path)
+    with os.fdopen(fd, "wb") as f:
+        f.write(encode_midi(progression_data, tempo, mood, instruments, rng=rng))
         
     return path
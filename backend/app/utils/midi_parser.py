@@ -1,7 +1,9 @@
-import mido
+import logging
 import os
 from typing import Dict, List, Any
 
+logger = logging.getLogger(__name__)
+
 def parse_midi_file(file_path: str) -> Dict[str, Any]:
     """
     Parses a MIDI file and extracts chords, melody, and bass.
@@ -9,11 +11,12 @@ def parse_midi_file(file_path: str) -> Dict[str, Any]:
     """
     if not os.path.exists(file_path):
         return None
+    import mido # Imported on first use: only top-hit templates backed by MIDI files need it
 
     try:
         mid = mido.MidiFile(file_path)
     except Exception as e:
-        print(f"Error parsing MIDI file {file_path}: {e}")
+        logger.warning("Error parsing MIDI file %s: %s", file_path, e)
         return None
 
     # Default values
@@ -0,0 +1,178 @@
+import cProfile
+import hmac
+import importlib.util
+import json
+import logging
+import os
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+from urllib.parse import parse_qs
+
+from app.utils.log import REQUEST_ID
+
+# --- On-demand Profiling ---
+# Profiles one real request when asked to: the server has to be started with
+# PROFILING=1, and the request has to carry an "X-Profile" header or a
+# "?profile=" query flag (equal to PROFILE_KEY when one is set). The profiler
+# wraps the request's first worker job, which is where the CPU time goes, in
+# whichever process runs it. At most one request per PROFILE_INTERVAL seconds
+# (per API process) is profiled; others run normally with "X-Profile: rate-limited".
+#
+# cProfile writes a .prof file (python -m pstats, snakeviz); with pyinstrument
+# installed (PROFILER=auto or pyinstrument) a sampling profile is written as
+# speedscope JSON (https://www.speedscope.app) instead. Either way a .json file
+# next to it records the request: method, path, query, request id and the job's
+# parameters. The response's X-Profile header names the file.
+
+PROFILING_ENABLED = os.getenv("PROFILING", "0") == "1"
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "60")) # Seconds between profiled requests
+PROFILE_KEY = os.getenv("PROFILE_KEY", "")
+PROFILER = os.getenv("PROFILER", "auto") # auto, cprofile, pyinstrument
+SAMPLING_INTERVAL = 0.0005 # Seconds between pyinstrument samples
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class ProfileTarget:
+    """Where (and with what metadata) the current request's profile goes. Pickled to the worker."""
+    path: str # Without extension
+    sampling: bool
+    meta: Dict[str, Any] = field(default_factory=dict)
+    claimed: bool = False
+
+PROFILE_TARGET: ContextVar[Optional[ProfileTarget]] = ContextVar("profile_target", default=None)
+
+_last_profile = float("-inf")
+
+def sampling_available() -> bool:
+    """Whether pyinstrument is installed (checked without importing it)."""
+    return importlib.util.find_spec("pyinstrument") is not None
+
+def use_sampling_profiler() -> bool:
+    if PROFILER == "cprofile":
+        return False
+    return sampling_available()
+
+def requested_key(scope) -> Optional[str]:
+    """The profile flag from the X-Profile header or ?profile= query parameter, if any."""
+    for name, value in scope["headers"]:
+        if name == b"x-profile":
+            return value.decode("latin-1")
+    query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+    if "profile" in query:
+        return query["profile"][0]
+    return None
+
+def key_allowed(key: str) -> bool:
+    if PROFILE_KEY:
+        return hmac.compare_digest(key.encode(), PROFILE_KEY.encode())
+    return key.lower() not in ("", "0", "false")
+
+def acquire_slot(now: Optional[float] = None) -> bool:
+    """Rate limit: one profiled request per PROFILE_INTERVAL seconds."""
+    global _last_profile
+    now = time.monotonic() if now is None else now
+    if now - _last_profile < PROFILE_INTERVAL:
+        return False
+    _last_profile = now
+    return True
+
+def claim_profile() -> Optional[ProfileTarget]:
+    """Hands the request's profile target to its first job (and None to every later one)."""
+    target = PROFILE_TARGET.get()
+    if target is None or target.claimed:
+        return None
+    target.claimed = True
+    return target
+
+def profile_call(target: ProfileTarget, fn, args, kwargs):
+    """Runs fn(*args, **kwargs) under the profiler and writes the profile and its metadata."""
+    os.makedirs(os.path.dirname(target.path) or ".", exist_ok=True)
+    meta = {**target.meta, "job": getattr(fn, "__name__", repr(fn)), "args": args, "kwargs": kwargs, "pid": os.getpid()}
+    start = time.perf_counter()
+
+    if target.sampling:
+        from pyinstrument import Profiler as SamplingProfiler
+        from pyinstrument.renderers import SpeedscopeRenderer
+        profiler = SamplingProfiler(interval=SAMPLING_INTERVAL, async_mode="disabled")
+        profiler.start()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            profiler.stop()
+            meta["duration_ms"] = round((time.perf_counter() - start) * 1000, 3)
+            speedscope = json.loads(profiler.output(renderer=SpeedscopeRenderer()))
+            speedscope["name"] = f'{meta.get("method", "")} {meta.get("path", "")} {meta.get("request_id", "")}'.strip()
+            with open(target.path + ".speedscope.json", "w") as f:
+                json.dump(speedscope, f)
+            write_meta(target.path, meta)
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        profiler.disable()
+        meta["duration_ms"] = round((time.perf_counter() - start) * 1000, 3)
+        profiler.dump_stats(target.path + ".prof")
+        write_meta(target.path, meta)
+
+def write_meta(path: str, meta: Dict[str, Any]):
+    with open(path + ".json", "w") as f:
+        json.dump(meta, f, indent=2, default=repr)
+    logger.info("Wrote profile %s (%s ms)", path, meta.get("duration_ms"))
+
+class ProfilingMiddleware:
+    """
+    Decides whether a request is profiled (PROFILING on, flag present and
+    allowed, rate limit free) and binds its ProfileTarget for run_job. Sits inside
+    RequestLogMiddleware so the request id is known.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if not PROFILING_ENABLED or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        key = requested_key(scope)
+        if key is None or not key_allowed(key):
+            await self.app(scope, receive, send)
+            return
+
+        if not acquire_slot():
+            await self.app(scope, receive, self.with_header(send, "rate-limited"))
+            return
+
+        request_id = REQUEST_ID.get() or "request"
+        sampling = use_sampling_profiler()
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{request_id}"
+        target = ProfileTarget(
+            path=os.path.join(PROFILE_DIR, name),
+            sampling=sampling,
+            meta={
+                "request_id": request_id,
+                "method": scope["method"],
+                "path": scope["path"],
+                "query": scope.get("query_string", b"").decode("latin-1"),
+                "profiler": "pyinstrument" if sampling else "cProfile",
+                "started": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            },
+        )
+        token = PROFILE_TARGET.set(target)
+        try:
+            await self.app(scope, receive, self.with_header(send, name + (".speedscope.json" if sampling else ".prof")))
+        finally:
+            PROFILE_TARGET.reset(token)
+
+    @staticmethod
+    def with_header(send, value: str):
+        async def send_with_header(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile", value.encode())]
+            await send(message)
+        return send_with_header
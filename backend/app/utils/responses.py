@@ -0,0 +1,44 @@
+import json
+import os
+from typing import Any, Dict
+
+from fastapi.responses import JSONResponse
+
+from app.logic.notes import jsonable_track
+
+try:
+    import orjson
+except ImportError: # Optional speed-up, see requirements.txt
+    orjson = None
+
+# --- JSON Responses ---
+# Track responses are mostly note events. Humanization leaves 17-digit floats in
+# them, so times and durations are quantized to JSON_TIME_RESOLUTION steps per beat
+# (0 keeps full precision) before serialisation, and the bodies are written by
+# orjson when it is installed.
+
+JSON_TIME_RESOLUTION = int(os.getenv("JSON_TIME_RESOLUTION", "960"))
+# Seeds are echoed back in responses; orjson and MessagePack only encode 64-bit integers
+MAX_SEED = 2**63 - 1
+# Old clients read "progression"; it duplicates "raw_progression", so it's only sent when asked for
+PROGRESSION_ALIAS = os.getenv("PROGRESSION_ALIAS", "0") == "1"
+
+def dumps(content: Any) -> bytes:
+    """Compact UTF-8 JSON (orjson if available, else the stdlib with the same output format)."""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with dumps(). Return it directly to skip FastAPI's jsonable_encoder pass."""
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+def drop_progression_alias(track: Dict[str, Any]) -> Dict[str, Any]:
+    if not PROGRESSION_ALIAS and "raw_progression" in track:
+        track.pop("progression", None)
+    return track
+
+def response_track(track: Dict[str, Any]) -> Dict[str, Any]:
+    """Track dict as sent to clients: quantized event lists, without the progression alias."""
+    return drop_progression_alias(jsonable_track(track, JSON_TIME_RESOLUTION))
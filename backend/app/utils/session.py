@@ -0,0 +1,146 @@
+import random
+from typing import Any, Dict, Optional, Union
+
+from pydantic import BaseModel, ValidationError
+
+from app.logic.notes import TRACK_PARTS
+from app.utils.responses import MAX_SEED
+from app.utils.wire import JSON, COLUMNS_JSON, COLUMN_RESOLUTION, part_from_wire
+from app.logic.chords import TRACK_LAYERS
+from app.utils.workers import run_job, generate_track_job, layer_job, encode_midi_job
+
+# --- Interactive Sessions (/ws/session) ---
+# One TrackSession per WebSocket connection keeps the current track and settings
+# on the server, so the client only sends small commands and gets back the fields
+# that changed. Commands and replies are JSON text frames:
+#
+#   {"op": "generate", "settings": {...}, "seed": 42, "format": "columns"}
+#   {"op": "set", "settings": {"tempo": 128}}      tempo/instruments: no regeneration
+#   {"op": "reroll", "part": "melody"}             "melody", "bass", "rhythm" or "all"
+#   {"op": "state"}                                 the whole current track
+#   {"op": "export"}                                MIDI file as a binary frame
+#
+# Replies: {"id": <echoed>, "op": ..., "rev": n, "changed": {field: value, ...}}
+# or {"id": ..., "error": "..."}. "rev" counts changes to the session's track.
+
+class SessionSettings(BaseModel):
+    key: Optional[str] = None
+    scale: Optional[str] = None
+    mood: Optional[str] = None
+    length: Optional[int] = None
+    complexity: Optional[float] = None
+    melody: Optional[bool] = None
+    tempo: Optional[int] = None
+    instruments: Optional[dict] = None
+
+DEFAULT_SETTINGS = {"key": None, "scale": None, "mood": None, "length": 4, "complexity": 0.5, "melody": True, "tempo": 140}
+# Settings that change the generated notes; the rest only change metadata
+GENERATION_SETTINGS = ("key", "scale", "mood", "length", "complexity", "melody")
+
+class SessionError(Exception):
+    pass
+
+def track_delta(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    """Top-level fields of new that differ from old."""
+    return {field: value for field, value in new.items() if old.get(field) != value}
+
+class TrackSession:
+    def __init__(self, seed: Optional[int] = None):
+        self.settings = dict(DEFAULT_SETTINGS)
+        self.media_type = JSON
+        self.track: Dict[str, Any] = {}
+        self.rev = 0
+        self.rng = random.Random(seed) # Seeds for rerolls, so a seeded session replays exactly
+
+    async def handle(self, command: Dict[str, Any]) -> Union[Dict[str, Any], bytes]:
+        """Applies one command. Returns the reply, or MIDI bytes for "export"."""
+        op = command.get("op")
+        try:
+            if op == "generate":
+                reply = await self.generate(command)
+            elif op == "set":
+                reply = await self.set(command)
+            elif op == "reroll":
+                reply = await self.reroll(command)
+            elif op == "state":
+                reply = {"changed": dict(self.track)}
+            elif op == "export":
+                return await self.export()
+            else:
+                raise SessionError(f"Unknown op: {op!r}")
+        except (SessionError, ValidationError) as exc:
+            return {"id": command.get("id"), "op": op, "error": str(exc)}
+
+        if reply["changed"] and op != "state":
+            self.rev += 1
+        return {"id": command.get("id"), "op": op, "rev": self.rev, **reply}
+
+    def require_track(self):
+        if not self.track:
+            raise SessionError("No track yet: send a generate command first")
+
+    def update_settings(self, settings: Dict[str, Any]) -> Dict[str, Any]:
+        changes = SessionSettings.parse_obj(settings or {}).dict(exclude_unset=True)
+        changes = {k: (None if v == "Random" else v) for k, v in changes.items()}
+        self.settings.update(changes)
+        return changes
+
+    async def regenerate(self, seed: int) -> Dict[str, Any]:
+        settings = {k: self.settings[k] for k in DEFAULT_SETTINGS}
+        track = await run_job(generate_track_job, media_type=self.media_type, seed=seed, **settings)
+        if "instruments" in self.settings:
+            track["instruments"] = self.settings["instruments"]
+        # Random key/scale/mood stay what they resolved to until the client changes them
+        for field in ("key", "scale", "mood"):
+            self.settings[field] = track[field]
+        changed = track_delta(self.track, track)
+        self.track = track
+        return changed
+
+    async def generate(self, command: Dict[str, Any]) -> Dict[str, Any]:
+        media_type = COLUMNS_JSON if command.get("format") == "columns" else JSON
+        if media_type != self.media_type:
+            self.media_type, self.track = media_type, {} # Every part has to be resent
+        self.update_settings(command.get("settings"))
+        seed = command.get("seed")
+        if seed is not None and (type(seed) is not int or not 0 <= seed <= MAX_SEED):
+            raise SessionError(f"seed must be an integer from 0 to {MAX_SEED}")
+        return {"changed": await self.regenerate(seed if seed is not None else self.rng.getrandbits(32))}
+
+    async def set(self, command: Dict[str, Any]) -> Dict[str, Any]:
+        self.require_track()
+        changes = self.update_settings(command.get("settings"))
+        if any(field in changes for field in GENERATION_SETTINGS):
+            # Same seed: only the layers the setting actually affects come back
+            return {"changed": await self.regenerate(self.track["seed"])}
+
+        changed = {}
+        if "tempo" in changes and changes["tempo"] != self.track.get("tempo"):
+            changed["tempo"] = self.track["tempo"] = changes["tempo"]
+        if "instruments" in changes:
+            changed["instruments"] = self.track["instruments"] = changes["instruments"]
+        return {"changed": changed}
+
+    async def reroll(self, command: Dict[str, Any]) -> Dict[str, Any]:
+        self.require_track()
+        part = command.get("part", "all")
+        seed = self.rng.getrandbits(32)
+        track = self.track
+        if part == "all":
+            return {"changed": await self.regenerate(seed)}
+        if part not in TRACK_LAYERS:
+            raise SessionError(f"Can't reroll {part!r}")
+        layer = await run_job(
+            layer_job, part, track["raw_progression"], self.media_type,
+            key=track["key"], scale=track["scale"], mood=track["mood"],
+            complexity=self.settings["complexity"], seed=seed
+        )
+        changed = {TRACK_LAYERS[part]: layer[TRACK_LAYERS[part]]}
+        track.update(changed)
+        return {"changed": changed}
+
+    async def export(self) -> bytes:
+        self.require_track()
+        resolution = self.track.get("resolution", COLUMN_RESOLUTION)
+        parts = {part: part_from_wire(self.track[part], resolution) for part in TRACK_PARTS if self.track.get(part)}
+        return await run_job(encode_midi_job, parts, self.track["tempo"], self.track["mood"], self.track.get("instruments"))
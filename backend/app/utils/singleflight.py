@@ -0,0 +1,63 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+from app.utils.deadline import BUDGET
+from app.utils.metrics import SINGLE_FLIGHT
+
+# --- Single-flight ---
+# When a template is featured, or many clients send the same seeded settings,
+# identical requests arrive together. The first one (the leader) starts the
+# computation; requests with the same key that arrive while it is running await
+# the same task and get the same result (or exception). Nothing is cached: once
+# the task finishes the next request computes again.
+#
+# The computation runs as its own task in the leader's context (its stage timings
+# and profile go to the leader's request), so one client disconnecting doesn't
+# cancel it for the others; it is only cancelled when every waiter has gone. For
+# the same reason it runs without the leader's deadline; each waiter watches its
+# own instead (app/utils/deadline.py).
+# Results are shared between requests, so callers must not mutate them.
+
+async def detached(fn, *args, **kwargs):
+    BUDGET.set(None) # Only in the flight task's own copy of the context
+    return await fn(*args, **kwargs)
+
+class Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Future):
+        self.task = task
+        self.waiters = 0
+
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name # "flight" metric label
+        self.flights: Dict[Hashable, Flight] = {}
+
+    async def do(self, key: Hashable, fn: Callable[..., Awaitable[Any]], /, *args, **kwargs) -> Any:
+        """await fn(*args, **kwargs), shared with any in-flight call for the same key."""
+        flight = self.flights.get(key)
+        if flight is None:
+            flight = self.flights[key] = Flight(asyncio.ensure_future(detached(fn, *args, **kwargs)))
+            flight.task.add_done_callback(lambda _: self.forget(key, flight))
+            SINGLE_FLIGHT.inc(self.name, "leader")
+        else:
+            SINGLE_FLIGHT.inc(self.name, "coalesced")
+
+        flight.waiters += 1
+        budget = BUDGET.get()
+        try:
+            if budget is not None:
+                # Each waiter still gives up on its own deadline or disconnect
+                return await budget.watch(asyncio.shield(flight.task))
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # Everyone waiting was cancelled: stop the work, and don't let a new request join it
+                self.forget(key, flight)
+                flight.task.cancel()
+
+    def forget(self, key: Hashable, flight: Flight):
+        if self.flights.get(key) is flight:
+            del self.flights[key]
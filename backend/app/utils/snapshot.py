@@ -0,0 +1,68 @@
+import glob
+import hashlib
+import logging
+import marshal
+import os
+import sys
+from typing import Any, Dict, Optional
+
+# --- Table Snapshot ---
+# Tables the API otherwise builds on startup (the chord table, the precomputed
+# top-hits responses, which need every template's MIDI file parsed) can be
+# written to one file at build time and loaded with a single marshal read on a
+# cold start:
+#
+#   python -m app.utils.snapshot        (from backend/, e.g. in the Dockerfile)
+#
+# The snapshot records a fingerprint of the Python version, the app's source
+# and the MIDI data; if anything changed it is ignored and the tables are built
+# as usual, so a stale file can never serve stale data. TABLE_SNAPSHOT
+# overrides the path; the file is optional.
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SNAPSHOT_PATH = os.getenv("TABLE_SNAPSHOT", os.path.join(APP_DIR, "data", "tables.snapshot"))
+
+logger = logging.getLogger(__name__)
+
+def fingerprint() -> str:
+    """Hash of everything the tables are derived from."""
+    digest = hashlib.sha256(sys.version.encode())
+    for path in sorted(glob.glob(os.path.join(APP_DIR, "**", "*.py"), recursive=True)):
+        with open(path, "rb") as f:
+            digest.update(os.path.relpath(path, APP_DIR).encode() + f.read())
+    midi_dir = os.path.join(APP_DIR, "data", "midi")
+    for path in sorted(glob.glob(os.path.join(midi_dir, "**", "*.mid"), recursive=True)):
+        stat = os.stat(path)
+        digest.update(f"{os.path.relpath(path, midi_dir)}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    digest.update(os.getcwd().encode()) # Some templates are looked up relative to the working directory
+    return digest.hexdigest()
+
+def save_snapshot(tables: Dict[str, Any], path: Optional[str] = None):
+    """Writes tables (marshal-able values only: dicts, tuples, bytes, str, numbers, None)."""
+    path = path or SNAPSHOT_PATH
+    data = marshal.dumps({"fingerprint": fingerprint(), "tables": tables})
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+def load_snapshot(path: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """The snapshot's tables, or None if there is no usable snapshot."""
+    path = path or SNAPSHOT_PATH
+    try:
+        with open(path, "rb") as f:
+            snapshot = marshal.load(f)
+    except FileNotFoundError:
+        return None
+    except (EOFError, ValueError, TypeError) as exc:
+        logger.warning("Ignoring unreadable table snapshot %s: %s", path, exc)
+        return None
+    if not isinstance(snapshot, dict) or snapshot.get("fingerprint") != fingerprint():
+        logger.info("Ignoring stale table snapshot %s", path)
+        return None
+    return snapshot["tables"]
+
+if __name__ == "__main__":
+    from app.main import build_tables
+    save_snapshot(build_tables())
+    print(f"Wrote {SNAPSHOT_PATH}")
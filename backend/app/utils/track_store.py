@@ -0,0 +1,183 @@
+import hashlib
+import logging
+import marshal
+import os
+import re
+import tempfile
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from app.logic.notes import NoteArray, TRACK_PARTS, PITCH_DTYPE, TIME_DTYPE, VELOCITY_DTYPE
+
+# --- Track Store ---
+# Generated tracks are kept server-side for a while under a content id (returned
+# as "track_id"), so a download is GET /download/midi/{track_id}: no re-upload of
+# every note event, no per-note validation, and the MIDI bytes are encoded once
+# and reused. The store is a bounded LRU with a TTL in each API process, backed
+# by a directory that every process on the host shares (TRACK_STORE_DIR; the
+# Procfile runs several gunicorn workers, and the download can reach any of
+# them). Each track is one small marshal file named by its id; a process that
+# misses in memory loads it from there. Files expire TRACK_STORE_TTL seconds
+# after their last put and at most TRACK_STORE_FILES are kept. A miss (evicted,
+# expired, or stored on another host) is a 404 and the client falls back to
+# POST /download/midi with the events.
+
+TRACK_STORE_SIZE = int(os.getenv("TRACK_STORE_SIZE", "1024")) # Tracks in memory, per process
+TRACK_STORE_TTL = float(os.getenv("TRACK_STORE_TTL", "3600")) # Seconds
+# Shared between processes; empty keeps tracks in process memory only
+TRACK_STORE_DIR = os.getenv("TRACK_STORE_DIR", os.path.join(tempfile.gettempdir(), "midi-track-store"))
+TRACK_STORE_FILES = int(os.getenv("TRACK_STORE_FILES", "16384"))
+SWEEP_EVERY = 256 # Puts between removing expired files
+MIDI_VARIANTS = 4 # Encoded files kept per track (one per tempo / instruments combination)
+
+TRACK_ID_PATTERN = re.compile(r"^[0-9a-f]{24}$")
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class StoredTrack:
+    id: str
+    parts: Dict[str, NoteArray]
+    tempo: int
+    mood: str
+    midi: Dict[Tuple, bytes] = field(default_factory=dict) # Encoded files by (tempo, instruments)
+
+    def cache_midi(self, variant: Tuple, data: bytes):
+        if len(self.midi) < MIDI_VARIANTS:
+            self.midi[variant] = data
+
+def stored_track(track: Dict[str, Any]) -> StoredTrack:
+    """A generated track's notes and settings, under an id derived from exactly those."""
+    parts = {}
+    for part in TRACK_PARTS:
+        notes = track.get(part)
+        if notes is not None:
+            parts[part] = notes if isinstance(notes, NoteArray) else NoteArray.from_events(notes)
+
+    tempo, mood = int(track.get("tempo", 120)), track.get("mood") or "neutral"
+    digest = hashlib.sha256(f"{tempo}|{mood}".encode())
+    for part, notes in parts.items():
+        digest.update(part.encode())
+        for column in (notes.pitch, notes.time, notes.duration, notes.velocity):
+            digest.update(column.tobytes())
+    return StoredTrack(digest.hexdigest()[:24], parts, tempo, mood)
+
+class TrackStore:
+    """
+    LRU of StoredTracks whose entries also expire ttl seconds after their last
+    put, optionally backed by a directory shared with other processes. Event loop only.
+    """
+    def __init__(self, max_size: int, ttl: float, directory: Optional[str] = None, max_files: int = TRACK_STORE_FILES):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.directory = directory or None
+        self.max_files = max_files
+        self.puts = 0
+        self.entries: "OrderedDict[str, Tuple[float, StoredTrack]]" = OrderedDict()
+
+    def put(self, track: StoredTrack) -> StoredTrack:
+        """Stores track (or refreshes the copy already stored, keeping its encoded files) and returns the stored one."""
+        existing = self.entries.get(track.id)
+        if existing is not None:
+            track = existing[1]
+        self.remember(track)
+        if self.directory is not None:
+            self.write(track)
+        return track
+
+    def get(self, track_id: str) -> Optional[StoredTrack]:
+        entry = self.entries.get(track_id)
+        if entry is None:
+            return self.load(track_id)
+        expires, track = entry
+        if expires <= time.monotonic():
+            del self.entries[track_id]
+            return None
+        self.entries.move_to_end(track_id)
+        return track
+
+    def remember(self, track: StoredTrack):
+        now = time.monotonic()
+        self.entries[track.id] = (now + self.ttl, track)
+        self.entries.move_to_end(track.id)
+        while self.entries:
+            oldest_id, (expires, _) = next(iter(self.entries.items()))
+            if len(self.entries) <= self.max_size and expires > now:
+                break
+            del self.entries[oldest_id]
+
+    # --- Shared directory ---
+
+    def path(self, track_id: str) -> str:
+        return os.path.join(self.directory, track_id + ".track")
+
+    def write(self, track: StoredTrack):
+        path = self.path(track.id)
+        try:
+            if os.path.exists(path):
+                os.utime(path) # Same id, same content: just restart its TTL
+            else:
+                os.makedirs(self.directory, exist_ok=True)
+                parts = {
+                    part: (notes.pitch.tobytes(), notes.time.tobytes(), notes.duration.tobytes(), notes.velocity.tobytes())
+                    for part, notes in track.parts.items()
+                }
+                temp_path = f"{path}.{os.getpid()}.tmp"
+                with open(temp_path, "wb") as f:
+                    marshal.dump({"tempo": track.tempo, "mood": track.mood, "parts": parts}, f)
+                os.replace(temp_path, path) # Readers never see a partial file
+        except OSError as exc:
+            logger.warning("Could not write %s to the track store: %s", track.id, exc)
+            return
+        self.puts += 1
+        if self.puts % SWEEP_EVERY == 0:
+            self.sweep()
+
+    def load(self, track_id: str) -> Optional[StoredTrack]:
+        """A track another process (or this one, before an eviction) put, if it hasn't expired."""
+        if self.directory is None or not TRACK_ID_PATTERN.match(track_id):
+            return None
+        path = self.path(track_id)
+        try:
+            if os.path.getmtime(path) + self.ttl <= time.time():
+                return None
+            with open(path, "rb") as f:
+                data = marshal.load(f)
+            parts = {
+                part: NoteArray(
+                    np.frombuffer(pitch, dtype=PITCH_DTYPE), np.frombuffer(start, dtype=TIME_DTYPE),
+                    np.frombuffer(duration, dtype=TIME_DTYPE), np.frombuffer(velocity, dtype=VELOCITY_DTYPE),
+                )
+                for part, (pitch, start, duration, velocity) in data["parts"].items()
+            }
+            track = StoredTrack(track_id, parts, data["tempo"], data["mood"])
+        except (OSError, EOFError, ValueError, TypeError, KeyError):
+            return None
+        self.remember(track)
+        return track
+
+    def sweep(self):
+        """Removes expired files, then the oldest ones beyond max_files."""
+        try:
+            entries = [entry for entry in os.scandir(self.directory) if entry.name.endswith(".track")]
+            files = sorted((entry.stat().st_mtime, entry.path) for entry in entries)
+        except OSError:
+            return
+        expired = time.time() - self.ttl
+        excess = len(files) - self.max_files
+        for n, (mtime, path) in enumerate(files):
+            if mtime > expired and n >= excess:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass # Another process removed it first
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+TRACKS = TrackStore(TRACK_STORE_SIZE, TRACK_STORE_TTL, TRACK_STORE_DIR)
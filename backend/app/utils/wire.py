@@ -0,0 +1,123 @@
+import json
+from typing import Any, Dict, Optional
+
+from fastapi import Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import Response
+from pydantic import ValidationError
+
+from app.logic.notes import NoteArray, TRACK_PARTS
+from app.utils.http_cache import quality_values
+from app.utils.log import stage
+from app.utils.responses import FastJSONResponse, dumps, orjson, response_track, drop_progression_alias, JSON_TIME_RESOLUTION
+
+try:
+    import msgpack
+except ImportError: # Optional, see requirements.txt; the binary format is only offered when installed
+    msgpack = None
+
+DECODE_ERRORS = (ValueError, UnicodeDecodeError) + ((msgpack.UnpackException,) if msgpack is not None else ())
+
+# --- Wire Formats ---
+# Note-heavy bodies can travel in three encodings, picked by Accept (responses)
+# and Content-Type (uploads):
+#   application/json                  - event dicts, as the frontend expects (default)
+#   application/vnd.midi-columns+json - one list per field, delta-encoded ticks
+#   application/x-msgpack             - the same columns as MessagePack
+# Columnar parts look like {"note": [...], "dt": [...], "dur": [...], "vel": [...]}
+# with times in ticks at the track's "resolution" (ticks per beat).
+# An Accept entry with q=0 refuses that type; a client that refuses every offered
+# type gets 406 (NotAcceptable).
+
+JSON = "application/json"
+COLUMNS_JSON = "application/vnd.midi-columns+json"
+MSGPACK = "application/x-msgpack"
+MEDIA_ALIASES = {"application/msgpack": MSGPACK, "application/vnd.msgpack": MSGPACK}
+PREFERENCE = (JSON, MSGPACK, COLUMNS_JSON) # Tie-break between equally acceptable types
+
+COLUMN_RESOLUTION = JSON_TIME_RESOLUTION or 960
+
+def offered_media_types():
+    return [JSON, COLUMNS_JSON] + ([MSGPACK] if msgpack is not None else [])
+
+class NotAcceptable(Exception):
+    def __init__(self, accept: Optional[str]):
+        super().__init__(accept)
+        self.accept = accept
+
+def negotiate(accept: Optional[str]) -> str:
+    """
+    Best offered media type for an Accept header: the highest q, JSON on ties and
+    when nothing offered is listed. Raises NotAcceptable if every offered type is refused.
+    """
+    qualities = {}
+    for media, q in quality_values(accept or "*/*").items():
+        media = MEDIA_ALIASES.get(media, media)
+        qualities[media] = max(q, qualities.get(media, 0.0))
+
+    ranked = []
+    for preference, media in enumerate(sorted(offered_media_types(), key=PREFERENCE.index)):
+        q = qualities.get(media, qualities.get(media.split("/")[0] + "/*", qualities.get("*/*")))
+        ranked.append((q, preference, media))
+    listed = [(-q, preference, media) for q, preference, media in ranked if q]
+    if listed:
+        return min(listed)[2]
+    # Nothing offered is listed (e.g. Accept: text/html): whatever isn't refused, JSON first
+    for q, _, media in ranked:
+        if q is None:
+            return media
+    raise NotAcceptable(accept)
+
+def columnar_track(track: Dict[str, Any], resolution: int = COLUMN_RESOLUTION) -> Dict[str, Any]:
+    """Track dict with note parts (NoteArrays or event lists) in the columnar format."""
+    out = dict(track)
+    for part in TRACK_PARTS:
+        if part in out and out[part] is not None:
+            out[part] = NoteArray.from_events(out[part]).to_columns(resolution)
+    out["resolution"] = resolution
+    return drop_progression_alias(out)
+
+def wire_track(track: Dict[str, Any], media_type: str = JSON) -> Dict[str, Any]:
+    """Track dict converted for the negotiated media type."""
+    return response_track(track) if media_type == JSON else columnar_track(track)
+
+def part_from_wire(part, resolution: int = COLUMN_RESOLUTION) -> NoteArray:
+    """Note part as sent on the wire (event list or columns) back to a NoteArray."""
+    if isinstance(part, dict):
+        return NoteArray.from_columns(part, resolution)
+    return NoteArray.from_events(part or [])
+
+def encode_body(content: Any, media_type: str) -> bytes:
+    if media_type == MSGPACK:
+        return msgpack.packb(content, use_bin_type=True)
+    return dumps(content)
+
+def wire_response(content: Any, media_type: str = JSON, headers: Optional[Dict[str, str]] = None) -> Response:
+    headers = {**(headers or {}), "Vary": "Accept"}
+    with stage("serialize"):
+        if media_type == JSON:
+            return FastJSONResponse(content, headers=headers)
+        return Response(content=encode_body(content, media_type), media_type=media_type, headers=headers)
+
+async def parse_body(request: Request, model):
+    """
+    Decodes a JSON or MessagePack request body and validates it into model,
+    raising RequestValidationError (422) like a regular body parameter.
+    """
+    body = await request.body()
+    media = request.headers.get("content-type", JSON).split(";")[0].strip().lower()
+    media = MEDIA_ALIASES.get(media, media)
+    try:
+        if media == MSGPACK and msgpack is not None:
+            payload = msgpack.unpackb(body, raw=False)
+        else:
+            payload = orjson.loads(body) if orjson is not None else json.loads(body)
+    except DECODE_ERRORS as exc:
+        raise RequestValidationError([{"loc": ("body",), "msg": f"Could not decode {media} body: {exc}", "type": "value_error"}])
+    try:
+        return model.parse_obj(payload)
+    except ValidationError as exc:
+        raise RequestValidationError([
+            {"loc": ("body",) + tuple(error["loc"]), "msg": error["msg"], "type": error["type"]}
+            for error in exc.errors()
+        ])
@@ -0,0 +1,228 @@
+import asyncio
+import itertools
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from app.logic.chords import generate_track_data, generate_track_data_cached, generate_track_data_batch, regenerate_layer, build_chord_table, CHORD_TABLE
+from app.logic.top_hits import generate_top_hit_track
+from app.utils.wire import JSON, wire_track
+from app.utils.track_store import stored_track
+from app.utils.snapshot import load_snapshot
+from app.utils.responses import dumps
+from app.utils.log import REQUEST_ID, configure_logging, request_context, merge_timings
+from app.utils.profiling import claim_profile, profile_call
+from app.utils.admission import CPU_SHARE, admit_request
+from app.utils.deadline import BUDGET, Budget, Cancelled, SharedFlag
+from app.utils.metrics import CANCELLED
+
+# --- Worker Pool ---
+# Generation and MIDI export are CPU-bound Python. Run in the request threadpool
+# they all share one GIL, so a long track stalls every other request (health
+# checks included). The API hands them to a process pool instead; the async
+# handlers just await the result.
+#
+# WORKER_PROCESSES=0 disables the pool and runs jobs in the threadpool, which is
+# also what happens before start_pool() (scripts, tests without a lifespan).
+# With several gunicorn workers (see Procfile) each gets its own pool, so the
+# default is cores / WEB_CONCURRENCY (the number of gunicorn workers).
+
+WORKER_PROCESSES = int(os.getenv("WORKER_PROCESSES", str(CPU_SHARE)))
+# "spawn" keeps children clean of the server's event loop and threads
+WORKER_START_METHOD = os.getenv("WORKER_START_METHOD", "spawn")
+# Pool jobs that can be cancelled at once (queued or running); beyond that they only get their deadline
+CANCEL_SLOTS = int(os.getenv("CANCEL_SLOTS", "1024"))
+
+_pool: Optional[ProcessPoolExecutor] = None
+# One byte per cancel slot, shared with the workers (see SharedFlag in app/utils/deadline.py)
+_cancel_flags = None
+_free_slots: List[int] = []
+
+logger = logging.getLogger(__name__)
+
+def warm_worker(cancel_flags=None):
+    """
+    Runs once in every worker process (after this module, and so the generation
+    stack, has been imported): keeps the shared cancel flags, loads the chord
+    table from the startup snapshot (or builds it), then builds a small track so
+    the remaining lazily-built tables and caches are ready for the first request.
+    """
+    global _cancel_flags
+    from app.utils.midi_export import encode_midi
+    _cancel_flags = cancel_flags
+    configure_logging()
+    tables = load_snapshot()
+    if tables is not None:
+        CHORD_TABLE.update(tables["chord_table"])
+    else:
+        build_chord_table()
+    encode_midi(generate_track_data("C", "minor", "pop", length=4, seed=0), mood="pop")
+
+def _ready() -> bool:
+    return True
+
+def start_pool(processes: Optional[int] = None) -> Optional[ProcessPoolExecutor]:
+    """Starts the pool and waits for every worker to finish warming up."""
+    global _pool, _cancel_flags, _free_slots
+    processes = WORKER_PROCESSES if processes is None else processes
+    if processes <= 0 or _pool is not None:
+        return _pool
+
+    context = multiprocessing.get_context(WORKER_START_METHOD)
+    _cancel_flags = context.RawArray("b", CANCEL_SLOTS)
+    _free_slots = list(range(CANCEL_SLOTS))
+    _pool = ProcessPoolExecutor(
+        max_workers=processes,
+        mp_context=context,
+        initializer=warm_worker,
+        initargs=(_cancel_flags,),
+    )
+    # Workers are started on demand; one job each brings them all up front
+    for future in [_pool.submit(_ready) for _ in range(processes)]:
+        future.result()
+    logger.info("Worker pool ready: %d processes", processes)
+    return _pool
+
+def pool_ready() -> bool:
+    """True once the pool is up (or when it is disabled and jobs use the threadpool)."""
+    return _pool is not None or WORKER_PROCESSES <= 0
+
+def stop_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=True, cancel_futures=True)
+        _pool = None
+
+def run_in_request_context(fn, request_id, args, kwargs, deadline=None, cancel_slot=None):
+    """
+    Worker side of run_job: runs the job under the caller's request id (and
+    deadline and cancel flag, see app/utils/deadline.py) and returns its stage
+    timings and labels too.
+    """
+    labels = {}
+    budget = None
+    if cancel_slot is not None:
+        budget = Budget(deadline, cancelled=SharedFlag(_cancel_flags, cancel_slot))
+    elif deadline is not None:
+        budget = Budget(deadline)
+    token = BUDGET.set(budget)
+    try:
+        with request_context(request_id, labels) as timings:
+            return fn(*args, **kwargs), timings, labels
+    finally:
+        BUDGET.reset(token)
+
+def submit(fn, args, kwargs, budget: Optional[Budget]) -> asyncio.Future:
+    """Hands a job to the pool, with a cancel slot if one is free (see cancel_job)."""
+    deadline = budget.deadline if budget is not None else None
+    flags, slot = _cancel_flags, (_free_slots.pop() if _free_slots else None)
+    flag = None
+    if slot is not None:
+        flag = SharedFlag(flags, slot)
+        flag.clear()
+    future = _pool.submit(run_in_request_context, fn, REQUEST_ID.get(), args, kwargs, deadline, slot)
+    if slot is not None:
+        # The pool's future, not the asyncio one: that is done as soon as it is
+        # cancelled, while the worker may still be reading the slot. Not reused
+        # after a restart either.
+        future.add_done_callback(lambda _: flags is _cancel_flags and _free_slots.append(slot))
+    job = asyncio.wrap_future(future)
+    job.pool_future, job.cancel_flag = future, flag
+    return job
+
+def cancel_job(job):
+    """Flags a pool job that is still queued or running, so it stops at its next checkpoint."""
+    flag = getattr(job, "cancel_flag", None)
+    if flag is not None and not job.pool_future.done():
+        flag.set()
+
+async def run_job(fn, *args, **kwargs):
+    """Runs fn(*args, **kwargs) in the worker pool, or the threadpool if there is none."""
+    await admit_request() # May raise Overloaded (503), see app/utils/admission.py
+    budget = BUDGET.get()
+    if budget is not None:
+        budget.check("queued")
+    profile = claim_profile()
+    if profile is not None: # This request asked to be profiled (see app/utils/profiling.py)
+        fn, args, kwargs = profile_call, (profile, fn, args, kwargs), {}
+    if _pool is None:
+        # The threadpool copies the request's context, stage timings and budget included
+        job = run_in_threadpool(fn, *args, **kwargs)
+    else:
+        job = submit(fn, args, kwargs, budget)
+    try:
+        # Stops waiting as soon as the client disconnects or the deadline passes
+        result = await (budget.watch(job) if budget is not None else job)
+    except (Cancelled, asyncio.CancelledError):
+        cancel_job(job)
+        raise
+    if _pool is not None:
+        result, timings, labels = result
+        merge_timings(timings, labels)
+    if budget is not None:
+        budget.check("export")
+    return result
+
+async def stream_jobs(jobs: Iterable[Callable[[], Any]], concurrency: int) -> AsyncIterator[Any]:
+    """
+    Runs zero-argument jobs (e.g. functools.partial) with at most `concurrency` in
+    flight and yields results as they complete. The next job is only submitted
+    once a result has been consumed, so a slow reader holds generation back and
+    memory stays bounded however many jobs there are. Jobs still in flight are
+    cancelled if the consumer stops early.
+    """
+    jobs = iter(jobs)
+    pending = {asyncio.ensure_future(run_job(job)) for job in itertools.islice(jobs, max(1, concurrency))}
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                try:
+                    result = future.result()
+                except Cancelled as exc:
+                    CANCELLED.inc(exc.reason, exc.stage)
+                    return # Out of time or the client is gone: end the stream here
+                yield result
+                job = next(jobs, None)
+                if job is not None:
+                    pending.add(asyncio.ensure_future(run_job(job)))
+    finally:
+        for future in pending:
+            future.cancel()
+
+# --- Jobs ---
+# Module-level so they pickle by reference. They return JSON-ready data or bytes
+# so the API process does as little per-request work as possible.
+
+def generate_track_job(media_type: str = JSON, store: bool = False, **settings):
+    """The track for the wire; with store=True, paired with its StoredTrack for the track store."""
+    track = generate_track_data_cached(**settings)
+    if store:
+        return wire_track(track, media_type), stored_track(track)
+    return wire_track(track, media_type)
+
+def generate_batch_job(count: int, media_type: str = JSON, **settings) -> List[Dict[str, Any]]:
+    return [wire_track(track, media_type) for track in generate_track_data_batch(count, **settings)]
+
+def stream_track_job(index: int, **settings) -> bytes:
+    """One NDJSON line: an uncached track (large streams shouldn't flush the cache) plus its index."""
+    track = wire_track(generate_track_data(**settings))
+    track["index"] = index
+    track["source"] = "Generated"
+    return dumps(track) + b"\n"
+
+def layer_job(layer: str, progression: List[Dict[str, Any]], media_type: str = JSON, **settings) -> Dict[str, Any]:
+    """One re-rolled layer over an existing progression (see regenerate_layer)."""
+    return wire_track(regenerate_layer(layer, progression, **settings), media_type)
+
+def top_hit_job(template_id: str, media_type: str = JSON) -> Dict[str, Any]:
+    return wire_track(generate_top_hit_track(template_id), media_type)
+
+def encode_midi_job(progression_data, tempo: int = 120, mood: str = "neutral", instruments: dict = None) -> bytes:
+    from app.utils.midi_export import encode_midi # Export-only code stays off the API's import path
+    return encode_midi(progression_data, tempo, mood, instruments)
@@ -0,0 +1,107 @@
+import sys
+import os
+import io
+import random
+import time
+
+import mido
+from mido import MidiFile, MidiTrack, Message, MetaMessage
+
+# Add backend directory to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.logic.notes import NoteArray
+from app.logic.moods import resolve_mood
+from app.utils.midi_export import TICKS_PER_BEAT, encode_midi, encode_track, track_channel_events, humanize_track
+
+# Compares the direct SMF encoder against building mido Messages for the same
+# humanized notes. Usage: python scripts/benchmark_midi_export.py [notes] [repeats]
+
+MOOD = "lo_fi" # Chords get sustain pedal automation, like most real downloads
+
+def make_notes(count: int) -> NoteArray:
+    rng = random.Random(0)
+    chord = [48, 55, 60, 64]
+    events = []
+    for i in range(count):
+        events.append({
+            "note": chord[i % 4] + rng.choice([0, 12]),
+            "time": (i // 4) * 0.5,
+            "duration": 0.45,
+            "velocity": rng.randint(60, 110),
+        })
+    return NoteArray.from_events(events)
+
+def encode_with_mido(notes: NoteArray, profile) -> bytes:
+    """The previous path: event dicts, a Python sort and one mido Message per event."""
+    mid = MidiFile()
+    track = MidiTrack()
+    mid.tracks.append(track)
+    track.append(MetaMessage('track_name', name="Chords"))
+    track.append(MetaMessage('set_tempo', tempo=500000))
+    track.append(Message('program_change', program=0, time=0, channel=0))
+
+    midi_events = []
+    for event in notes:
+        start_ticks = int(event["time"] * TICKS_PER_BEAT)
+        duration_ticks = int(event["duration"] * TICKS_PER_BEAT)
+        midi_events.append({"type": "note_on", "note": event["note"], "velocity": event["velocity"], "time": start_ticks})
+        midi_events.append({"type": "note_off", "note": event["note"], "velocity": 0, "time": start_ticks + duration_ticks})
+
+    if profile.sustain_pedal:
+        unique_starts = sorted(set(e["time"] for e in midi_events if e["type"] == "note_on"))
+        for t_start in unique_starts:
+            midi_events.append({"type": "control_change", "control": 64, "value": 0, "time": max(0, int(t_start - 5))})
+            midi_events.append({"type": "control_change", "control": 64, "value": 127, "time": t_start})
+
+    midi_events.sort(key=lambda x: x["time"])
+
+    last_event_time = 0
+    for event in midi_events:
+        delta = max(0, event["time"] - last_event_time)
+        if event["type"] == "note_on":
+            track.append(Message('note_on', note=max(0, min(127, int(event["note"]))), velocity=max(0, min(127, int(event["velocity"]))), time=delta, channel=0))
+        elif event["type"] == "note_off":
+            track.append(Message('note_off', note=max(0, min(127, int(event["note"]))), velocity=0, time=delta, channel=0))
+        else:
+            track.append(Message('control_change', control=event["control"], value=event["value"], time=delta, channel=0))
+        last_event_time = event["time"]
+
+    out = io.BytesIO()
+    mid.save(file=out)
+    return out.getvalue()
+
+def encode_direct(notes: NoteArray, profile) -> bytes:
+    header = b"MThd" + (6).to_bytes(4, "big") + (1).to_bytes(2, "big") + (1).to_bytes(2, "big") + TICKS_PER_BEAT.to_bytes(2, "big")
+    return header + encode_track("Chords", 500000, 0, 0, track_channel_events("chords", notes, 0, profile))
+
+def best_of(fn, repeats: int) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    profile = resolve_mood(MOOD)
+    notes = humanize_track(make_notes(count), mood=MOOD, is_chords=True, rng=random.Random(1))
+
+    legacy = encode_with_mido(notes, profile)
+    direct = encode_direct(notes, profile)
+    assert legacy == direct, "Direct encoder output differs from mido"
+
+    t_mido = best_of(lambda: encode_with_mido(notes, profile), repeats)
+    t_direct = best_of(lambda: encode_direct(notes, profile), repeats)
+    t_full = best_of(lambda: encode_midi({"chords": notes}, 120, MOOD, rng=random.Random(1)), repeats)
+
+    per_10k = 10_000 / count * 1000
+    print(f"{count} notes, {len(direct)} bytes, output identical to mido")
+    print(f"  mido messages : {t_mido * per_10k:8.2f} ms / 10k notes")
+    print(f"  direct encoder: {t_direct * per_10k:8.2f} ms / 10k notes ({t_mido / t_direct:.0f}x)")
+    print(f"  encode_midi incl. humanize: {t_full * per_10k:8.2f} ms / 10k notes")
+
+if __name__ == "__main__":
+    main()
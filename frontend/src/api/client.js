@@ -4,6 +4,22 @@ import axios from 'axios';
 // Allow runtime configuration of API URL via window object (common pattern for embedded apps)
 export const API_BASE_URL = window.PLUGIN_API_URL || import.meta.env.VITE_API_URL || 'http://127.0.0.1:8000';
 
+// The parts each track_id was issued for. Downloads by id only happen while the
+// track still holds exactly these arrays; any edit or re-rolled layer uploads instead.
+const issuedParts = new Map();
+const MAX_ISSUED_TRACKS = 32;
+
+const rememberTrack = (data) => {
+    if (!data || !data.track_id) return;
+    issuedParts.set(data.track_id, { chords: data.chords, melody: data.melody, bass: data.bass });
+    if (issuedParts.size > MAX_ISSUED_TRACKS) issuedParts.delete(issuedParts.keys().next().value);
+};
+
+const partsUnchanged = (data) => {
+    const issued = issuedParts.get(data.track_id);
+    return !!issued && issued.chords === data.chords && issued.melody === data.melody && issued.bass === data.bass;
+};
+
 export const generateChords = async (params) => {
     // Ensure integer fields are actually integers to prevent 422 errors
     // Also ensure required fields have defaults
@@ -18,6 +34,7 @@ export const generateChords = async (params) => {
     };
     try {
         const response = await axios.post(`${API_BASE_URL}/generate/chords`, safeParams);
+        rememberTrack(response.data);
         return response.data;
     } catch (error) {
         console.error("Error generating chords:", error);
@@ -40,7 +57,8 @@ export const getTopHits = async () => {
 
 export const generateTopHit = async (templateId) => {
     try {
-        const response = await axios.post(`${API_BASE_URL}/generate/top-hit`, { template_id: templateId });
+        // GET so the browser can cache / revalidate templates backed by MIDI files
+        const response = await axios.get(`${API_BASE_URL}/generate/top-hit/${encodeURIComponent(templateId)}`);
         return response.data;
     } catch (error) {
         console.error("Error generating top hit:", error);
@@ -48,6 +66,25 @@ export const generateTopHit = async (templateId) => {
     }
 };
 
+// layer: "melody", "bass" or "rhythm". Returns only the new part ("chords" for rhythm),
+// to be merged into the existing track so its chords stay as they are. The reply's
+// track_id is null, so merging it also drops the id of the track as generated.
+export const regenerateLayer = async (layer, data, complexity = 0.5) => {
+    try {
+        const response = await axios.post(`${API_BASE_URL}/generate/${layer}`, {
+            raw_progression: data.raw_progression || data.progression,
+            key: data.key,
+            scale: data.scale,
+            mood: data.mood || "neutral",
+            complexity
+        });
+        return response.data;
+    } catch (error) {
+        console.error(`Error regenerating ${layer}:`, error);
+        throw error;
+    }
+};
+
 export const downloadMidi = async (data) => {
     try {
         // Handle both legacy (array) and new (object) formats
@@ -57,7 +94,7 @@ export const downloadMidi = async (data) => {
              payload = { progression: data, tempo: 120 };
         } else {
              payload = {
-                 progression: data.progression,
+                 progression: data.raw_progression || data.progression,
                  chords: data.chords,
                  melody: data.melody,
                  bass: data.bass,
@@ -67,9 +104,25 @@ export const downloadMidi = async (data) => {
              };
         }
 
-        const response = await axios.post(`${API_BASE_URL}/download/midi`, payload, {
-            responseType: 'blob', // Important for file download
-        });
+        // Generated tracks are stored server-side for a while: fetch by id, no re-upload
+        let response = null;
+        if (data.track_id && partsUnchanged(data)) {
+            const params = { tempo: data.tempo || undefined };
+            for (const [part, program] of Object.entries(data.instruments || {})) {
+                if (Number.isInteger(Number(program))) params[part] = Number(program);
+            }
+            response = await axios.get(`${API_BASE_URL}/download/midi/${data.track_id}`, {
+                params,
+                responseType: 'blob',
+                validateStatus: () => true,
+            });
+            if (response.status !== 200) response = null; // Evicted or expired: upload the events instead
+        }
+        if (!response) {
+            response = await axios.post(`${API_BASE_URL}/download/midi`, payload, {
+                responseType: 'blob', // Important for file download
+            });
+        }
         
         // Create a link to download the file
         const url = window.URL.createObjectURL(new Blob([response.data]));
@@ -134,10 +134,10 @@ const PianoRoll = ({ data, onPlay, isPlaying, tempo = 120 }) => {
               totalDuration = Math.max(totalDuration, e.time + e.duration);
           });
       }
-  } else if (data.progression) {
+  } else if (data.raw_progression || data.progression) {
        // Fallback to legacy progression in object
       let currentBeat = 0;
-      data.progression.forEach(chord => {
+      (data.raw_progression || data.progression).forEach(chord => {
           chord.notes.forEach(note => {
               events.push({
                   note: note,
@@ -0,0 +1,116 @@
+import sys
+import os
+import asyncio
+
+# Add the backend directory to sys.path so 'app' module can be found
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+import httpx
+
+from app import main
+from app.utils.admission import ADMISSION, AdmissionController, Overloaded, admit_request
+from app.utils.metrics import ADMISSION_REJECTED, ADMISSION_STATE, reset_metrics
+
+SETTINGS = {"key": "C", "scale": "minor", "mood": "pop", "length": 4}
+
+def test_controller():
+    print("Testing admission controller...")
+
+    async def scenario():
+        controller = AdmissionController(concurrency=2, max_queue=2, max_wait=0.1)
+        await controller.acquire()
+        await controller.acquire()
+        assert controller.active == 2
+
+        # Queued in order, the slot handed over on release
+        first = asyncio.ensure_future(controller.acquire())
+        second = asyncio.ensure_future(controller.acquire())
+        await asyncio.sleep(0)
+        assert len(controller.waiters) == 2
+        try:
+            await controller.acquire()
+            raise AssertionError("queue should be full")
+        except Overloaded as exc:
+            assert exc.reason == "queue_full"
+        controller.release()
+        await first
+        assert not second.done() and controller.active == 2
+
+        # Waiting too long
+        try:
+            await second
+            raise AssertionError("wait should time out")
+        except Overloaded as exc:
+            assert exc.reason == "queue_timeout"
+        assert not controller.waiters
+
+        # A cancelled waiter leaves the queue and holds no slot
+        third = asyncio.ensure_future(controller.acquire())
+        await asyncio.sleep(0)
+        third.cancel()
+        await asyncio.gather(third, return_exceptions=True)
+        assert not controller.waiters
+        controller.release()
+        controller.release()
+        assert controller.active == 0
+
+    asyncio.run(scenario())
+    print("✅ Bounded FIFO queue with a wait limit")
+
+def test_load_shedding():
+    print("Testing load shedding...")
+    reset_metrics()
+    limits = (ADMISSION.concurrency, ADMISSION.max_queue, ADMISSION.max_wait)
+    run_job = main.run_job
+
+    async def slow_run_job(fn, *args, **kwargs):
+        await admit_request() # Hold the slot while "working"
+        await asyncio.sleep(0.3)
+        return await run_job(fn, *args, **kwargs)
+
+    async def burst(count):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            responses = await asyncio.gather(*(client.post("/generate/chords", json=SETTINGS) for _ in range(count)))
+            health = await client.get("/metrics") # Never limited
+            assert health.status_code == 200
+            return responses, health.text
+
+    main.run_job = slow_run_job
+    ADMISSION.concurrency, ADMISSION.max_queue, ADMISSION.max_wait = 1, 1, 0.1
+    try:
+        responses, metrics = asyncio.run(burst(3))
+        statuses = sorted(response.status_code for response in responses)
+        assert statuses == [200, 503, 503], statuses
+        shed = [response for response in responses if response.status_code == 503]
+        assert all(response.headers["retry-after"] == "1" for response in shed)
+        assert sorted(response.json()["reason"] for response in shed) == ["queue_full", "queue_timeout"]
+        assert ADMISSION_REJECTED.series == {("queue_full",): 1, ("queue_timeout",): 1}
+        assert 'admission_wait_seconds_count{outcome="admitted"} 1' in metrics
+        assert 'admission_requests{state="queued"} 0' in metrics
+        assert 'http_request_duration_seconds_count{method="POST",route="/generate/chords",status="503"} 2' in metrics
+
+        # Precomputed responses never wait for a slot
+        async def static_burst():
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                responses = await asyncio.gather(
+                    client.post("/generate/chords", json=SETTINGS),
+                    *(client.get("/generate/top-hit/despacito_latin") for _ in range(5)),
+                )
+                return [response.status_code for response in responses]
+        assert asyncio.run(static_burst()) == [200] * 6
+
+        # A long enough queue lets the burst through, in turn
+        ADMISSION.max_queue, ADMISSION.max_wait = 4, 5
+        responses, _ = asyncio.run(burst(3))
+        assert [response.status_code for response in responses] == [200] * 3
+        assert ADMISSION.active == 0 and ADMISSION_STATE.series[("active",)] == 0
+    finally:
+        main.run_job = run_job
+        ADMISSION.concurrency, ADMISSION.max_queue, ADMISSION.max_wait = limits
+    print("✅ Overflow gets 503 + Retry-After, queue metrics exported")
+
+if __name__ == "__main__":
+    test_controller()
+    test_load_shedding()
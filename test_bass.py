@@ -0,0 +1,61 @@
+import sys
+import os
+import random
+
+# Add the backend directory to sys.path so 'app' module can be found
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+import numpy as np
+
+from app.logic.bass import BASS_STYLES, BASS_LOW, BASS_HIGH, bass_roots, render_bass
+
+PROGRESSION = [
+    {"notes": [60, 64, 67], "duration": 4.0},
+    {"notes": [57, 60, 64], "duration": 2.0},
+    {"notes": [], "duration": 2.0}, # Rest
+    {"notes": [65, 69, 72], "duration": 4.0},
+]
+
+def test_every_style_stays_inside_its_chord():
+    print("Testing bass styles...")
+    for style in BASS_STYLES:
+        bass = render_bass(PROGRESSION, style, rng=random.Random(1))
+        assert len(bass) > 0, f"{style}: no notes"
+        assert bass == render_bass(PROGRESSION, style, rng=random.Random(1)), f"{style}: not reproducible"
+        assert list(bass.time) == sorted(bass.time), f"{style}: events out of order"
+
+        ends = bass.time + bass.duration
+        for start, end in [(0.0, 4.0), (4.0, 6.0), (8.0, 12.0)]:
+            inside = (bass.time >= start) & (bass.time < end)
+            assert (ends[inside] <= end + 1e-9).all(), f"{style}: note rings past its chord"
+        assert not ((bass.time >= 6.0) & (bass.time < 8.0)).any(), f"{style}: played over a rest"
+    print("✅ All bass styles render")
+
+def test_style_templates():
+    chords = [{"notes": [48, 52, 55], "duration": 4.0}] * 4
+
+    offbeat = render_bass(chords, "offbeat", rng=random.Random(0))
+    assert np.allclose(offbeat.time % 1.0, 0.5), "House bass sits on the offbeats"
+    assert (offbeat.pitch[1::2] == 48).all(), "Every second offbeat jumps an octave"
+
+    funk = render_bass(chords[:1], "funk", rng=random.Random(0))
+    assert funk.time.tolist() == [0.0, 1.0, 1.5, 2.5, 2.75]
+
+    pop = render_bass(chords, "root_fifth", rng=random.Random(0))
+    assert len(pop) == 32 and set(pop.pitch.tolist()) <= {36, 43, 48}
+
+    # A short chord drops template steps that don't fit (the 3+3+2 third hit)
+    dotted = render_bass([{"notes": [48], "duration": 2.0}] * 50, "dotted", rng=random.Random(0))
+    assert set((dotted.time % 2.0).tolist()) == {0.0, 1.5}
+
+def test_bass_range():
+    roots = np.arange(0, 128)
+    notes = bass_roots(roots)
+    assert notes.min() >= BASS_LOW and notes.max() <= BASS_HIGH
+    assert ((notes - roots) % 12 == 0).all()
+    assert bass_roots(roots, "deep").max() <= 36
+
+if __name__ == "__main__":
+    test_every_style_stays_inside_its_chord()
+    test_style_templates()
+    test_bass_range()
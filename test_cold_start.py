@@ -0,0 +1,145 @@
+import sys
+import os
+import marshal
+import subprocess
+import tempfile
+import time
+
+# Add the backend directory to sys.path so 'app' module can be found
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend")
+sys.path.append(BACKEND_DIR)
+
+from fastapi.testclient import TestClient
+
+from app import main
+from app.logic.chords import CHORD_TABLE
+from app.utils import snapshot, workers
+
+# Import-time budgets (milliseconds); the total depends mostly on fastapi/numpy and the machine
+IMPORT_BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", "3000"))
+APP_IMPORT_BUDGET_MS = float(os.getenv("APP_IMPORT_BUDGET_MS", "150"))
+
+# Only needed once a request uses them
+LAZY_MODULES = ("mido", "pyinstrument", "app.utils.midi_export")
+
+def import_times():
+    """{module: (self_us, cumulative_us)} from python -X importtime -c 'import app.main'."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        times[name.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+def test_import_budget():
+    print("Testing import time...")
+    times = import_times()
+    for module in LAZY_MODULES:
+        assert module not in times, f"{module} is imported at startup"
+
+    total_ms = times["app.main"][1] / 1000
+    app_ms = sum(self_us for name, (self_us, _) in times.items() if name == "app" or name.startswith("app.")) / 1000
+    print(f"   import app.main: {total_ms:.0f} ms ({app_ms:.0f} ms in app modules)")
+    assert total_ms < IMPORT_BUDGET_MS, total_ms
+    assert app_ms < APP_IMPORT_BUDGET_MS, app_ms
+    print("✅ Startup imports stay lazy and within budget")
+
+def test_logic_layer():
+    print("Testing the generation layer's imports...")
+    result = subprocess.run(
+        [sys.executable, "-c", "import sys, app.logic.chords; print(' '.join(sys.modules))"],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+    )
+    loaded = result.stdout.split()
+    for module in ("app.utils.log", "app.utils.deadline", "fastapi", "starlette"):
+        assert module not in loaded, f"app.logic.chords imports {module}"
+    print("✅ Generation doesn't depend on the HTTP layer")
+
+def test_snapshot_round_trip():
+    print("Testing table snapshot...")
+    path = os.path.join(tempfile.mkdtemp(), "tables.snapshot")
+    assert snapshot.load_snapshot(path) is None
+
+    tables = main.build_tables()
+    snapshot.save_snapshot(tables, path)
+    assert snapshot.load_snapshot(path) == tables
+
+    # Anything the tables derive from changed: ignored
+    with open(path, "wb") as f:
+        marshal.dump({"fingerprint": "stale", "tables": tables}, f)
+    assert snapshot.load_snapshot(path) is None
+
+    with open(path, "wb") as f:
+        f.write(b"not a snapshot")
+    assert snapshot.load_snapshot(path) is None
+    print("✅ Snapshot loads back, stale or corrupt files are ignored")
+
+def test_nested_templates_invalidate():
+    print("Testing snapshot fingerprint...")
+    app_dir = snapshot.APP_DIR
+    snapshot.APP_DIR = tempfile.mkdtemp()
+    try:
+        nested = os.path.join(snapshot.APP_DIR, "data", "midi", "Pack", "Sub")
+        os.makedirs(nested)
+        path = os.path.join(nested, "template.mid")
+        with open(path, "wb") as f:
+            f.write(b"MThd")
+        before = snapshot.fingerprint()
+        with open(path, "wb") as f:
+            f.write(b"MThd changed")
+        assert snapshot.fingerprint() != before
+    finally:
+        snapshot.APP_DIR = app_dir
+    print("✅ Nested template files are part of the fingerprint")
+
+def test_workers_load_snapshot():
+    print("Testing worker warm-up from the snapshot...")
+    tables = main.build_tables()
+    tables["chord_table"][("sentinel", 1, "triad")] = (0,)
+    path = snapshot.SNAPSHOT_PATH
+    snapshot.SNAPSHOT_PATH = os.path.join(tempfile.mkdtemp(), "tables.snapshot")
+    try:
+        snapshot.save_snapshot(tables)
+        CHORD_TABLE.clear()
+        workers.warm_worker() # The pool initializer
+        assert CHORD_TABLE[("sentinel", 1, "triad")] == (0,)
+    finally:
+        snapshot.SNAPSHOT_PATH = path
+        CHORD_TABLE.pop(("sentinel", 1, "triad"), None)
+    print("✅ Pool workers load the chord table from the snapshot")
+
+def test_ready_endpoint():
+    print("Testing /ready...")
+    processes = workers.WORKER_PROCESSES
+    workers.WORKER_PROCESSES = 0
+    main.READINESS["tables"] = None
+    try:
+        client = TestClient(main.app) # No lifespan: the first /ready call starts the warm-up
+        response = client.get("/ready")
+        assert response.status_code == 503
+        assert response.headers["retry-after"] == "1"
+        assert response.json()["checks"]["tables"] is False
+
+        deadline = time.monotonic() + 30
+        while response.status_code != 200 and time.monotonic() < deadline:
+            time.sleep(0.05)
+            response = client.get("/ready")
+        assert response.status_code == 200, response.json()
+        assert response.json()["tables"] in ("snapshot", "built")
+        assert client.get("/generate/top-hit/despacito_latin").status_code == 200
+    finally:
+        workers.WORKER_PROCESSES = processes
+    print("✅ /ready answers 503 until the tables are warm")
+
+if __name__ == "__main__":
+    test_import_budget()
+    test_logic_layer()
+    test_snapshot_round_trip()
+    test_nested_templates_invalidate()
+    test_workers_load_snapshot()
+    test_ready_endpoint()
@@ -0,0 +1,222 @@
+import sys
+import os
+import asyncio
+import json
+import pickle
+import tempfile
+import time
+
+# Add the backend directory to sys.path so 'app' module can be found
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from fastapi.testclient import TestClient
+
+from app import main
+from app.logic.chords import generate_track_data
+from app.utils import workers
+from app.utils.deadline import BUDGET, Budget, Cancelled, Connection, checkpoint
+from app.utils.metrics import CANCELLED, reset_metrics
+
+client = TestClient(main.app)
+
+SETTINGS = {"key": "C", "scale": "minor", "mood": "pop", "length": 4}
+
+def slow_pool_job(marker):
+    """Runs in a worker process; notes where it stopped."""
+    try:
+        for step in range(100):
+            time.sleep(0.05)
+            checkpoint(f"step{step}")
+    except Cancelled as exc:
+        with open(marker, "w") as f:
+            f.write(f"{exc.reason} {exc.stage}")
+        raise
+    with open(marker, "w") as f:
+        f.write("finished")
+
+def test_checkpoints_between_stages():
+    print("Testing stage checkpoints...")
+    stages = []
+
+    class StopAt(Budget):
+        def check(self, stage):
+            stages.append(stage)
+            if stage == "melody":
+                self.cancel("disconnected")
+            super().check(stage)
+
+    token = BUDGET.set(StopAt())
+    try:
+        generate_track_data("C", "minor", "pop", 4, seed=1)
+        raise AssertionError("generation should stop")
+    except Cancelled as exc:
+        assert (exc.reason, exc.stage) == ("disconnected", "melody")
+    finally:
+        BUDGET.reset(token)
+    assert stages == ["progression", "rhythm", "melody"]
+
+    checkpoint("anything") # No request: no-op
+    exc = pickle.loads(pickle.dumps(Cancelled("deadline", "bass"))) # Comes back from worker processes
+    assert (exc.reason, exc.stage) == ("deadline", "bass")
+    print("✅ Generation stops at the next stage boundary")
+
+def test_deadline():
+    print("Testing request deadlines...")
+    reset_metrics()
+    assert client.post("/generate/chords", json=SETTINGS, headers={"X-Deadline-Ms": "5000"}).status_code == 200
+
+    response = client.post("/generate/chords", json=SETTINGS, headers={"X-Deadline-Ms": "0.001"})
+    assert response.status_code == 504 and response.json()["stage"] == "queued"
+    response = client.post("/generate/chords", json={**SETTINGS, "deadline_ms": 0.001})
+    assert response.status_code == 504
+    # The tighter budget wins
+    response = client.post("/generate/chords", json={**SETTINGS, "deadline_ms": 5000}, headers={"X-Deadline-Ms": "0.001"})
+    assert response.status_code == 504
+    assert client.post("/generate/chords", json=SETTINGS, headers={"X-Deadline-Ms": "soon"}).status_code == 200
+
+    # Streams end early instead of failing
+    response = client.post("/generate/chords/stream", json={**SETTINGS, "count": 4, "deadline_ms": 0.001})
+    assert response.status_code == 200 and response.text == ""
+
+    assert CANCELLED.series[("deadline", "queued")] == 4
+    assert 'generation_cancelled_total{reason="deadline",stage="queued"} 4' in client.get("/metrics").text
+    print("✅ Blown budgets answer 504 and are counted")
+
+def test_client_disconnect():
+    print("Testing cancellation on disconnect...")
+    reset_metrics()
+    outcome = {}
+    run_job = main.run_job
+
+    def slow_job(fn, *args, **kwargs):
+        time.sleep(0.3) # Client leaves meanwhile
+        try:
+            checkpoint("progression")
+        except Cancelled as exc:
+            outcome["stopped"] = exc.reason
+            raise
+        return fn(*args, **kwargs)
+
+    async def slow_run_job(fn, *args, **kwargs):
+        return await run_job(slow_job, fn, *args, **kwargs)
+
+    async def disconnecting_request():
+        body = json.dumps(SETTINGS).encode()
+        received = []
+        async def receive():
+            if not received:
+                received.append(True)
+                return {"type": "http.request", "body": body, "more_body": False}
+            await asyncio.sleep(0.1) # The job has started by now
+            return {"type": "http.disconnect"}
+
+        messages = []
+        async def send(message):
+            messages.append(message)
+
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+            "scheme": "http", "path": "/generate/chords", "raw_path": b"/generate/chords", "query_string": b"",
+            "root_path": "", "headers": [(b"content-type", b"application/json"), (b"host", b"test")],
+            "client": ("test", 1), "server": ("test", 80),
+        }
+        start = time.perf_counter()
+        await main.app(scope, receive, send)
+        elapsed = time.perf_counter() - start
+        await asyncio.sleep(0.4) # Let the abandoned job reach its checkpoint
+        return messages[0]["status"], elapsed
+
+    main.run_job = slow_run_job
+    try:
+        status, elapsed = asyncio.run(disconnecting_request())
+    finally:
+        main.run_job = run_job
+
+    assert status == 499
+    assert elapsed < 0.25, elapsed # Didn't wait for the job
+    assert outcome == {"stopped": "disconnected"}
+    assert CANCELLED.series[("disconnected", "worker")] == 1
+    print("✅ A disconnected client's work is abandoned")
+
+def test_disconnect_not_polled():
+    print("Testing disconnect detection...")
+    run_job = main.run_job
+    reads = []
+
+    async def slow_run_job(fn, *args, **kwargs):
+        await asyncio.sleep(0.3)
+        return await run_job(fn, *args, **kwargs)
+
+    async def connected_request():
+        body = json.dumps(SETTINGS).encode()
+        finished = asyncio.Event()
+        async def receive():
+            reads.append(True)
+            if len(reads) == 1:
+                return {"type": "http.request", "body": body, "more_body": False}
+            await finished.wait() # The client stays connected
+            return {"type": "http.disconnect"}
+
+        messages = []
+        async def send(message):
+            messages.append(message)
+
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+            "scheme": "http", "path": "/generate/chords", "raw_path": b"/generate/chords", "query_string": b"",
+            "root_path": "", "headers": [(b"content-type", b"application/json"), (b"host", b"test")],
+            "client": ("test", 1), "server": ("test", 80),
+        }
+        await main.app(scope, receive, send)
+        finished.set()
+        return messages[0]["status"]
+
+    main.run_job = slow_run_job
+    try:
+        assert asyncio.run(connected_request()) == 200
+    finally:
+        main.run_job = run_job
+    assert len(reads) == 2, len(reads) # The body, then one read waiting for a disconnect
+    print("✅ Disconnects are awaited, not polled")
+
+def test_pool_job_cancelled_on_disconnect():
+    print("Testing disconnects reaching worker processes...")
+    marker = os.path.join(tempfile.mkdtemp(), "stopped")
+
+    async def receive():
+        await asyncio.sleep(0.3)
+        return {"type": "http.disconnect"}
+
+    async def disconnected_request():
+        token = BUDGET.set(Budget(connection=Connection(receive))) # No deadline: only the disconnect can stop it
+        try:
+            await workers.run_job(slow_pool_job, marker)
+            raise AssertionError("the request should be cancelled")
+        except Cancelled as exc:
+            assert exc.reason == "disconnected"
+        finally:
+            BUDGET.reset(token)
+
+    workers.start_pool(1)
+    try:
+        asyncio.run(disconnected_request())
+        # The worker writes the marker, then its result comes back and frees the slot
+        for _ in range(100):
+            if os.path.exists(marker) and len(workers._free_slots) == workers.CANCEL_SLOTS:
+                break
+            time.sleep(0.02)
+        with open(marker) as f:
+            reason, stage = f.read().split()
+        # Stopped at the first checkpoint after the disconnect, not 5 s later
+        assert reason == "disconnected" and int(stage[len("step"):]) < 50, (reason, stage)
+        assert len(workers._free_slots) == workers.CANCEL_SLOTS # Its cancel slot is free again
+    finally:
+        workers.stop_pool()
+    print("✅ Pool jobs stop at their next checkpoint when the client disconnects")
+
+if __name__ == "__main__":
+    test_checkpoints_between_stages()
+    test_deadline()
+    test_client_disconnect()
+    test_disconnect_not_polled()
+    test_pool_job_cancelled_on_disconnect()
@@ -0,0 +1,71 @@
+import sys
+import os
+import json
+
+# Add the backend directory to sys.path so 'app' module can be found
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.logic.top_hits import get_top_hits_templates
+from app.utils.http_cache import accepts_encoding
+
+client = TestClient(app)
+
+def test_top_hits_list_is_precomputed():
+    print("Testing precomputed top hits responses...")
+    response = client.get("/api/top-hits", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.json() == get_top_hits_templates()
+    etag = response.headers["etag"]
+    assert etag.startswith('"') and "max-age" in response.headers["cache-control"]
+
+    # Same bytes every time, and the ETag doesn't depend on the encoding
+    plain = client.get("/api/top-hits", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    assert plain.headers["etag"] == etag
+    assert json.loads(plain.content) == get_top_hits_templates()
+
+    not_modified = client.get("/api/top-hits", headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304 and not_modified.content == b""
+    assert client.get("/api/top-hits", headers={"If-None-Match": '"stale"'}).status_code == 200
+    print("✅ Top hits list served with ETag / 304")
+
+def test_midi_backed_templates_are_cached():
+    first = client.get("/generate/top-hit/titanic")
+    assert first.status_code == 200 and first.json()["mood"] == "Cinematic"
+    etag = first.headers["etag"]
+    assert client.get("/generate/top-hit/titanic", headers={"If-None-Match": etag}).status_code == 304
+
+    # The POST route serves the same precomputed body
+    post = client.post("/generate/top-hit", json={"template_id": "titanic"})
+    assert post.headers["etag"] == etag and post.json() == first.json()
+
+def test_generated_templates_are_not_cached():
+    generated = [t["id"] for t in get_top_hits_templates() if not os.path.exists(os.path.join("backend", "app", "data", "midi", f"{t['id']}.mid"))]
+    template_id = next(t for t in generated if t not in ("despacito_latin", "shape_of_you", "alan_walker_faded"))
+    response = client.post("/generate/top-hit", json={"template_id": template_id})
+    assert response.status_code == 200
+    assert "etag" not in response.headers and response.headers["cache-control"] == "no-store"
+
+def test_refused_gzip():
+    print("Testing Accept-Encoding q-values...")
+    assert accepts_encoding("gzip") and accepts_encoding("br, gzip;q=0.5")
+    assert not accepts_encoding("gzip;q=0") and not accepts_encoding("GZIP; Q=0.0, identity")
+    assert not accepts_encoding("*, gzip;q=0") and not accepts_encoding(None)
+
+    for encoding, gzipped in (("gzip;q=0", False), ("gzip;q=0, identity", False), ("identity, gzip;q=0.5", True)):
+        cached = client.get("/api/top-hits", headers={"Accept-Encoding": encoding})
+        generated = client.post("/generate/chords", json={"key": "C", "scale": "minor", "mood": "pop", "length": 8}, headers={"Accept-Encoding": encoding})
+        for response in (cached, generated):
+            assert response.status_code == 200
+            assert (response.headers.get("content-encoding") == "gzip") == gzipped, (encoding, response.headers)
+    print("✅ gzip;q=0 gets an uncompressed body")
+
+if __name__ == "__main__":
+    test_top_hits_list_is_precomputed()
+    test_midi_backed_templates_are_cached()
+    test_generated_templates_are_not_cached()
+    test_refused_gzip()
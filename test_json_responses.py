@@ -0,0 +1,68 @@
+import sys
+import os
+import json
+
+# Add the backend directory to sys.path so 'app' module can be found
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.logic.notes import NoteArray
+from app.utils import responses
+
+client = TestClient(app)
+
+def test_quantize_to_resolution():
+    print("Testing quantized JSON events...")
+    notes = NoteArray([60, 62, 64], [0.018945198745707534, 1.0 / 3.0, 2.9999], [0.95, 0.0001, 0.123456789], [80, 90, 100])
+    q = notes.quantize(960)
+    assert (np.abs(q.time * 960 - np.round(q.time * 960)) < 0.05).all(), "Times should sit on the 1/960 grid"
+    assert q.duration.min() > 0, "Tiny notes keep at least one step"
+    assert all(len(repr(t).split(".")[1]) <= 4 for t in q.time.tolist() + q.duration.tolist())
+    assert notes.to_events(960) == q.to_events()
+
+def test_track_response_is_compact():
+    settings = {"key": "C", "scale": "minor", "mood": "lo_fi", "length": 8, "seed": 5}
+    response = client.post("/generate/chords", json=settings)
+    data = json.loads(response.content)
+    assert "raw_progression" in data and "progression" not in data, "The progression alias is only sent in compat mode"
+    assert all(len(repr(e["time"])) <= 8 for e in data["chords"]), "Event times should be quantized"
+
+    # Compat mode brings the alias back
+    responses.PROGRESSION_ALIAS = True
+    try:
+        data = client.post("/generate/chords", json=settings).json()
+        assert data["progression"] == data["raw_progression"]
+    finally:
+        responses.PROGRESSION_ALIAS = False
+    print("✅ Track responses are compact")
+
+def test_stdlib_fallback_matches_orjson():
+    content = {"notes": [{"note": 60, "time": 0.25, "name": "Cmaj7 – ♯11"}], "seed": None}
+    fast = responses.dumps(content)
+    orjson, responses.orjson = responses.orjson, None
+    try:
+        assert responses.dumps(content) == fast
+    finally:
+        responses.orjson = orjson
+
+def test_seed_range():
+    print("Testing seed bounds...")
+    settings = {"key": "C", "scale": "minor", "mood": "pop", "length": 4}
+    for seed in (2**63, 2**70, -1):
+        assert client.post("/generate/chords", json={**settings, "seed": seed}).status_code == 422, seed
+        assert client.post("/generate/chords/batch", json={**settings, "seed": seed, "count": 2}).status_code == 422, seed
+
+    track = client.post("/generate/chords", json={**settings, "seed": responses.MAX_SEED})
+    assert track.status_code == 200 and track.json()["seed"] == responses.MAX_SEED
+    layer = {"raw_progression": track.json()["raw_progression"], "key": "C", "scale": "minor", "seed": 2**64}
+    assert client.post("/generate/melody", json=layer).status_code == 422
+    print("✅ Seeds outside 64 bits get a 422, not a 500")
+
+if __name__ == "__main__":
+    test_quantize_to_resolution()
+    test_track_response_is_compact()
+    test_stdlib_fallback_matches_orjson()
+    test_seed_range()
@@ -0,0 +1,83 @@
+import sys
+import os
+import io
+import json
+import asyncio
+import logging
+
+# Add the backend directory to sys.path so 'app' module can be found
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.utils import workers
+from app.utils.log import JsonFormatter, RequestContextFilter, access_logger, request_context, parse_levels
+
+client = TestClient(app)
+
+def capture(logger: logging.Logger) -> io.StringIO:
+    stream = io.StringIO()
+    handler = logging.StreamHandler(stream)
+    handler.addFilter(RequestContextFilter())
+    handler.setFormatter(JsonFormatter())
+    logger.addHandler(handler)
+    return stream
+
+def test_access_log_json():
+    print("Testing JSON access log lines...")
+    stream = capture(access_logger)
+    try:
+        response = client.post("/generate/chords", json={"key": "C", "scale": "minor", "mood": "pop"}, headers={"X-Request-ID": "abc-123"})
+    finally:
+        access_logger.removeHandler(access_logger.handlers[-1])
+    assert response.status_code == 200
+    assert response.headers["x-request-id"] == "abc-123"
+
+    entry = json.loads(stream.getvalue().strip().splitlines()[-1])
+    assert entry["request_id"] == "abc-123"
+    assert entry["path"] == "/generate/chords" and entry["status"] == 200
+    for name in ("progression", "rhythm", "melody", "bass", "serialize"):
+        assert name in entry["stages"], name
+    assert entry["duration_ms"] >= sum(entry["stages"].values()) * 0.5
+
+    # Unusable ids are replaced with a generated one
+    response = client.get("/", headers={"X-Request-ID": "bad id\nwith newline"})
+    assert len(response.headers["x-request-id"]) == 32
+    print("✅ Access log carries request id and stage timings")
+
+def test_debug_is_lazy():
+    print("Testing disabled debug logging is free...")
+    calls = []
+    class Expensive:
+        def __str__(self):
+            calls.append(1)
+            return "expensive"
+
+    logger = logging.getLogger("app.logic.chords")
+    assert not logger.isEnabledFor(logging.DEBUG)
+    logger.debug("value=%s", Expensive())
+    assert calls == []
+
+    assert parse_levels("app.logic=DEBUG, app.main = warning,,bogus") == {"app.logic": "DEBUG", "app.main": "WARNING"}
+    print("✅ Disabled levels skip formatting")
+
+def test_worker_timings():
+    print("Testing stage timings from worker processes...")
+    async def run():
+        with request_context("pool-req") as timings:
+            await workers.run_job(workers.generate_track_job, key="C", scale="minor", mood="pop", length=4)
+            return timings
+
+    workers.start_pool(1)
+    try:
+        timings = asyncio.run(run())
+    finally:
+        workers.stop_pool()
+    assert {"progression", "rhythm", "melody", "bass"} <= set(timings)
+    print("✅ Worker stage timings reach the request")
+
+if __name__ == "__main__":
+    test_access_log_json()
+    test_debug_is_lazy()
+    test_worker_timings()
@@ -0,0 +1,90 @@
+import sys
+import os
+import re
+import time
+
+# Add the backend directory to sys.path so 'app' module can be found
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.logic.moods import MOOD_PROFILES
+from app.utils.metrics import Histogram, HistogramFamily, LENGTH_LABELS, mood_label, length_label, render_metrics, reset_metrics
+
+client = TestClient(app)
+
+def sample(text: str, name: str, **labels) -> float:
+    """Value of the first sample of `name` carrying all the given labels."""
+    for line in text.splitlines():
+        if line.startswith(name + "{") and all(f'{k}="{v}"' in line for k, v in labels.items()):
+            return float(line.rsplit(" ", 1)[1])
+    raise AssertionError(f"No sample {name} {labels}")
+
+def test_metrics_endpoint():
+    print("Testing /metrics...")
+    reset_metrics()
+    client.post("/generate/chords", json={"key": "C", "scale": "minor", "mood": "pop", "length": 4}, headers={"Accept-Encoding": "gzip"})
+    track = client.post("/generate/chords", json={"key": "C", "scale": "minor", "mood": "pop", "length": 4}).json()
+    client.post("/download/midi", json={"chords": track["chords"], "melody": track["melody"], "mood": "pop"})
+    client.get("/generate/top-hit/despacito_latin")
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    text = response.text
+
+    assert sample(text, "http_request_duration_seconds_count", method="POST", route="/generate/chords", status="200") == 2
+    # Route templates, not raw paths
+    assert sample(text, "http_request_duration_seconds_count", route="/generate/top-hit/{template_id}") == 1
+    assert "despacito_latin" not in text
+
+    for stage in ("progression", "rhythm", "melody", "bass", "serialize"):
+        assert sample(text, "generation_stage_duration_seconds_count", stage=stage, mood="pop", length="4") == 2, stage
+    for stage in ("humanize", "midi_encode"):
+        assert sample(text, "generation_stage_duration_seconds_count", stage=stage, mood="pop") >= 1, stage
+    assert sample(text, "generation_stage_duration_seconds_count", stage="compress", mood="pop", length="4") >= 1
+
+    # Buckets are cumulative and end at the count
+    buckets = [float(v) for v in re.findall(r'http_request_duration_seconds_bucket\{method="POST",route="/generate/chords",status="200",le="[^"]+"\} (\S+)', text)]
+    assert buckets == sorted(buckets) and buckets[-1] == 2
+    print("✅ /metrics exposes request and stage histograms")
+
+def test_bounded_labels():
+    print("Testing label bounds...")
+    assert mood_label("Lo-Fi") == "lo_fi"
+    assert mood_label("'; DROP TABLE") == "other"
+    assert mood_label(None) == "none"
+    assert length_label(8) == "8" and length_label(7) == "other" and length_label(10**9) == "other"
+
+    reset_metrics()
+    for length in range(1, 40):
+        client.post("/generate/chords", json={"mood": f"made-up-{length}", "length": length})
+    text = render_metrics()
+    moods = set(re.findall(r'generation_stage_duration_seconds_count\{[^}]*mood="([^"]*)"', text))
+    lengths = set(re.findall(r'generation_stage_duration_seconds_count\{[^}]*length="([^"]*)"', text))
+    assert moods <= set(MOOD_PROFILES) | {"other", "none"}, moods
+    assert lengths <= {str(n) for n in LENGTH_LABELS} | {"other", "none"}, lengths
+    assert len(lengths) <= len(LENGTH_LABELS) + 2
+    print("✅ Label values stay bounded")
+
+def test_histogram_cost():
+    print("Testing histogram observation cost...")
+    histogram = Histogram((0.001, 0.01, 0.1))
+    for value in (0.0005, 0.001, 0.05, 5.0):
+        histogram.observe(value)
+    assert histogram.counts == [2, 0, 1, 1] and histogram.count == 4
+
+    family = HistogramFamily("x", "x", ("a",), (0.001, 0.01, 0.1))
+    start = time.perf_counter()
+    for i in range(100_000):
+        family.observe(0.002, "a")
+    per_observation = (time.perf_counter() - start) / 100_000
+    print(f"   {per_observation * 1e6:.2f} µs per observation")
+    assert per_observation < 20e-6
+    print("✅ Observations are cheap")
+
+if __name__ == "__main__":
+    test_metrics_endpoint()
+    test_bounded_labels()
+    test_histogram_cost()
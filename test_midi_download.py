@@ -0,0 +1,50 @@
+import sys
+import os
+import io
+
+# Add the backend directory to sys.path so 'app' module can be found
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+import mido
+from fastapi.testclient import TestClient
+
+from app.main import app
+
+client = TestClient(app)
+
+def test_download_is_served_from_memory():
+    print("Testing in-memory MIDI download...")
+    track = client.post("/generate/chords", json={"key": "C", "scale": "minor", "mood": "lo_fi", "length": 4, "seed": 1}).json()
+    response = client.post("/download/midi", json={
+        "chords": track["chords"], "melody": track["melody"], "bass": track["bass"], "tempo": track["tempo"], "mood": "lo_fi"
+    })
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "audio/midi"
+    assert response.headers["content-disposition"] == 'attachment; filename="track.mid"'
+
+    mid = mido.MidiFile(file=io.BytesIO(response.content))
+    assert [t.name for t in mid.tracks] == ["Chords", "Melody", "Bass"]
+    print("✅ MIDI download OK")
+
+def test_legacy_progression_download():
+    response = client.post("/download/midi", json={"progression": [{"notes": [60, 64, 67]}, {"notes": [62, 65, 69]}]})
+    assert response.status_code == 200
+    mid = mido.MidiFile(file=io.BytesIO(response.content))
+    assert len([m for m in mid.tracks[0] if m.type == "note_on"]) == 6
+
+def test_tempo_is_validated():
+    print("Testing download tempo bounds...")
+    body = {"progression": [{"notes": [60, 64, 67]}]}
+    for tempo in (0, -5, 3, 401, 100000):
+        assert client.post("/download/midi", json={**body, "tempo": tempo}).status_code == 422, tempo
+    for tempo in (20, 400):
+        response = client.post("/download/midi", json={**body, "tempo": tempo})
+        assert response.status_code == 200
+        mid = mido.MidiFile(file=io.BytesIO(response.content))
+        assert round(mido.tempo2bpm(next(m.tempo for m in mid.tracks[0] if m.type == "set_tempo"))) == tempo
+    print("✅ Tempos outside MIN_TEMPO..MAX_TEMPO get a 422")
+
+if __name__ == "__main__":
+    test_download_is_served_from_memory()
+    test_legacy_progression_download()
+    test_tempo_is_validated()
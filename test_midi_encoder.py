@@ -0,0 +1,61 @@
+import sys
+import os
+import io
+import random
+
+# Add the backend directory to sys.path so 'app' module can be found
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+import mido
+from mido.midifiles.midifiles import encode_variable_int as mido_variable_int
+
+from app.logic.chords import generate_track_data
+from app.utils.midi_export import encode_midi, encode_variable_int, create_midi_file
+
+def resave_with_mido(data: bytes) -> bytes:
+    out = io.BytesIO()
+    mido.MidiFile(file=io.BytesIO(data)).save(file=out)
+    return out.getvalue()
+
+def test_variable_length_quantities():
+    for value in [0, 1, 127, 128, 255, 16383, 16384, 2097151, 2097152, 0x0FFFFFFF]:
+        assert encode_variable_int(value) == bytes(mido_variable_int(value)), f"VLQ mismatch for {value}"
+
+def test_encoded_file_round_trips_through_mido():
+    print("Testing direct MIDI encoder against mido...")
+    for i, mood in enumerate(["lo_fi", "cinematic", "uk_drill", "walker"]):
+        track = generate_track_data("C", "minor", mood, length=8, complexity=0.8, seed=i)
+        data = encode_midi(track, tempo=128, mood=mood, rng=random.Random(i))
+
+        # mido reads it and writes back exactly the same bytes (running status, deltas, meta events)
+        assert resave_with_mido(data) == data, f"{mood}: encoder output is not what mido would write"
+
+        mid = mido.MidiFile(file=io.BytesIO(data))
+        assert mid.ticks_per_beat == 480
+        assert [t.name for t in mid.tracks] == ["Chords", "Melody", "Bass"]
+        for part, midi_track in zip(["chords", "melody", "bass"], mid.tracks):
+            note_ons = [m for m in midi_track if m.type == "note_on"]
+            assert len(note_ons) == len(track[part]), f"{mood}: {part} note count differs"
+        tempo = next(m.tempo for m in mid.tracks[0] if m.type == "set_tempo")
+        assert round(mido.tempo2bpm(tempo)) == 128
+    print("✅ Encoder output matches mido")
+
+def test_long_gaps_and_block_chords():
+    # Deltas that need 3-4 byte variable-length quantities
+    events = [{"note": 60, "time": t, "duration": 1.0, "velocity": 100} for t in [0.0, 300.0, 9000.0]]
+    data = encode_midi({"melody": events}, mood="neutral", rng=random.Random(0))
+    assert resave_with_mido(data) == data
+    assert len([m for m in mido.MidiFile(file=io.BytesIO(data)).tracks[0] if m.type == "note_on"]) == 3
+
+    # Legacy block chords still work through the file-path API
+    path = create_midi_file([{"notes": [60, 64, 67]}, {"notes": [62, 65, 69], "duration": 2}], mood="pop")
+    try:
+        mid = mido.MidiFile(path)
+        assert len([m for m in mid.tracks[0] if m.type == "note_on"]) == 6
+    finally:
+        os.unlink(path)
+
+if __name__ == "__main__":
+    test_variable_length_quantities()
+    test_encoded_file_round_trips_through_mido()
+    test_long_gaps_and_block_chords()
@@ -0,0 +1,58 @@
+import sys
+import os
+
+# Add the backend directory to sys.path so 'app' module can be found
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from app.logic.chords import PROGRESSIONS, GENRE_RHYTHMS, VOICINGS, CHORD_EXTENSIONS, generate_track_data
+from app.logic.moods import MOOD_PROFILES, resolve_mood
+
+def test_ui_mood_names_resolve():
+    print("Testing mood strings resolve to profiles...")
+    cases = {
+        "uk_drill": "uk_drill",
+        "Drill": "uk_drill",
+        "Lo-Fi": "lo_fi",
+        "Chill Hop": "lo_fi",
+        "R&B / Soul": "rnb",
+        "Future Bass": "future_bass",
+        "Drum & Bass": "dnb",
+        "Dark Trap": "dark_trap",
+        "Faded": "walker",
+        "Progressive House": "progressive_house",
+        "Deep House": "house",
+        "Punk Rock": "rock",
+        "Disco": "funk",
+        "something else": "default",
+        "": "default",
+    }
+    for mood, expected in cases.items():
+        assert resolve_mood(mood).name == expected, f"{mood!r} resolved to {resolve_mood(mood).name}"
+
+    # Unknown moods follow the scale
+    assert resolve_mood("something else", "dorian").name == "boom_bap"
+    print("✅ Mood strings resolve correctly")
+
+def test_profiles_reference_known_tables():
+    for name, profile in MOOD_PROFILES.items():
+        assert profile.templates in PROGRESSIONS, f"{name}: unknown templates {profile.templates}"
+        assert profile.rhythm_set == "basic" or profile.rhythm_set in GENRE_RHYTHMS, f"{name}: unknown rhythm set {profile.rhythm_set}"
+        assert profile.voicing is None or profile.voicing in VOICINGS, f"{name}: unknown voicing {profile.voicing}"
+
+        extensions = set(profile.default_extensions)
+        for options in profile.extensions.values():
+            extensions.update(options)
+        if profile.complex_extension:
+            extensions.add(profile.complex_extension)
+        assert extensions <= set(CHORD_EXTENSIONS), f"{name}: unknown extensions {extensions - set(CHORD_EXTENSIONS)}"
+
+def test_every_profile_generates():
+    for name in MOOD_PROFILES:
+        data = generate_track_data("C", "minor", name, length=4, complexity=0.9, seed=3)
+        assert data["chords"], f"{name}: no chord events"
+        assert data["bass"], f"{name}: no bass events"
+
+if __name__ == "__main__":
+    test_ui_mood_names_resolve()
+    test_profiles_reference_known_tables()
+    test_every_profile_generates()
@@ -0,0 +1,67 @@
+import sys
+import os
+import random
+
+# Add the backend directory to sys.path so 'app' module can be found
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from app.logic.notes import NoteArray, jsonable_track
+from app.logic.patterns import apply_rhythm, apply_rhythms
+from app.logic.chords import generate_track_data
+
+EVENTS = [
+    {"note": 60, "time": 1.0, "duration": 2.0, "velocity": 90},
+    {"note": 64, "time": 0.0, "duration": 4.0, "velocity": 200},
+    {"note": 67, "time": 3.5, "duration": 1.0, "velocity": 0},
+]
+
+def test_round_trip_and_velocity_clamp():
+    print("Testing NoteArray round trip...")
+    notes = NoteArray.from_events(EVENTS)
+    assert len(notes) == 3
+    events = notes.to_events()
+    assert [e["note"] for e in events] == [60, 64, 67]
+    assert [e["velocity"] for e in events] == [90, 127, 1], "Velocities should be clamped to 1-127"
+    assert all(type(e["note"]) is int and type(e["time"]) is float for e in events), "Events must be plain JSON types"
+    print("✅ Round trip OK")
+
+def test_shift_clip_concat_sort():
+    notes = NoteArray.from_events(EVENTS)
+
+    shifted = notes.shift(-2.0)
+    assert shifted.time.tolist() == [0.0, 0.0, 1.5], "Shift should never move events before 0"
+
+    clipped = notes.clip(3.0)
+    assert clipped.pitch.tolist() == [60, 64]
+    assert clipped.duration.tolist() == [2.0, 3.0], "Clip should cut notes off at the length"
+
+    both = NoteArray.concat([notes, notes.shift(4.0)])
+    assert len(both) == 6
+    assert both.sort().time.tolist() == [0.0, 1.0, 3.5, 4.0, 5.0, 7.5]
+
+def test_batched_rhythms_match_single_chords():
+    jobs = [([60, 64, 67], "pop_strum", 4.0, 0.0, 0.0), ([62, 65, 69], "house_piano", 2.0, 0.0, 4.0), ([57, 60, 64], "walker_arp", 4.0, 0.0, 6.0)]
+    batch = apply_rhythms(jobs, rng=random.Random(1))
+    single = [apply_rhythm(notes, rhythm, length, strum, rng=random.Random(1)) for notes, rhythm, length, strum, _ in jobs]
+    assert len(batch) == sum(len(s) for s in single), "Batch should render the same number of events"
+
+    # Every event stays inside its chord (allowing for the timing humanization at the edges)
+    for notes, _, length, _, offset in jobs:
+        mask = (batch.time >= offset + 0.05) & (batch.time < offset + length - 0.05)
+        assert set(batch.pitch[mask].tolist()) <= set(notes) | {notes[0] + 12}
+
+def test_track_parts_are_note_arrays():
+    track = generate_track_data("C", "minor", "lo_fi", length=8, seed=4)
+    for part in ("chords", "melody", "bass"):
+        assert isinstance(track[part], NoteArray), f"{part} should be a NoteArray"
+
+    out = jsonable_track(track)
+    assert isinstance(out["chords"], list) and out["chords"][0].keys() == {"note", "time", "duration", "velocity"}
+    assert isinstance(track["chords"], NoteArray), "jsonable_track must not modify the original"
+    assert list(track["chords"].time) == sorted(track["chords"].time), "Chord events should be in playback order"
+
+if __name__ == "__main__":
+    test_round_trip_and_velocity_clamp()
+    test_shift_clip_concat_sort()
+    test_batched_rhythms_match_single_chords()
+    test_track_parts_are_note_arrays()
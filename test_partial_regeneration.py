@@ -0,0 +1,60 @@
+import sys
+import os
+
+# Add the backend directory to sys.path so 'app' module can be found
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.logic.chords import generate_track_data, regenerate_layer
+from app.utils.responses import response_track
+
+client = TestClient(app)
+
+def test_layers_keep_progression():
+    print("Testing partial regeneration (library)...")
+    track = generate_track_data("A", "minor", "pop", length=8, seed=5)
+    progression = track["raw_progression"]
+    before = [dict(chord, notes=list(chord["notes"])) for chord in progression]
+
+    for layer, part in (("melody", "melody"), ("bass", "bass"), ("rhythm", "chords")):
+        result = regenerate_layer(layer, progression, "A", "minor", "pop", seed=9)
+        assert set(result) == {"key", "scale", "mood", "seed", part}, layer
+        assert len(result[part]) > 0, layer
+        assert max(event["time"] for event in result[part]) < sum(c["duration"] for c in progression), layer
+
+        again = regenerate_layer(layer, progression, "A", "minor", "pop", seed=9)
+        assert again[part] == result[part], layer
+        other = regenerate_layer(layer, progression, "A", "minor", "pop", seed=10)
+        assert other[part] != result[part], layer
+
+    assert progression == before
+    print("✅ Each layer is reproducible from its seed and leaves the progression alone")
+
+def test_layer_endpoints():
+    print("Testing /generate/melody, /generate/bass, /generate/rhythm...")
+    track = response_track(generate_track_data("D", "minor", "lo_fi", length=4, seed=3))
+    payload = {
+        "raw_progression": track["raw_progression"],
+        "key": track["key"], "scale": track["scale"], "mood": track["mood"],
+        "seed": 11
+    }
+    for layer, part in (("melody", "melody"), ("bass", "bass"), ("rhythm", "chords")):
+        response = client.post(f"/generate/{layer}", json=payload)
+        assert response.status_code == 200, response.text
+        data = response.json()
+        assert data["seed"] == 11 and data["key"] == "D"
+        assert data["track_id"] is None # Clears the stored track's id once merged into it
+        assert isinstance(data[part], list) and data[part], layer
+        assert "raw_progression" not in data
+
+    columns = client.post("/generate/bass", json=payload, headers={"Accept": "application/vnd.midi-columns+json"}).json()
+    assert set(columns["bass"]) == {"note", "dt", "dur", "vel"}
+
+    assert client.post("/generate/melody", json={"key": "C", "scale": "minor"}).status_code == 422
+    print("✅ Layer endpoints return only the regenerated part")
+
+if __name__ == "__main__":
+    test_layers_keep_progression()
+    test_layer_endpoints()
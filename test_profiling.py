@@ -0,0 +1,87 @@
+import sys
+import os
+import json
+import pstats
+import tempfile
+
+# Add the backend directory to sys.path so 'app' module can be found
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.utils import profiling
+
+client = TestClient(app)
+
+SETTINGS = {"key": "C", "scale": "minor", "mood": "techno", "length": 4}
+
+def profiled(**overrides):
+    """Turns profiling on for a test (writing to a temp dir) and returns the dir."""
+    out = tempfile.mkdtemp()
+    profiling.PROFILING_ENABLED = True
+    profiling.PROFILE_DIR = out
+    profiling.PROFILE_INTERVAL = 3600
+    profiling.PROFILE_KEY = ""
+    profiling.PROFILER = "cprofile"
+    profiling._last_profile = float("-inf")
+    for name, value in overrides.items():
+        setattr(profiling, name, value)
+    return out
+
+def teardown_function():
+    profiling.PROFILING_ENABLED = False
+
+def test_profile_one_request():
+    print("Testing on-demand cProfile...")
+    out = profiled()
+    response = client.post("/generate/chords", json=SETTINGS, headers={"X-Profile": "1", "X-Request-ID": "prof-1"})
+    assert response.status_code == 200
+    name = response.headers["x-profile"]
+    assert name.endswith("-prof-1.prof")
+
+    stats = pstats.Stats(os.path.join(out, name))
+    assert any(func[2] == "generate_track_data" for func in stats.stats)
+
+    meta = json.load(open(os.path.join(out, name[:-len(".prof")] + ".json")))
+    assert meta["request_id"] == "prof-1" and meta["path"] == "/generate/chords"
+    assert meta["job"] == "generate_track_job" and meta["kwargs"]["mood"] == "techno"
+
+    # Rate limited: the next request runs normally
+    response = client.post("/generate/chords?profile=1", json=SETTINGS)
+    assert response.status_code == 200
+    assert response.headers["x-profile"] == "rate-limited"
+    assert len(os.listdir(out)) == 2
+    print("✅ Profile and request metadata written, then rate limited")
+
+def test_profiling_is_opt_in():
+    print("Testing profiling gates...")
+    out = profiled(PROFILING_ENABLED=False)
+    assert "x-profile" not in client.post("/generate/chords", json=SETTINGS, headers={"X-Profile": "1"}).headers
+
+    profiled(PROFILE_DIR=out, PROFILE_KEY="s3cret")
+    assert "x-profile" not in client.post("/generate/chords", json=SETTINGS).headers
+    assert "x-profile" not in client.post("/generate/chords", json=SETTINGS, headers={"X-Profile": "1"}).headers
+    assert os.listdir(out) == []
+
+    response = client.post("/generate/chords?profile=s3cret", json=SETTINGS)
+    assert response.headers["x-profile"].endswith(".prof")
+    print("✅ Needs PROFILING=1, a flag and the key when one is set")
+
+def test_sampling_profiler():
+    if not profiling.sampling_available():
+        print("pyinstrument not installed, skipping")
+        return
+    print("Testing speedscope output...")
+    out = profiled(PROFILER="auto")
+    response = client.post("/generate/chords/batch", json={**SETTINGS, "count": 16}, headers={"X-Profile": "1"})
+    name = response.headers["x-profile"]
+    assert name.endswith(".speedscope.json")
+    speedscope = json.load(open(os.path.join(out, name)))
+    assert speedscope["profiles"] and "/generate/chords/batch" in speedscope["name"]
+    print("✅ Sampling profile written as speedscope JSON")
+
+if __name__ == "__main__":
+    for test in (test_profile_one_request, test_profiling_is_opt_in, test_sampling_profiler):
+        test()
+        teardown_function()
@@ -0,0 +1,54 @@
+import sys
+import os
+
+# Add the backend directory to sys.path so 'app' module can be found
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from app.logic.scales import SCALES, NOTE_INDEX, get_note_index, get_scale_intervals, normalize_scale
+from app.logic.chords import CHORD_TABLE, build_chord_table, get_extended_chord_notes
+
+def test_modes():
+    print("Testing added modes...")
+    assert get_scale_intervals("mixolydian") == [0, 2, 4, 5, 7, 9, 10]
+    assert get_scale_intervals("locrian") == [0, 1, 3, 5, 6, 8, 10]
+    assert get_scale_intervals("melodic_minor") == [0, 2, 3, 5, 7, 9, 11]
+    # Mixolydian is major with a flat 7th
+    assert [a - b for a, b in zip(SCALES["mixolydian"], SCALES["major"])] == [0, 0, 0, 0, 0, 0, -1]
+    # G mixolydian I7 is a dominant seventh: G B D F
+    assert get_extended_chord_notes("G", "mixolydian", 1, octave=4, extension="7") == [67, 71, 74, 77]
+    # Locrian's tonic triad is diminished
+    assert get_extended_chord_notes("B", "locrian", 1, octave=3) == [59, 62, 65]
+    print("✅ Mixolydian, locrian and melodic minor intervals")
+
+def test_note_index():
+    print("Testing note lookup...")
+    for name, index in (("C", 0), ("C#", 1), ("Db", 1), ("Eb", 3), ("F#", 6), ("Gb", 6), ("Bb", 10), ("B", 11)):
+        assert NOTE_INDEX[name] == index and get_note_index(name) == index, name
+    assert len(NOTE_INDEX) == 17
+    assert get_note_index("H") == 0 # Unknown names fall back to C
+    print("✅ Sharps and flats resolve through NOTE_INDEX")
+
+def test_scale_fallback():
+    print("Testing scale name fallback...")
+    assert normalize_scale("Major") == "major" and normalize_scale("DORIAN") == "dorian"
+    assert normalize_scale("x1") == "minor"
+    assert get_scale_intervals("Major") == SCALES["major"]
+    assert get_scale_intervals("made-up") == SCALES["minor"]
+    assert get_extended_chord_notes("C", "Major", 1) == get_extended_chord_notes("C", "major", 1)
+    assert get_extended_chord_notes("C", "x1", 5, extension="7") == get_extended_chord_notes("C", "minor", 5, extension="7")
+
+    # Client-supplied scale names can't grow the table
+    build_chord_table()
+    size = len(CHORD_TABLE)
+    for n in range(200):
+        for degree in range(1, 8):
+            get_extended_chord_notes("C", f"x{n}", degree, extension="7")
+            get_extended_chord_notes("C", "MiNoR", degree)
+    assert len(CHORD_TABLE) == size
+    assert {scale for scale, _, _ in CHORD_TABLE} <= set(SCALES)
+    print("✅ Case and unknown scales map onto the table's keys")
+
+if __name__ == "__main__":
+    test_modes()
+    test_note_index()
+    test_scale_fallback()
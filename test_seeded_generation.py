@@ -0,0 +1,83 @@
+import sys
+import os
+import random
+
+# Add the backend directory to sys.path so 'app' module can be found
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from fastapi.testclient import TestClient
+
+from app.main import app, MAX_BATCH_SIZE
+from app.logic.chords import generate_track_data, generate_track_data_cached, generate_track_data_batch
+
+def test_same_seed_same_track():
+    print("Testing seeded generation is reproducible...")
+    for mood in ["drill", "lo_fi", "walker", "house", "Random"]:
+        a = generate_track_data("C", "minor", mood if mood != "Random" else None, length=8, complexity=0.9, seed=1234)
+        b = generate_track_data("C", "minor", mood if mood != "Random" else None, length=8, complexity=0.9, seed=1234)
+        assert a == b, f"Seeded output differs for mood {mood}"
+        assert a["seed"] == 1234
+
+    # Unseeded calls report the seed they used, which reproduces them
+    c = generate_track_data(None, None, None, length=4)
+    d = generate_track_data(None, None, None, length=4, seed=c["seed"])
+    assert c == d, "Reported seed does not reproduce the track"
+    print("✅ Seeded generation is reproducible")
+
+def test_generation_leaves_global_rng_alone():
+    random.seed(99)
+    expected = [random.random() for _ in range(3)]
+    random.seed(99)
+    generate_track_data("A", "minor", "pop", length=4, seed=7)
+    assert [random.random() for _ in range(3)] == expected, "Seeded generation consumed the global RNG"
+
+def test_cache_returns_same_result():
+    a = generate_track_data_cached("D", "dorian", "jazz", length=4, complexity=0.51, seed=5)
+    b = generate_track_data_cached("D", "dorian", "jazz", length=4, complexity=0.49, seed=5)
+    assert a == b, "Complexity values in the same bucket should share a cache entry"
+    assert a is not b, "Cache should hand out copies of the top-level dict"
+
+    a["source"] = "Generated"
+    c = generate_track_data_cached("D", "dorian", "jazz", length=4, complexity=0.5, seed=5)
+    assert "source" not in c, "Mutating a cached result leaked into the cache"
+
+def test_batch_shares_settings_and_reproduces():
+    tracks = generate_track_data_batch(6, None, None, None, length=4, seed=11)
+    assert len(tracks) == 6
+    assert len({(t["key"], t["scale"], t["mood"]) for t in tracks}) == 1, "Batch should resolve Random settings once"
+    assert len({t["seed"] for t in tracks}) == 6, "Each variation needs its own seed"
+
+    # Any single variation can be regenerated from its reported settings + seed
+    pick = tracks[3]
+    again = generate_track_data(pick["key"], pick["scale"], pick["mood"], length=4, seed=pick["seed"])
+    assert again == pick
+
+    assert generate_track_data_batch(6, None, None, None, length=4, seed=11) == tracks
+
+def test_batch_endpoint():
+    print("Testing /generate/chords/batch...")
+    client = TestClient(app)
+    settings = {"key": "Random", "scale": "Random", "mood": "Random", "length": 4, "seed": 11}
+    response = client.post("/generate/chords/batch", json={**settings, "count": 5})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["count"] == 5 and body["seed"] == 11 and len(body["tracks"]) == 5
+    assert all(track["source"] == "Generated" for track in body["tracks"])
+
+    # The same variations as the library call
+    expected = generate_track_data_batch(5, None, None, None, length=4, seed=11)
+    assert [(t["key"], t["scale"], t["mood"], t["seed"]) for t in body["tracks"]] == [(t["key"], t["scale"], t["mood"], t["seed"]) for t in expected]
+    assert client.post("/generate/chords/batch", json={**settings, "count": 5}).json() == body
+
+    assert client.post("/generate/chords/batch", json={"length": 4}).json()["count"] == 8
+    assert client.post("/generate/chords/batch", json={**settings, "count": MAX_BATCH_SIZE}).json()["count"] == MAX_BATCH_SIZE
+    for count in (0, -1, MAX_BATCH_SIZE + 1):
+        assert client.post("/generate/chords/batch", json={**settings, "count": count}).status_code == 422, count
+    print("✅ Batches return exactly count tracks, or 422")
+
+if __name__ == "__main__":
+    test_same_seed_same_track()
+    test_generation_leaves_global_rng_alone()
+    test_cache_returns_same_result()
+    test_batch_shares_settings_and_reproduces()
+    test_batch_endpoint()
@@ -0,0 +1,106 @@
+import sys
+import os
+import asyncio
+
+# Add the backend directory to sys.path so 'app' module can be found
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+import httpx
+
+from app import main
+from app.utils.metrics import SINGLE_FLIGHT, render_metrics, reset_metrics
+from app.utils.singleflight import SingleFlight
+
+def test_single_flight():
+    print("Testing single-flight...")
+    reset_metrics()
+    calls = []
+
+    async def compute(value, gate):
+        calls.append(value)
+        await gate.wait()
+        if value == "boom":
+            raise ValueError(value)
+        return {"value": value}
+
+    async def scenario():
+        flights = SingleFlight("test")
+        gate = asyncio.Event()
+        waiters = [asyncio.ensure_future(flights.do("a", compute, "a", gate)) for _ in range(5)]
+        other = asyncio.ensure_future(flights.do("b", compute, "b", gate))
+        await asyncio.sleep(0)
+        gate.set()
+        results = await asyncio.gather(*waiters, other)
+        assert all(result is results[0] for result in results[:5])
+        assert results[5] == {"value": "b"}
+        assert calls == ["a", "b"] and not flights.flights
+
+        # Finished flights aren't cached
+        assert await flights.do("a", compute, "a", gate) == {"value": "a"}
+        assert calls == ["a", "b", "a"]
+
+        # Exceptions reach every waiter
+        failing = [asyncio.ensure_future(flights.do("boom", compute, "boom", gate)) for _ in range(3)]
+        for outcome in await asyncio.gather(*failing, return_exceptions=True):
+            assert isinstance(outcome, ValueError)
+
+        # One waiter going away doesn't cancel the work for the rest; the last one does
+        gate = asyncio.Event()
+        first, second = (asyncio.ensure_future(flights.do("c", compute, "c", gate)) for _ in range(2))
+        await asyncio.sleep(0)
+        task = flights.flights["c"].task
+        first.cancel()
+        await asyncio.sleep(0)
+        assert not task.cancelled() and "c" in flights.flights
+        second.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        assert task.cancelled() and "c" not in flights.flights
+
+    asyncio.run(scenario())
+    assert SINGLE_FLIGHT.series[("test", "leader")] == 5
+    assert SINGLE_FLIGHT.series[("test", "coalesced")] == 7
+    print("✅ Concurrent calls share one computation")
+
+def test_endpoints_coalesce():
+    print("Testing coalesced endpoints...")
+    reset_metrics()
+    jobs = []
+    run_job = main.run_job
+
+    async def slow_run_job(fn, *args, **kwargs):
+        jobs.append(fn.__name__)
+        await asyncio.sleep(0.05) # Keep the flight open while the duplicates arrive
+        return await run_job(fn, *args, **kwargs)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            seeded = {"key": "C", "scale": "minor", "mood": "pop", "length": 4, "seed": 7}
+            responses = await asyncio.gather(*(client.post("/generate/chords", json=seeded) for _ in range(6)))
+            assert all(response.status_code == 200 for response in responses)
+            assert all(response.json() == responses[0].json() for response in responses)
+            assert responses[0].json()["source"] == "Generated"
+
+            # Unseeded requests are independent
+            await asyncio.gather(*(client.post("/generate/chords", json={**seeded, "seed": None}) for _ in range(3)))
+
+            responses = await asyncio.gather(*(client.get("/generate/top-hit/canon") for _ in range(4)))
+            assert all(response.json() == responses[0].json() for response in responses)
+            return (await client.get("/metrics")).text
+
+    main.run_job = slow_run_job
+    try:
+        metrics = asyncio.run(scenario())
+    finally:
+        main.run_job = run_job
+
+    assert jobs == ["generate_track_job"] * 4 + ["top_hit_job"], jobs
+    assert 'singleflight_requests_total{flight="chords",result="leader"} 1' in metrics
+    assert 'singleflight_requests_total{flight="chords",result="coalesced"} 5' in metrics
+    assert 'singleflight_requests_total{flight="top_hit",result="coalesced"} 3' in metrics
+    assert "# TYPE singleflight_requests_total counter" in render_metrics()
+    print("✅ Seeded chords and top-hit requests coalesce, unseeded ones don't")
+
+if __name__ == "__main__":
+    test_single_flight()
+    test_endpoints_coalesce()
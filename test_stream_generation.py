@@ -0,0 +1,82 @@
+import sys
+import os
+import json
+import asyncio
+import threading
+import time
+from functools import partial
+
+# Add the backend directory to sys.path so 'app' module can be found
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.logic.chords import generate_track_data_batch
+from app.utils.workers import stream_jobs
+
+client = TestClient(app)
+
+def test_stream_matches_batch():
+    print("Testing NDJSON batch streaming...")
+    settings = {"key": "A", "scale": "minor", "mood": "pop", "length": 4, "seed": 21, "count": 12}
+    lines = []
+    with client.stream("POST", "/generate/chords/stream", json=settings) as response:
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        for line in response.iter_lines():
+            if line:
+                lines.append(json.loads(line))
+
+    assert sorted(t["index"] for t in lines) == list(range(12))
+    batch = generate_track_data_batch(12, "A", "minor", "pop", length=4, seed=21)
+    for track in lines:
+        expected = batch[track["index"]]
+        assert track["seed"] == expected["seed"]
+        assert [e["note"] for e in track["chords"]] == expected["chords"].pitch.tolist()
+    print("✅ Streamed tracks match the batch endpoint")
+
+in_flight = 0
+peak = 0
+lock = threading.Lock()
+
+def slow_job(i):
+    global in_flight, peak
+    with lock:
+        in_flight += 1
+        peak = max(peak, in_flight)
+    time.sleep(0.01)
+    with lock:
+        in_flight -= 1
+    return i
+
+def test_bounded_concurrency_and_backpressure():
+    submitted = []
+
+    def jobs():
+        for i in range(20):
+            submitted.append(i)
+            yield partial(slow_job, i)
+
+    async def consume():
+        results = []
+        async for result in stream_jobs(jobs(), concurrency=3):
+            # A slow reader: only `concurrency` jobs are ever ahead of it
+            assert len(submitted) <= len(results) + 1 + 3
+            results.append(result)
+            await asyncio.sleep(0.005)
+        return results
+
+    results = asyncio.run(consume())
+    assert sorted(results) == list(range(20))
+    assert peak <= 3
+
+    async def stop_early():
+        async for result in stream_jobs(jobs(), concurrency=2):
+            break
+    submitted.clear()
+    asyncio.run(stop_early())
+    assert len(submitted) <= 3, "Jobs shouldn't be pulled after the reader stops"
+
+if __name__ == "__main__":
+    test_stream_matches_batch()
+    test_bounded_concurrency_and_backpressure()
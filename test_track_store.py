@@ -0,0 +1,118 @@
+import sys
+import os
+import io
+import tempfile
+import time
+
+import mido
+
+# Add the backend directory to sys.path so 'app' module can be found
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.logic.notes import NoteArray
+from app.utils.track_store import TRACKS, TrackStore, StoredTrack, stored_track
+
+client = TestClient(app)
+
+def note_counts(data: bytes):
+    midi = mido.MidiFile(file=io.BytesIO(data))
+    return [sum(1 for msg in track if msg.type == "note_on" and msg.velocity > 0) for track in midi.tracks]
+
+SETTINGS = {"key": "D", "scale": "minor", "mood": "pop", "length": 4, "seed": 11}
+
+def test_download_by_track_id():
+    print("Testing download by track id...")
+    track = client.post("/generate/chords", json=SETTINGS).json()
+    track_id = track["track_id"]
+    assert client.post("/generate/chords", json=SETTINGS).json()["track_id"] == track_id # Content id
+    assert client.post("/generate/chords", json={**SETTINGS, "seed": 12}).json()["track_id"] != track_id
+
+    response = client.get(f"/download/midi/{track_id}")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "audio/midi"
+    assert response.content.startswith(b"MThd")
+    assert client.get(f"/download/midi/{track_id}").content == response.content # Encoded once
+    assert len(TRACKS.get(track_id).midi) == 1
+
+    # Same notes as uploading the events
+    uploaded = client.post("/download/midi", json={key: track[key] for key in ("chords", "melody", "bass", "tempo", "mood")})
+    assert note_counts(uploaded.content) == note_counts(response.content) # Humanized timing differs
+
+    slower = client.get(f"/download/midi/{track_id}", params={"tempo": 90, "bass": 34})
+    assert slower.status_code == 200 and slower.content != response.content
+    assert len(TRACKS.get(track_id).midi) == 2
+
+    for params in ({"tempo": 0}, {"tempo": -5}, {"tempo": 100000}, {"bass": 128}, {"chords": -1}, {"melody": "piano"}):
+        assert client.get(f"/download/midi/{track_id}", params=params).status_code == 422, params
+
+    # Another gunicorn worker: nothing in its memory, the track comes from the shared directory
+    TRACKS.entries.clear()
+    other = client.get(f"/download/midi/{track_id}")
+    assert other.status_code == 200 and note_counts(other.content) == note_counts(response.content)
+
+    missing = client.get("/download/midi/0123456789abcdef01234567")
+    assert missing.status_code == 404
+    print("✅ Generated tracks download by id, encoded once")
+
+def test_lru_and_ttl():
+    print("Testing track store bounds...")
+    def track(n):
+        return StoredTrack(f"t{n}", {"chords": NoteArray((60 + n,), (0,), (1,), (80,))}, 120, "pop")
+
+    store = TrackStore(max_size=3, ttl=60)
+    for n in range(3):
+        store.put(track(n))
+    assert store.get("t0") is not None # Now most recently used
+    store.put(track(3))
+    assert store.get("t1") is None and len(store) == 3
+    assert [key for key in store.entries] == ["t2", "t0", "t3"]
+
+    # Putting a stored id again keeps the stored copy (and its encoded files)
+    store.get("t3").midi[(120, 0, 0, 33)] = b"MThd"
+    assert store.put(track(3)).midi == {(120, 0, 0, 33): b"MThd"}
+
+    store = TrackStore(max_size=3, ttl=0.05)
+    store.put(track(0))
+    time.sleep(0.06)
+    assert store.get("t0") is None and len(store) == 0
+
+    parts = {"chords": [{"note": 60, "time": 0.0, "duration": 1.0, "velocity": 80}], "tempo": 120, "mood": "pop"}
+    assert stored_track(parts).id == stored_track({**parts}).id
+    assert stored_track(parts).id != stored_track({**parts, "tempo": 121}).id
+    print("✅ Bounded LRU with expiry, content-derived ids")
+
+def test_shared_directory():
+    print("Testing the shared track store directory...")
+    directory = tempfile.mkdtemp()
+    track = stored_track(client.post("/generate/chords", json=SETTINGS).json())
+    first, second = TrackStore(8, 60, directory), TrackStore(8, 60, directory)
+    first.put(track)
+    loaded = second.get(track.id)
+    assert loaded is not None and (loaded.tempo, loaded.mood) == (track.tempo, track.mood)
+    assert loaded.parts == track.parts
+    assert second.get(track.id) is loaded # Kept in memory from then on
+
+    for track_id in ("../" + track.id, track.id.upper(), "0" * 24):
+        assert second.get(track_id) is None, track_id
+
+    # Expired files are ignored, then swept
+    stale = time.time() - 120
+    os.utime(os.path.join(directory, track.id + ".track"), (stale, stale))
+    assert TrackStore(8, 60, directory).get(track.id) is None
+    store = TrackStore(8, 60, directory, max_files=2)
+    ids = []
+    for seed in (1, 2, 3):
+        ids.append(store.put(stored_track(client.post("/generate/chords", json={**SETTINGS, "seed": seed}).json())).id)
+        age = time.time() - 10 + seed
+        os.utime(os.path.join(directory, ids[-1] + ".track"), (age, age))
+    store.sweep()
+    assert sorted(os.listdir(directory)) == sorted(f"{track_id}.track" for track_id in ids[1:])
+    print("✅ Tracks are shared through the store directory")
+
+if __name__ == "__main__":
+    test_download_by_track_id()
+    test_lru_and_ttl()
+    test_shared_directory()
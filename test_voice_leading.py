@@ -0,0 +1,68 @@
+import sys
+import os
+import itertools
+import random
+import time
+
+# Add the backend directory to sys.path so 'app' module can be found
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+import numpy as np
+
+from app.logic.chords import generate_progression
+from app.logic.voice_leading import DRIFT_WEIGHT, VOICING_SPAN, candidate_voicings, optimize_voice_leading, transition_costs, voicing_key
+
+PROGRESSION = [[48, 60, 63, 67], [53, 65, 68, 72], [55, 67, 71, 74, 77], [48, 60, 63, 67, 70]]
+
+def path_cost(progression, voiced):
+    keys = [voicing_key(notes) for notes in progression]
+    total = 0.0
+    for t, notes in enumerate(voiced):
+        cands = candidate_voicings(*keys[t])
+        c = int(np.flatnonzero((cands == notes[1:]).all(axis=1))[0])
+        total += DRIFT_WEIGHT * abs(cands[c].mean() - np.mean(progression[t][1:]))
+        if t:
+            total += transition_costs(keys[t - 1], keys[t])[prev, c]
+        prev = c
+    return total
+
+def test_voicings_keep_bass_and_pitch_classes():
+    print("Testing global voice leading...")
+    voiced = optimize_voice_leading(PROGRESSION)
+    for original, notes in zip(PROGRESSION, voiced):
+        assert notes[0] == original[0], "Bass note must not move"
+        assert sorted(n % 12 for n in notes[1:]) == sorted(n % 12 for n in original[1:])
+        assert all(original[0] < n <= original[0] + VOICING_SPAN for n in notes[1:])
+    print("✅ Voicings keep the chord")
+
+def test_viterbi_finds_the_cheapest_path():
+    keys = [voicing_key(notes) for notes in PROGRESSION]
+    candidates = [candidate_voicings(*key) for key in keys]
+    brute = min(
+        path_cost(PROGRESSION, [[p[0]] + c.tolist() for p, c in zip(PROGRESSION, combo)])
+        for combo in itertools.product(*candidates)
+    )
+    assert abs(path_cost(PROGRESSION, optimize_voice_leading(PROGRESSION)) - brute) < 1e-9
+
+def test_optimal_mode_is_fast_enough_for_every_request():
+    progressions = [
+        [c["notes"] for c in generate_progression("C", "minor", "jazz", 16, 0.8, rng=random.Random(seed))["progression"]][:16]
+        for seed in range(10)
+    ]
+    for p in progressions:
+        optimize_voice_leading(p) # Warm the candidate / cost caches
+    timings = []
+    for p in progressions:
+        start = time.perf_counter()
+        optimize_voice_leading(p)
+        timings.append(time.perf_counter() - start)
+    best = min(timings)
+    assert best < 0.001, f"16-chord progression took {best * 1000:.2f} ms"
+
+    track = generate_progression("C", "minor", "lo_fi", 8, 0.5, rng=random.Random(2), voice_leading="optimal")
+    assert all(len(c["notes"]) for c in track["progression"])
+
+if __name__ == "__main__":
+    test_voicings_keep_bass_and_pitch_classes()
+    test_viterbi_finds_the_cheapest_path()
+    test_optimal_mode_is_fast_enough_for_every_request()
@@ -0,0 +1,102 @@
+import sys
+import os
+import io
+import json
+
+# Add the backend directory to sys.path so 'app' module can be found
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+import mido
+import msgpack
+import numpy as np
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.logic.chords import generate_track_data
+from app.logic.notes import NoteArray
+from app.utils.wire import COLUMNS_JSON, MSGPACK, JSON, NotAcceptable, negotiate
+
+client = TestClient(app)
+
+SETTINGS = {"key": "C", "scale": "minor", "mood": "lo_fi", "length": 64, "seed": 9}
+
+def test_columns_round_trip():
+    print("Testing columnar note encoding...")
+    notes = generate_track_data("C", "minor", "lo_fi", length=8, seed=2)["chords"].quantize(960)
+    columns = notes.to_columns(960)
+    assert set(columns) == {"note", "dt", "dur", "vel"}
+    assert min(columns["dt"]) >= 0, "Sorted events only need non-negative deltas"
+    back = NoteArray.from_columns(columns, 960)
+    assert np.allclose(back.time, notes.time, atol=1e-4) and np.allclose(back.duration, notes.duration, atol=1e-4)
+    assert back.pitch.tolist() == notes.pitch.tolist() and back.velocity.tolist() == notes.velocity.tolist()
+
+def test_negotiation():
+    assert negotiate(None) == JSON
+    assert negotiate("*/*") == JSON
+    assert negotiate(f"{COLUMNS_JSON}") == COLUMNS_JSON
+    assert negotiate(f"application/json;q=0.5, {MSGPACK}") == MSGPACK
+    assert negotiate(f"{MSGPACK};q=0.1, application/json") == JSON
+    assert negotiate("text/html") == JSON # Nothing offered listed: the default
+
+    # q=0 refuses a type
+    assert negotiate("application/json;q=0") == MSGPACK
+    assert negotiate(f"application/json;q=0, {COLUMNS_JSON};q=0.5") == COLUMNS_JSON
+    assert negotiate("*/*, application/json;q=0") == MSGPACK
+    assert negotiate("application/msgpack, application/*;q=0") == MSGPACK
+    for accept in ("*/*;q=0", f"application/json;q=0, {MSGPACK};q=0, {COLUMNS_JSON};q=0", "application/*;q=0, text/html"):
+        try:
+            negotiate(accept)
+            raise AssertionError(accept)
+        except NotAcceptable:
+            pass
+
+    settings = {"key": "C", "scale": "minor", "mood": "pop", "length": 4}
+    response = client.post("/generate/chords", json=settings, headers={"Accept": "application/json;q=0"})
+    assert response.status_code == 200 and response.headers["content-type"] == MSGPACK
+    response = client.post("/generate/chords", json=settings, headers={"Accept": "*/*;q=0"})
+    assert response.status_code == 406 and JSON in response.json()["offered"]
+    assert client.get("/generate/top-hit/titanic", headers={"Accept": "application/*;q=0"}).status_code == 406
+
+def test_columnar_responses_are_smaller():
+    events = client.post("/generate/chords", json=SETTINGS)
+    columns = client.post("/generate/chords", json=SETTINGS, headers={"Accept": COLUMNS_JSON})
+    packed = client.post("/generate/chords", json=SETTINGS, headers={"Accept": MSGPACK})
+    assert columns.headers["content-type"] == COLUMNS_JSON and packed.headers["content-type"] == MSGPACK
+
+    # Same track in every format
+    a = events.json()
+    b = json.loads(columns.content)
+    c = msgpack.unpackb(packed.content)
+    assert b == c
+    for part in ("chords", "melody", "bass"):
+        notes = NoteArray.from_columns(c[part], c["resolution"])
+        assert np.allclose(notes.time, [e["time"] for e in a[part]], atol=1e-3)
+        assert notes.pitch.tolist() == [e["note"] for e in a[part]]
+
+    def note_bytes(body):
+        return len(json.dumps({p: body[p] for p in ("chords", "melody", "bass")}, separators=(",", ":")))
+    events_size = note_bytes(a)
+    packed_size = len(msgpack.packb({p: c[p] for p in ("chords", "melody", "bass")}))
+    print(f"  note payload: {events_size} B events, {note_bytes(b)} B columns, {packed_size} B msgpack")
+    assert events_size / packed_size >= 5, "MessagePack columns should be at least 5x smaller"
+    print("✅ Columnar responses OK")
+
+def test_download_accepts_columns():
+    track = msgpack.unpackb(client.post("/generate/chords", json=SETTINGS, headers={"Accept": MSGPACK}).content)
+    body = {"chords": track["chords"], "bass": track["bass"], "resolution": track["resolution"], "mood": "lo_fi", "tempo": 90}
+
+    as_json = client.post("/download/midi", content=json.dumps(body), headers={"Content-Type": COLUMNS_JSON})
+    as_msgpack = client.post("/download/midi", content=msgpack.packb(body), headers={"Content-Type": MSGPACK})
+    assert as_json.status_code == as_msgpack.status_code == 200
+    mid = mido.MidiFile(file=io.BytesIO(as_msgpack.content))
+    assert len([m for m in mid.tracks[0] if m.type == "note_on"]) == len(track["chords"]["note"])
+
+    body["chords"]["dt"] = body["chords"]["dt"][:-1]
+    assert client.post("/download/midi", content=msgpack.packb(body), headers={"Content-Type": MSGPACK}).status_code == 422
+    assert client.post("/download/midi", content=b"\xc1", headers={"Content-Type": MSGPACK}).status_code == 422
+
+if __name__ == "__main__":
+    test_columns_round_trip()
+    test_negotiation()
+    test_columnar_responses_are_smaller()
+    test_download_accepts_columns()
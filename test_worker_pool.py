@@ -0,0 +1,57 @@
+import sys
+import os
+import io
+import subprocess
+
+# Add the backend directory to sys.path so 'app' module can be found
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+import mido
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.utils import workers
+
+SETTINGS = {"key": "D", "scale": "minor", "mood": "lo_fi", "length": 4, "seed": 11}
+
+def test_generation_runs_in_worker_processes():
+    print("Testing the generation worker pool...")
+    # Without a lifespan there is no pool: jobs run in the threadpool
+    inline = TestClient(app).post("/generate/chords", json=SETTINGS).json()
+
+    workers.WORKER_PROCESSES = 2
+    try:
+        with TestClient(app) as client: # Starts (and warms) the pool
+            assert workers._pool is not None
+            pooled = client.post("/generate/chords", json=SETTINGS).json()
+            assert pooled == inline, "Seeded tracks must not depend on where they were generated"
+
+            batch = client.post("/generate/chords/batch", json={**SETTINGS, "count": 3}).json()
+            assert batch["count"] == 3
+
+            response = client.post("/download/midi", json={"chords": pooled["chords"], "bass": pooled["bass"], "mood": "lo_fi"})
+            assert response.status_code == 200
+            assert len(mido.MidiFile(file=io.BytesIO(response.content)).tracks) == 2
+
+            assert client.get("/").status_code == 200
+        assert workers._pool is None, "Pool should shut down with the app"
+    finally:
+        workers.WORKER_PROCESSES = 0
+    print("✅ Worker pool OK")
+
+def test_pool_size_follows_web_concurrency():
+    print("Testing the default pool size...")
+    script = "from app.utils import workers, admission; print(workers.WORKER_PROCESSES, admission.ADMISSION.concurrency)"
+    env = {key: value for key, value in os.environ.items() if key not in ("WORKER_PROCESSES", "ADMISSION_CONCURRENCY")}
+    for web_concurrency in ("1", "4", "1000"):
+        result = subprocess.run(
+            [sys.executable, "-c", script], cwd=os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"),
+            env={**env, "WEB_CONCURRENCY": web_concurrency}, capture_output=True, text=True, check=True,
+        )
+        share = max(1, (os.cpu_count() or 1) // int(web_concurrency))
+        assert result.stdout.split() == [str(share), str(share)], (web_concurrency, result.stdout)
+    print("✅ Each gunicorn worker gets its share of the cores")
+
+if __name__ == "__main__":
+    test_generation_runs_in_worker_processes()
+    test_pool_size_follows_web_concurrency()
@@ -0,0 +1,112 @@
+import sys
+import os
+import io
+
+# Add the backend directory to sys.path so 'app' module can be found
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+import mido
+from fastapi.testclient import TestClient
+
+from app.main import app
+
+client = TestClient(app)
+
+SETTINGS = {"key": "D", "scale": "minor", "mood": "pop", "length": 4}
+
+def test_generate_and_reroll():
+    print("Testing /ws/session generate + partial rerolls...")
+    with client.websocket_connect("/ws/session") as ws:
+        ws.send_json({"id": 1, "op": "generate", "settings": SETTINGS, "seed": 7})
+        reply = ws.receive_json()
+        assert reply["id"] == 1 and reply["rev"] == 1
+        first = reply["changed"]
+        for field in ("chords", "melody", "bass", "raw_progression", "tempo"):
+            assert field in first, field
+        assert first["key"] == "D" and first["seed"] == 7
+
+        ws.send_json({"id": 2, "op": "reroll", "part": "melody"})
+        reply = ws.receive_json()
+        assert reply["rev"] == 2
+        assert list(reply["changed"]) == ["melody"]
+        assert reply["changed"]["melody"] != first["melody"]
+
+        ws.send_json({"id": 3, "op": "reroll", "part": "bass"})
+        reply = ws.receive_json()
+        assert list(reply["changed"]) == ["bass"]
+
+        ws.send_json({"op": "state"})
+        state = ws.receive_json()["changed"]
+        assert state["chords"] == first["chords"]
+        assert state["melody"] != first["melody"]
+    print("✅ Rerolls only send the part that changed")
+
+def test_settings_changes():
+    print("Testing /ws/session setting changes...")
+    with client.websocket_connect("/ws/session") as ws:
+        ws.send_json({"op": "generate", "settings": SETTINGS, "seed": 3})
+        first = ws.receive_json()["changed"]
+
+        ws.send_json({"op": "set", "settings": {"tempo": 96}})
+        reply = ws.receive_json()
+        assert reply["changed"] == {"tempo": 96}
+
+        # Same tempo again: nothing changes and the revision stays put
+        ws.send_json({"op": "set", "settings": {"tempo": 96}})
+        reply = ws.receive_json()
+        assert reply["changed"] == {} and reply["rev"] == 2
+
+        # Changing the key regenerates with the session's seed
+        ws.send_json({"op": "set", "settings": {"key": "E"}})
+        changed = ws.receive_json()["changed"]
+        assert changed["key"] == "E"
+        assert changed["chords"] != first["chords"]
+        assert "seed" not in changed and "tempo" not in changed
+    print("✅ Metadata changes skip regeneration")
+
+def test_columns_and_export():
+    print("Testing /ws/session columns format + MIDI export...")
+    with client.websocket_connect("/ws/session") as ws:
+        ws.send_json({"op": "generate", "settings": SETTINGS, "seed": 11, "format": "columns"})
+        track = ws.receive_json()["changed"]
+        assert set(track["melody"]) == {"note", "dt", "dur", "vel"}
+
+        ws.send_json({"op": "reroll", "part": "melody"})
+        assert set(ws.receive_json()["changed"]["melody"]) == {"note", "dt", "dur", "vel"}
+
+        ws.send_json({"op": "export"})
+        data = ws.receive_bytes()
+        midi = mido.MidiFile(file=io.BytesIO(data))
+        assert len(midi.tracks) >= 3
+    print("✅ Export returns a MIDI file")
+
+def test_errors():
+    print("Testing /ws/session errors...")
+    with client.websocket_connect("/ws/session") as ws:
+        ws.send_json({"id": "a", "op": "reroll", "part": "melody"})
+        assert "error" in ws.receive_json()
+
+        ws.send_json({"id": "b", "op": "dance"})
+        reply = ws.receive_json()
+        assert reply["id"] == "b" and "error" in reply
+
+        ws.send_json({"id": "c", "op": "generate", "settings": {"length": "long"}})
+        assert "error" in ws.receive_json()
+
+        ws.send_text("not json")
+        assert "error" in ws.receive_json()
+
+        for seed in (2**70, -1, "42"):
+            ws.send_json({"op": "generate", "settings": SETTINGS, "seed": seed})
+            assert "error" in ws.receive_json(), seed
+
+        # The session is still usable afterwards
+        ws.send_json({"op": "generate", "settings": SETTINGS, "seed": 1})
+        assert "chords" in ws.receive_json()["changed"]
+    print("✅ Bad commands get an error reply")
+
+if __name__ == "__main__":
+    test_generate_and_reroll()
+    test_settings_changes()
+    test_columns_and_export()
+    test_errors()